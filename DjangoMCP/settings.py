@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,7 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'mcp_website'
+    'mcp_website.apps.PollsConfig'
 ]
 
 MIDDLEWARE = [
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mcp_website.middleware.ChatProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'DjangoMCP.urls'
@@ -82,6 +84,169 @@ DATABASES = {
 }
 
 
+# MCP servers spawned by the chat bot: the interpreter that runs
+# mcp_website/mcp_server.py and how many server processes to keep connected.
+
+MCP_SERVER_PYTHON = 'D:\\2025_06\\DjangoMCP\\venv\\Scripts\\python.exe'
+
+MCP_SERVER_POOL_SIZE = 1
+
+# Fork the servers from one pre-initialized "zygote" server instead of
+# starting each from scratch; replacements are then ready in milliseconds
+# and share the loaded data. Needs fork(), so it is ignored on Windows.
+MCP_SERVER_ZYGOTE = False
+
+# Upper bound on the number of messages accepted by /chat/batch/.
+MCP_CHAT_BATCH_MAX_MESSAGES = 1000
+
+
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'chat': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mcp-chat',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Background chat job state, shared by all worker processes on this host.
+    # Point it at memcached or redis when the site runs on several hosts.
+    'jobs': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'mcp-chat-jobs'),
+    },
+}
+
+# Rendered chat answers, keyed by normalized message and resolved tool call.
+# TTLS are per-tool freshness windows in seconds (0 or missing disables
+# caching); STALE_TTL is how long an expired answer may still be served while
+# it is refreshed in the background.
+MCP_CHAT_CACHE = {
+    'ALIAS': 'chat',
+    'TTLS': {
+        'get_forecast': 300,
+        'get_alerts': 60,
+        'calculate': 3600,
+        'get_time': 0,
+    },
+    'FALLBACK_TTL': 3600,
+    'STALE_TTL': 120,
+}
+
+# Background chat jobs (POST /chat/ with "async": true). Jobs run in the
+# process that accepted them; their state lives in the ALIAS cache so any
+# process can answer polls. WORKERS bounds the in-process pool, MAX_QUEUE the
+# backlog before requests get a 503, RESULT_TTL how long job state can be
+# fetched and MAX_WAIT the long-poll cap (each poll holds a web thread).
+MCP_CHAT_JOBS = {
+    'ALIAS': 'jobs',
+    'WORKERS': 4,
+    'MAX_QUEUE': 100,
+    'RESULT_TTL': 300,
+    'MAX_WAIT': 5,
+}
+
+# Chat history (Conversation, Message and ToolCall in the database). The views
+# only queue each exchange; a background thread writes up to BATCH_SIZE
+# exchanges per transaction, at most FLUSH_INTERVAL seconds after they were
+# queued. Beyond MAX_QUEUE pending exchanges new ones are dropped. At exit
+# the queue is written out, waiting at most STOP_TIMEOUT seconds. The bundled
+# db.sqlite3 does not have these tables (nor the rollup tables below): run
+# "python manage.py migrate" once before enabling history on a database.
+MCP_CHAT_HISTORY = {
+    'ENABLED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_QUEUE': 10000,
+    'STOP_TIMEOUT': 5.0,
+}
+
+# Usage rollups over the chat history, updated incrementally as history is
+# written: per-tool and per-intent counts and latency histograms per
+# BUCKET_SECONDS bucket, plus unmatched messages. Shown to staff at
+# /mcp_website/analytics/.
+MCP_ANALYTICS = {
+    'BUCKET_SECONDS': 3600,
+    'DEFAULT_HOURS': 24,
+    'TOP_UNMATCHED': 20,
+}
+
+# Admission control in front of the MCP servers. At most MAX_CONCURRENT chat
+# requests talk to the servers at once, up to MAX_QUEUE more wait at most
+# QUEUE_TIMEOUT seconds, everything else gets a 429 with Retry-After.
+MCP_CHAT_ADMISSION = {
+    'MAX_CONCURRENT': 4,
+    'MAX_QUEUE': 32,
+    'QUEUE_TIMEOUT': 3.0,
+}
+
+# max-age for the pre-rendered landing page. Browsers revalidate with the
+# ETag/Last-Modified headers once it expires and get a 304 if nothing changed.
+MCP_INDEX_CACHE_MAX_AGE = 0
+
+# Health checks for the MCP server processes. Every INTERVAL seconds each
+# server is pinged; a server that exited, or missed MAX_FAILURES pings in a
+# row while idle, is replaced, with exponential backoff between restarts of
+# the same slot. A server with requests in flight that produced output in the
+# last BUSY_TIMEOUT seconds is busy, not stuck. With WATCH_CODE (on in
+# development only), editing mcp_*.py triggers a rolling restart. A replaced
+# server finishes its in-flight requests (up to DRAIN_TIMEOUT seconds, the
+# longest request timeout) after its warm successor has taken over.
+MCP_SUPERVISOR = {
+    'ENABLED': True,
+    'INTERVAL': 5.0,
+    'PING_TIMEOUT': 2.0,
+    'MAX_FAILURES': 2,
+    'BUSY_TIMEOUT': 30.0,
+    'DRAIN_TIMEOUT': 30.0,
+    'WATCH_CODE': DEBUG,
+}
+
+# Tool results shared by every web worker and MCP server process through a
+# memory-mapped file at PATH: SLOTS fixed-size slots of SLOT_SIZE bytes
+# (results that do not fit are not cached). Each tool declares its own TTL
+# in the server. Needs fcntl, so it is skipped on Windows.
+MCP_SHARED_CACHE = {
+    'ENABLED': True,
+    'PATH': os.path.join(BASE_DIR, 'mcp_tool_cache.bin'),
+    'SLOTS': 2048,
+    'SLOT_SIZE': 8192,
+}
+
+# Request tracing for /chat/. A sampled request records timed spans in the
+# view, the MCP client and the server's tool handler, and appends them to
+# FILE in Chrome trace-event format (open it in chrome://tracing or Perfetto).
+MCP_TRACE = {
+    'SAMPLE_RATE': 0.0,
+    'FILE': os.path.join(BASE_DIR, 'mcp_trace.json'),
+}
+
+# /metrics/ (Prometheus). Scrapes are allowed from ALLOWED_IPS, with an
+# "Authorization: Bearer TOKEN" header when TOKEN is set, or by staff users.
+# Per-server stats are refreshed in the background at most every
+# SERVER_STATS_MAX_AGE seconds, so a scrape never waits on the MCP servers.
+MCP_METRICS = {
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': '',
+    'SERVER_STATS_MAX_AGE': 10.0,
+}
+
+# cProfile for /chat/ requests. When ENABLED, a SAMPLE_RATE fraction of
+# requests, plus staff requests sending an X-MCP-Profile header, are
+# profiled and dumped as .pstats files into DIR. When disabled the
+# middleware is not loaded at all.
+MCP_PROFILE = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'DIR': os.path.join(BASE_DIR, 'profiles'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -123,3 +288,10 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed copies (e.g. chat.3f2a9c.js) that the
+# front-end server can cache forever; our own CSS/JS is minified when the
+# optional rcssmin/rjsmin packages are installed.
+STATICFILES_STORAGE = 'mcp_website.storage.MinifiedManifestStaticFilesStorage'
@@ -3,4 +3,41 @@ from __future__ import unicode_literals
 
 from django.contrib import admin
 
-# Register your models here.
+from .models import Conversation, Message, ToolCall, UnmatchedMessage, UsageRollup
+
+
+class MessageInline(admin.TabularInline):
+    model = Message
+    fields = ('role', 'content', 'tool', 'cache_status', 'latency_ms', 'created_at')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('key', 'created_at', 'last_message_at', 'message_count')
+    search_fields = ('key',)
+    date_hierarchy = 'last_message_at'
+    inlines = [MessageInline]
+
+
+@admin.register(ToolCall)
+class ToolCallAdmin(admin.ModelAdmin):
+    list_display = ('tool', 'started_at', 'duration_ms', 'cache_hit', 'ok')
+    list_filter = ('tool', 'cache_hit', 'ok')
+    raw_id_fields = ('message',)
+
+
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket_start', 'kind', 'name', 'count', 'errors', 'cache_hits', 'latency_count')
+    list_filter = ('kind', 'name')
+    date_hierarchy = 'bucket_start'
+
+
+@admin.register(UnmatchedMessage)
+class UnmatchedMessageAdmin(admin.ModelAdmin):
+    list_display = ('text', 'count', 'first_seen', 'last_seen')
+    search_fields = ('text',)
+    ordering = ('-count',)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# 默认配置，可通过 settings.MCP_CHAT_ADMISSION 覆盖
+DEFAULT_CONFIG = {
+    # 同时访问 MCP 服务器的请求数
+    'MAX_CONCURRENT': 4,
+    # 排队等待的请求上限，超过后立即拒绝
+    'MAX_QUEUE': 32,
+    # 单个请求最长排队时间（秒）
+    'QUEUE_TIMEOUT': 3.0,
+}
+
+
+class AdmissionRejected(Exception):
+    """请求未被接纳，retry_after 为建议的重试间隔（秒）."""
+
+    def __init__(self, message, retry_after):
+        super(AdmissionRejected, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController(object):
+    """限制访问 MCP 服务器的并发数，超出部分进入有界队列并带排队超时."""
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_CHAT_ADMISSION', {}))
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        # 服务时间的指数移动平均，用于估算 Retry-After
+        self.service_time = 0.0
+        self.counters = {
+            'admitted': 0,
+            'rejected_queue_full': 0,
+            'rejected_timeout': 0,
+            'max_queue_depth': 0,
+            'queue_wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        """进入临界区，队列已满或排队超时时抛出 AdmissionRejected."""
+        with self.condition:
+            if self.active < self.config['MAX_CONCURRENT'] and not self.waiting:
+                self.active += 1
+                self.counters['admitted'] += 1
+                return
+
+            if self.waiting >= self.config['MAX_QUEUE']:
+                self.counters['rejected_queue_full'] += 1
+                raise AdmissionRejected('Chat queue is full', self._retry_after())
+
+            self.waiting += 1
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], self.waiting)
+            start = time.time()
+            deadline = start + self.config['QUEUE_TIMEOUT']
+            try:
+                while self.active >= self.config['MAX_CONCURRENT']:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.counters['rejected_timeout'] += 1
+                        # 超时前可能已被 release() 唤醒，把唤醒转交给下一个等待者
+                        self.condition.notify()
+                        raise AdmissionRejected('Timed out waiting in chat queue', self._retry_after())
+                    self.condition.wait(remaining)
+                self.active += 1
+                self.counters['admitted'] += 1
+            finally:
+                self.waiting -= 1
+                self.counters['queue_wait_seconds'] += time.time() - start
+
+    def release(self, service_time=None):
+        with self.condition:
+            self.active -= 1
+            if service_time is not None:
+                self.service_time = 0.8 * self.service_time + 0.2 * service_time
+            self.condition.notify()
+
+    @contextmanager
+    def admit(self):
+        """with admission.admit(): ... 包裹一次 MCP 访问."""
+        self.acquire()
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.release(time.time() - start)
+
+    def call(self, func, *args):
+        with self.admit():
+            return func(*args)
+
+    def _retry_after(self):
+        """按当前排队长度和平均服务时间估算何时重试，至少 1 秒."""
+        backlog = (self.waiting + 1) * self.service_time / max(1, self.config['MAX_CONCURRENT'])
+        return max(1, int(math.ceil(backlog)))
+
+    def stats(self):
+        """当前队列状态和累计计数."""
+        with self.condition:
+            stats = dict(self.counters)
+            stats.update({
+                'active': self.active,
+                'queue_depth': self.waiting,
+                'max_concurrent': self.config['MAX_CONCURRENT'],
+                'max_queue': self.config['MAX_QUEUE'],
+                'avg_service_seconds': round(self.service_time, 4),
+            })
+            return stats
+
+
+# 全局实例
+admission = AdmissionController()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import bisect
+import json
+import re
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .history import to_datetime
+from .mcp_metrics import LATENCY_BUCKETS
+from .models import UnmatchedMessage, UsageRollup
+
+# 默认配置，可通过 settings.MCP_ANALYTICS 覆盖
+DEFAULT_CONFIG = {
+    # 汇总的时间桶长度（秒）
+    'BUCKET_SECONDS': 3600,
+    # 分析页默认显示的时间范围（小时）
+    'DEFAULT_HOURS': 24,
+    # 分析页显示的未匹配消息条数
+    'TOP_UNMATCHED': 20,
+}
+CONFIG = dict(DEFAULT_CONFIG)
+CONFIG.update(getattr(settings, 'MCP_ANALYTICS', {}))
+
+UNMATCHED = 'unmatched'
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_start(timestamp, size=None):
+    size = size or CONFIG['BUCKET_SECONDS']
+    return int(timestamp // size * size)
+
+
+def normalize_message(message):
+    """合并只有大小写和空白不同的消息."""
+    return re.sub(r'\s+', ' ', message.strip().lower())[:200]
+
+
+def histogram_quantile(counts, p):
+    """按桶内线性插值估算百分位数（毫秒），counts 对应 LATENCY_BUCKETS."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = p / 100.0 * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            if index >= len(LATENCY_BUCKETS):
+                # 溢出桶没有上界，取最后一个边界
+                return LATENCY_BUCKETS[-1] * 1000
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            upper = LATENCY_BUCKETS[index]
+            return round((lower + (upper - lower) * (rank - seen) / count) * 1000, 3)
+        seen += count
+    return LATENCY_BUCKETS[-1] * 1000
+
+
+class _Delta(object):
+    """一批记录对一行汇总的增量."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.latency_sum_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, ok, cache_hit, latency):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        if cache_hit:
+            self.cache_hits += 1
+        if latency is not None:
+            self.latency_sum_ms += latency * 1000
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def values(self):
+        """新建一行汇总时的字段值."""
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'latency_sum_ms': self.latency_sum_ms,
+            'latency_count': sum(self.histogram),
+            'latency_histogram': json.dumps(self.histogram),
+        }
+
+    def updates(self):
+        """累加到已有一行的 F() 表达式，在一条 UPDATE 中完成."""
+        return {
+            'count': F('count') + self.count,
+            'errors': F('errors') + self.errors,
+            'cache_hits': F('cache_hits') + self.cache_hits,
+            'latency_sum_ms': F('latency_sum_ms') + self.latency_sum_ms,
+            'latency_count': F('latency_count') + sum(self.histogram),
+        }
+
+    def merge(self, histogram):
+        histogram = json.loads(histogram) or [0] * len(self.histogram)
+        return json.dumps([a + b for a, b in zip(histogram, self.histogram)])
+
+
+def _add_to_rollup(bucket, kind, name, delta):
+    """把增量累加到一行汇总.
+
+    计数用 F() 表达式累加。直方图是 JSON，只能读出合并后以读到的值为条件写回，
+    其他进程先写入时条件不成立，重读后重试。行不存在时创建，另一个进程同时
+    创建时唯一约束冲突，改为更新。
+    """
+    rows = UsageRollup.objects.filter(bucket_start=to_datetime(bucket), kind=kind, name=name)
+    conflicts = 0
+    while True:
+        updates = delta.updates()
+        if any(delta.histogram):
+            histogram = rows.values_list('latency_histogram', flat=True).first()
+            if histogram is not None:
+                updates['latency_histogram'] = delta.merge(histogram)
+                if rows.filter(latency_histogram=histogram).update(**updates):
+                    return
+                continue
+        elif rows.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                UsageRollup.objects.create(bucket_start=to_datetime(bucket), kind=kind, name=name,
+                                           **delta.values())
+            return
+        except IntegrityError:
+            # 再次冲突说明不是同时创建
+            conflicts += 1
+            if conflicts > 1:
+                raise
+
+
+def _add_unmatched(text, count, first, last):
+    rows = UnmatchedMessage.objects.filter(text=text)
+    if not rows.update(count=F('count') + count):
+        try:
+            with transaction.atomic():
+                UnmatchedMessage.objects.create(text=text, count=count, first_seen=first, last_seen=last)
+            return
+        except IntegrityError:
+            # 另一个进程同时创建了这条消息
+            rows.update(count=F('count') + count)
+    rows.filter(last_seen__lt=last).update(last_seen=last)
+
+
+def update_rollups(batch):
+    """把一批聊天记录累加到汇总表，由 chat_history 在写入的事务中调用.
+
+    每个 web 进程都有自己的写入线程，同一行汇总可能被同时更新，所以每行都
+    用 UPDATE 原地累加（见 _add_to_rollup），不会丢失其他进程的增量。
+    """
+    deltas = {}
+    unmatched = {}
+    for exchange in batch:
+        bucket = bucket_start(exchange['started_at'])
+        tool = exchange['tool']
+        cache_hit = exchange['cache_status'] in ('hit', 'stale')
+        intent = tool or UNMATCHED
+        deltas.setdefault((bucket, UsageRollup.INTENT, intent), _Delta()).add(
+            exchange['ok'], cache_hit, exchange['latency'])
+        if tool:
+            # 命中缓存时没有调用工具，只计数不计延迟
+            deltas.setdefault((bucket, UsageRollup.TOOL, tool), _Delta()).add(
+                exchange['ok'], exchange['cache_hit'], None if exchange['cache_hit'] else exchange['tool_duration'])
+        else:
+            text = normalize_message(exchange['user_message'])
+            if text:
+                count, first, last = unmatched.get(text, (0, exchange['started_at'], exchange['started_at']))
+                unmatched[text] = (count + 1, min(first, exchange['started_at']), max(last, exchange['started_at']))
+
+    with transaction.atomic():
+        for (bucket, kind, name), delta in sorted(deltas.items()):
+            _add_to_rollup(bucket, kind, name, delta)
+
+        for text, (count, first, last) in sorted(unmatched.items()):
+            _add_unmatched(text, count, to_datetime(first), to_datetime(last))
+
+
+def _summarize(rows):
+    """合并多行汇总为计数、错误率、缓存命中率和延迟百分位数."""
+    count = sum(row.count for row in rows)
+    latency_count = sum(row.latency_count for row in rows)
+    histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+    for row in rows:
+        for index, value in enumerate(json.loads(row.latency_histogram)):
+            histogram[index] += value
+    summary = {
+        'count': count,
+        'errors': sum(row.errors for row in rows),
+        'cache_hits': sum(row.cache_hits for row in rows),
+        'latency_ms': {
+            'count': latency_count,
+            'mean': round(sum(row.latency_sum_ms for row in rows) / latency_count, 3) if latency_count else None,
+        },
+    }
+    for p in PERCENTILES:
+        summary['latency_ms']['p{}'.format(p)] = histogram_quantile(histogram, p)
+    return summary
+
+
+def dashboard(hours=None, now=None):
+    """最近 hours 小时的用量，只读取汇总表，耗时与聊天记录的多少无关."""
+    hours = hours or CONFIG['DEFAULT_HOURS']
+    now = time.time() if now is None else now
+    since = bucket_start(now - hours * 3600)
+    rows = list(UsageRollup.objects.filter(bucket_start__gte=to_datetime(since)).order_by('bucket_start'))
+
+    result = {'hours': hours, 'bucket_seconds': CONFIG['BUCKET_SECONDS']}
+    for kind, key in ((UsageRollup.TOOL, 'tools'), (UsageRollup.INTENT, 'intents')):
+        by_name = {}
+        for row in rows:
+            if row.kind == kind:
+                by_name.setdefault(row.name, []).append(row)
+        result[key] = sorted(
+            [dict(_summarize(name_rows), name=name) for name, name_rows in by_name.items()],
+            key=lambda item: -item['count'])
+
+    # 每个时间桶的请求数，按意图拆分
+    timeline = {}
+    for row in rows:
+        if row.kind == UsageRollup.INTENT:
+            bucket = timeline.setdefault(row.bucket_start, {'bucket_start': row.bucket_start.isoformat(),
+                                                            'count': 0, 'intents': {}})
+            bucket['count'] += row.count
+            bucket['intents'][row.name] = row.count
+    result['timeline'] = [timeline[key] for key in sorted(timeline)]
+
+    result['top_unmatched'] = [{
+        'text': message.text,
+        'count': message.count,
+        'last_seen': message.last_seen.isoformat(),
+    } for message in UnmatchedMessage.objects.order_by('-count', '-last_seen')[:CONFIG['TOP_UNMATCHED']]]
+    return result
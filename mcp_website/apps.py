@@ -6,3 +6,11 @@ from django.apps import AppConfig
 
 class PollsConfig(AppConfig):
     name = 'mcp_website'
+
+    def ready(self):
+        from .analytics import update_rollups
+        from .history import chat_history
+
+        # 汇总表随聊天记录增量更新
+        if update_rollups not in chat_history.listeners:
+            chat_history.listeners.append(update_rollups)
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+# 第三方前端库：名称 -> static 目录下的文件，固定版本并连同许可证一起提交
+#   Font Awesome 6.0.0（static/vendor/fontawesome/LICENSE.txt）
+#   marked 4.0.19，发布版 lib/marked.js 去掉注释和空白后的压缩文件（static/vendor/marked/LICENSE.md）
+#   Prism 1.23.0，含 python、json、bash 等语言的官方打包文件（static/vendor/prism/LICENSE）
+VENDOR_ASSETS = OrderedDict([
+    ('fontawesome-css', 'vendor/fontawesome/css/fontawesome.min.css'),
+    ('fontawesome-solid-css', 'vendor/fontawesome/css/solid.min.css'),
+    ('fontawesome-solid-woff2', 'vendor/fontawesome/webfonts/fa-solid-900.woff2'),
+    ('fontawesome-solid-ttf', 'vendor/fontawesome/webfonts/fa-solid-900.ttf'),
+    ('marked', 'vendor/marked/marked.min.js'),
+    ('prism', 'vendor/prism/prism.min.js'),
+])
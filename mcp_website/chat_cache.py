@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# 默认配置，可通过 settings.MCP_CHAT_CACHE 覆盖
+DEFAULT_CONFIG = {
+    'ALIAS': 'default',
+    # 每个工具的新鲜期（秒），0 表示不缓存
+    'TTLS': {},
+    # 未匹配到工具时的静态备用响应
+    'FALLBACK_TTL': 0,
+    # 过期后仍可返回旧值并在后台刷新的时间窗口（秒）
+    'STALE_TTL': 0,
+    'KEY_PREFIX': 'mcp-chat',
+}
+
+
+class ChatResponseCache(object):
+    """基于 Django 缓存框架的聊天响应缓存，支持 stale-while-revalidate."""
+
+    HIT = 'hit'
+    STALE = 'stale'
+    MISS = 'miss'
+    BYPASS = 'bypass'
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_CHAT_CACHE', {}))
+
+    @property
+    def cache(self):
+        """当前线程的缓存后端."""
+        return caches[self.config['ALIAS']]
+
+    def normalize(self, message):
+        """去掉首尾空白并合并连续空白."""
+        return re.sub(r'\s+', ' ', message.strip())
+
+    def make_key(self, message, tool_name, arguments):
+        """由规范化消息和解析出的工具调用生成缓存键."""
+        payload = json.dumps([self.normalize(message), tool_name, arguments], sort_keys=True)
+        digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        return '{}:{}'.format(self.config['KEY_PREFIX'], digest)
+
+    def ttl_for(self, tool_name):
+        """返回工具的新鲜期，未配置的工具不缓存."""
+        if not tool_name:
+            return self.config['FALLBACK_TTL']
+        return self.config['TTLS'].get(tool_name, 0)
+
+    def get_or_render(self, message, tool_name, arguments, render):
+        """读取缓存或调用 render() 生成响应.
+
+        返回 (响应, 缓存状态)。render() 返回 None 表示生成失败，结果不会被缓存。
+        """
+        ttl = self.ttl_for(tool_name)
+        if not ttl:
+            return render(), self.BYPASS
+
+        key = self.make_key(message, tool_name, arguments)
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry['fresh_until'] > time.time():
+                return entry['response'], self.HIT
+            self._revalidate(key, ttl, render)
+            return entry['response'], self.STALE
+
+        response = render()
+        if response is not None:
+            self._store(key, ttl, response)
+        return response, self.MISS
+
+    def get(self, message, tool_name, arguments):
+        """只读取缓存，返回 (响应, 缓存状态)，未命中时响应为 None."""
+        ttl = self.ttl_for(tool_name)
+        if not ttl:
+            return None, self.BYPASS
+
+        entry = self.cache.get(self.make_key(message, tool_name, arguments))
+        if entry is None:
+            return None, self.MISS
+        if entry['fresh_until'] > time.time():
+            return entry['response'], self.HIT
+        return entry['response'], self.STALE
+
+    def revalidate(self, message, tool_name, arguments, render):
+        """在后台刷新 get() 返回 STALE 的条目，与 get_or_render 的刷新相同."""
+        ttl = self.ttl_for(tool_name)
+        if ttl:
+            self._revalidate(self.make_key(message, tool_name, arguments), ttl, render)
+
+    def set(self, message, tool_name, arguments, response):
+        """写入一条已生成的响应，未配置 TTL 的工具会被忽略."""
+        ttl = self.ttl_for(tool_name)
+        if ttl and response is not None:
+            self._store(self.make_key(message, tool_name, arguments), ttl, response)
+
+    def _store(self, key, ttl, response):
+        entry = {
+            'response': response,
+            'fresh_until': time.time() + ttl,
+        }
+        self.cache.set(key, entry, ttl + self.config['STALE_TTL'])
+
+    def _revalidate(self, key, ttl, render):
+        """在后台线程中刷新过期条目，同一个键同时只有一个刷新任务."""
+        lock_key = key + ':refresh'
+        if not self.cache.add(lock_key, 1, max(ttl, 1)):
+            return
+
+        def refresh():
+            try:
+                response = render()
+                if response is not None:
+                    self._store(key, ttl, response)
+            except Exception as e:
+                print("Chat cache refresh failed: " + str(e))
+            finally:
+                self.cache.delete(lock_key)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+
+# 全局实例
+chat_cache = ChatResponseCache()
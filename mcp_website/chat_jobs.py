@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+import traceback
+import uuid
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from django.conf import settings
+from django.core.cache import caches
+
+# 默认配置，可通过 settings.MCP_CHAT_JOBS 覆盖
+DEFAULT_CONFIG = {
+    # 保存任务状态的缓存别名，多进程部署时应为各进程共享的缓存
+    'ALIAS': 'default',
+    'KEY_PREFIX': 'chat-job',
+    # 后台工作线程数
+    'WORKERS': 4,
+    # 等待执行的任务上限，超过后拒绝新任务
+    'MAX_QUEUE': 100,
+    # 任务状态保留的时间（秒）
+    'RESULT_TTL': 300,
+    # 长轮询单次最长等待时间（秒），期间占用一个 Web 线程
+    'MAX_WAIT': 5,
+    # 等待其他进程中的任务时读取缓存的间隔（秒）
+    'POLL_INTERVAL': 0.2,
+}
+
+
+class JobQueueFull(Exception):
+    """任务队列已满."""
+    pass
+
+
+class ChatJob(object):
+    """一个后台聊天任务的状态，保存在缓存中，任一进程都可以读取."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, job_id=None, status=PENDING, result=None, error=None, created_at=None, finished_at=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.status = status
+        self.result = result
+        self.error = error
+        self.created_at = created_at if created_at is not None else time.time()
+        self.finished_at = finished_at
+
+    @classmethod
+    def from_state(cls, job_id, state):
+        return cls(job_id, state['status'], state.get('result'), state.get('error'),
+                   state.get('created_at'), state.get('finished_at'))
+
+    def state(self):
+        return {
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def run(self, func, args):
+        try:
+            self.result = func(*args)
+            self.status = self.DONE
+        except Exception as e:
+            print("Chat job failed: " + str(e))
+            traceback.print_exc()
+            self.error = str(e)
+            self.status = self.FAILED
+        finally:
+            self.finished_at = time.time()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+        }
+        if self.status == self.DONE:
+            data['result'] = self.result
+        elif self.status == self.FAILED:
+            data['error'] = self.error
+        return data
+
+
+class ChatJobPool(object):
+    """有界的进程内工作线程池，任务状态写入缓存并按 RESULT_TTL 过期.
+
+    任务在提交它的进程中执行，但状态在缓存里，因此可以从任一进程查询。
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_CHAT_JOBS', {}))
+        self.cache = caches[self.config['ALIAS']]
+        self.queue = queue.Queue(self.config['MAX_QUEUE'])
+        # 本进程中未结束的任务：id -> 结束时触发的 Event
+        self.events = {}
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def submit(self, func, *args):
+        """提交任务，队列已满时抛出 JobQueueFull."""
+        self._start_workers()
+
+        job = ChatJob()
+        self._save(job)
+        with self.lock:
+            self.events[job.id] = threading.Event()
+        try:
+            self.queue.put_nowait((job, func, args))
+        except queue.Full:
+            with self.lock:
+                self.events.pop(job.id, None)
+            self.cache.delete(self._key(job.id))
+            raise JobQueueFull("Chat job queue is full")
+        return job
+
+    def get(self, job_id):
+        """按 id 查找任务，过期或不存在时返回 None."""
+        state = self.cache.get(self._key(job_id))
+        if state is None:
+            return None
+        return ChatJob.from_state(job_id, state)
+
+    def wait(self, job_id, timeout):
+        """最多等待 timeout 秒（不超过 MAX_WAIT）直到任务结束，返回任务的最新状态.
+
+        本进程的任务结束时立即返回，其他进程的任务按 POLL_INTERVAL 读取缓存。
+        """
+        deadline = time.time() + min(timeout, self.config['MAX_WAIT'])
+        with self.lock:
+            event = self.events.get(job_id)
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.time()
+            if job is None or job.finished or remaining <= 0:
+                return job
+            if event is not None:
+                event.wait(remaining)
+            else:
+                time.sleep(min(self.config['POLL_INTERVAL'], remaining))
+
+    def _key(self, job_id):
+        return '{}:{}'.format(self.config['KEY_PREFIX'], job_id)
+
+    def _save(self, job):
+        self.cache.set(self._key(job.id), job.state(), self.config['RESULT_TTL'])
+
+    def _start_workers(self):
+        """首次提交任务时才启动工作线程."""
+        if self.workers:
+            return
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.config['WORKERS']):
+                worker = threading.Thread(target=self._work, name='chat-job-worker-%d' % i)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def _work(self):
+        while True:
+            job, func, args = self.queue.get()
+            try:
+                job.status = job.RUNNING
+                self._save(job)
+                job.run(func, args)
+                self._save(job)
+            finally:
+                with self.lock:
+                    event = self.events.pop(job.id, None)
+                if event is not None:
+                    event.set()
+                self.queue.task_done()
+
+
+# 全局实例
+chat_jobs = ChatJobPool()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import atexit
+import datetime
+import json
+import threading
+import time
+import traceback
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Conversation, Message, ToolCall
+
+# 默认配置，可通过 settings.MCP_CHAT_HISTORY 覆盖
+DEFAULT_CONFIG = {
+    'ENABLED': True,
+    # 一个事务最多写入的对话轮数
+    'BATCH_SIZE': 200,
+    # 一轮对话进入队列后最多等待多久写入（秒）
+    'FLUSH_INTERVAL': 1.0,
+    # 等待写入的对话轮数上限，超过后丢弃新记录
+    'MAX_QUEUE': 10000,
+    # 进程退出时最多等待多久把队列写完（秒）
+    'STOP_TIMEOUT': 5.0,
+}
+
+# 放入队列让写入线程退出
+_STOP = object()
+
+
+@receiver(connection_created)
+def enable_wal(sender, connection, **kwargs):
+    """SQLite 使用 WAL 日志：写入时不阻塞读取，提交时不必每次 fsync 主库文件."""
+    if connection.vendor == 'sqlite':
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+def to_datetime(timestamp):
+    if timestamp is None:
+        return None
+    if settings.USE_TZ:
+        return datetime.datetime.fromtimestamp(timestamp, timezone.utc)
+    return datetime.datetime.fromtimestamp(timestamp)
+
+
+class ChatHistory(object):
+    """聊天记录的后写队列.
+
+    record() 只把一轮对话放入内存队列，后台线程把队列中的记录攒成批，
+    每批在一个事务中写入，请求线程不访问数据库。一批写入失败时逐条重试，
+    只丢弃写不进去的记录；进程退出时 stop() 把队列中剩余的记录写完。
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_CHAT_HISTORY', {}))
+        self.queue = queue.Queue(self.config['MAX_QUEUE'])
+        self.lock = threading.Lock()
+        self.writer = None
+        self.exit_handler_registered = False
+        # 每批在写入的同一个事务中调用 listener(batch)，用于增量维护汇总表
+        self.listeners = []
+        self.counters = {
+            'recorded': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'errors': 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.config['ENABLED']
+
+    def record(self, conversation_id, user_message, response, tool=None, arguments=None, cache_status='',
+               started_at=None, latency=None, tool_started_at=None, tool_duration=None, ok=True, cache_hit=False):
+        """记录一轮对话；时间为 time.time() 秒数，耗时为秒.
+
+        cache_hit 表示工具结果来自缓存（聊天缓存或共享工具缓存）而不是工具调用。
+        """
+        if not self.enabled:
+            return
+        self._start_writer()
+        exchange = {
+            'conversation': conversation_id,
+            'user_message': user_message,
+            'response': response or '',
+            'tool': tool or '',
+            'arguments': arguments,
+            'cache_status': cache_status or '',
+            'started_at': started_at if started_at is not None else time.time(),
+            'latency': latency,
+            'tool_started_at': tool_started_at,
+            'tool_duration': tool_duration,
+            'ok': ok,
+            'cache_hit': cache_hit,
+        }
+        try:
+            self.queue.put_nowait(exchange)
+        except queue.Full:
+            with self.lock:
+                self.counters['dropped'] += 1
+            return
+        with self.lock:
+            self.counters['recorded'] += 1
+
+    def flush(self, timeout=10):
+        """等待队列中的记录全部写入，返回是否在 timeout 秒内完成."""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks:
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=None):
+        """写完队列中的记录后停止写入线程，返回是否在 timeout 秒内完成."""
+        if timeout is None:
+            timeout = self.config['STOP_TIMEOUT']
+        with self.lock:
+            writer, self.writer = self.writer, None
+        if writer is None:
+            return True
+        deadline = time.time() + timeout
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        writer.join(max(0, deadline - time.time()))
+        return not writer.is_alive()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+    def _start_writer(self):
+        """第一次记录时才启动写入线程."""
+        if self.writer is not None:
+            return
+        with self.lock:
+            if self.writer is not None:
+                return
+            self.writer = threading.Thread(target=self._run, name='chat-history-writer')
+            self.writer.daemon = True
+            self.writer.start()
+            # 写入线程是守护线程，退出时不等它就会丢掉队列中的记录；
+            # stop() 之后写入线程会重新启动，退出处理只注册一次
+            if not self.exit_handler_registered:
+                atexit.register(self.stop)
+                self.exit_handler_registered = True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            # 从第一条记录开始最多等待 FLUSH_INTERVAL 秒，攒够一批就提前写入
+            deadline = time.time() + self.config['FLUSH_INTERVAL']
+            while len(batch) < self.config['BATCH_SIZE'] and batch[-1] is not _STOP:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                stopping = True
+            exchanges = [exchange for exchange in batch if exchange is not _STOP]
+            try:
+                if exchanges:
+                    self._write(exchanges)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        """在一个事务中写入一批；失败时（例如另一个进程同时创建了同一对话）逐条重试."""
+        try:
+            self._write_transaction(batch)
+        except Exception:
+            print("Failed to write chat history batch, retrying one by one:")
+            traceback.print_exc()
+            for exchange in batch:
+                try:
+                    self._write_transaction([exchange], get_or_create=True)
+                except Exception:
+                    print("Failed to write chat history:")
+                    traceback.print_exc()
+                    with self.lock:
+                        self.counters['errors'] += 1
+                        self.counters['dropped'] += 1
+            return
+        with self.lock:
+            self.counters['batches'] += 1
+
+    def _write_transaction(self, batch, get_or_create=False):
+        with transaction.atomic():
+            self._insert(batch, get_or_create)
+            for listener in self.listeners:
+                self._notify(listener, batch)
+        with self.lock:
+            self.counters['written'] += len(batch)
+
+    def _notify(self, listener, batch):
+        """listener 在保存点中执行，出错时只回滚它自己的修改，聊天记录照常写入."""
+        try:
+            with transaction.atomic():
+                listener(batch)
+        except Exception:
+            traceback.print_exc()
+            with self.lock:
+                self.counters['errors'] += 1
+
+    def _insert(self, batch, get_or_create=False):
+        keys = set(exchange['conversation'] for exchange in batch)
+        conversations = dict((conversation.key, conversation)
+                             for conversation in Conversation.objects.filter(key__in=keys))
+
+        for exchange in batch:
+            started_at = to_datetime(exchange['started_at'])
+            finished_at = to_datetime(exchange['started_at'] + (exchange['latency'] or 0))
+            conversation = conversations.get(exchange['conversation'])
+            if conversation is None and get_or_create:
+                conversation, _ = Conversation.objects.get_or_create(
+                    key=exchange['conversation'],
+                    defaults={'created_at': started_at, 'last_message_at': finished_at})
+                conversations[conversation.key] = conversation
+            elif conversation is None:
+                conversation = Conversation.objects.create(key=exchange['conversation'], created_at=started_at,
+                                                           last_message_at=finished_at)
+                conversations[conversation.key] = conversation
+            conversation.message_count += 2
+            conversation.last_message_at = max(conversation.last_message_at, finished_at)
+
+            Message.objects.create(conversation=conversation, role=Message.USER,
+                                   content=exchange['user_message'], created_at=started_at)
+            message = Message.objects.create(
+                conversation=conversation,
+                role=Message.ASSISTANT,
+                content=exchange['response'],
+                created_at=finished_at,
+                tool=exchange['tool'],
+                cache_status=exchange['cache_status'],
+                latency_ms=exchange['latency'] * 1000 if exchange['latency'] is not None else None,
+            )
+            if exchange['tool']:
+                ToolCall.objects.create(
+                    message=message,
+                    tool=exchange['tool'],
+                    arguments=json.dumps(exchange['arguments'] or {}, ensure_ascii=False, sort_keys=True),
+                    started_at=to_datetime(exchange['tool_started_at']) or started_at,
+                    duration_ms=(exchange['tool_duration'] * 1000
+                                 if exchange['tool_duration'] is not None else None),
+                    cache_hit=exchange['cache_hit'],
+                    ok=exchange['ok'],
+                )
+
+        for conversation in conversations.values():
+            conversation.save(update_fields=['last_message_at', 'message_count'])
+
+
+# 全局实例
+chat_history = ChatHistory()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import bisect
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+# 默认的消息组合 (消息, 权重)，覆盖每个工具和未匹配工具的情况
+DEFAULT_MIX = [
+    ('北京天气怎么样', 3),
+    ('计算 2+3*4', 2),
+    ('现在几点了', 2),
+    ('CA 州有什么天气警报', 1),
+    ('你好', 2),
+]
+
+
+def parse_mix(value):
+    """把 JSON 对象 {"消息": 权重} 或 JSON 文件路径解析为 (消息, 权重) 列表."""
+    if not value:
+        return list(DEFAULT_MIX)
+    if not value.lstrip().startswith('{'):
+        with open(value, 'rb') as f:
+            value = f.read().decode('utf-8')
+    mix = sorted(json.loads(value).items())
+    if not mix or any(weight <= 0 for _, weight in mix):
+        raise ValueError("The message mix needs at least one message with a positive weight")
+    return mix
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算百分位数，sorted_values 必须已排序."""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(p * len(sorted_values) / 100.0)) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def summarize(latencies):
+    """延迟（秒）的统计，单位为毫秒."""
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) * 1000 / len(values), 3),
+        'min': round(values[0] * 1000, 3),
+        'p50': round(percentile(values, 50) * 1000, 3),
+        'p95': round(percentile(values, 95) * 1000, 3),
+        'p99': round(percentile(values, 99) * 1000, 3),
+        'max': round(values[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                       stderr=subprocess.STDOUT).decode('ascii').strip()
+    except Exception:
+        return None
+
+
+class LoadRunner(object):
+    """用 concurrency 个线程在 duration 秒内不停调用 send(message).
+
+    send 返回 (结果标签, 是否成功)，例如 ("200 hit", True)；抛出异常时记为错误。
+    warmup 秒内的请求不计入统计。
+    """
+
+    def __init__(self, send, mix, concurrency=4, duration=10.0, warmup=0.0, seed=None):
+        self.send = send
+        self.mix = mix
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.by_message = {}
+        self.outcomes = {}
+        self.errors = 0
+
+    def run(self):
+        start = time.time()
+        self.measure_from = start + self.warmup
+        self.deadline = self.measure_from + self.duration
+        threads = [threading.Thread(target=self._work, args=(i,)) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - self.measure_from
+
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_rps': round(len(self.latencies) / elapsed, 2) if elapsed > 0 else None,
+            'latency_ms': summarize(self.latencies),
+            'outcomes': self.outcomes,
+            'messages': dict((message, summarize(latencies))
+                             for message, latencies in self.by_message.items()),
+        }
+
+    def _work(self, index):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        messages = [message for message, _ in self.mix]
+        cumulative = []
+        running = 0
+        for _, weight in self.mix:
+            running += weight
+            cumulative.append(running)
+
+        while True:
+            now = time.time()
+            if now >= self.deadline:
+                return
+            # 按权重随机选择消息
+            point = rng.random() * running
+            message = messages[min(bisect.bisect_right(cumulative, point), len(messages) - 1)]
+            try:
+                outcome, ok = self.send(message)
+                failed = not ok
+            except Exception as e:
+                outcome = 'error: ' + type(e).__name__
+                failed = True
+            latency = time.time() - now
+            if now < self.measure_from:
+                continue
+            with self.lock:
+                self.latencies.append(latency)
+                self.by_message.setdefault(message, []).append(latency)
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+                if failed:
+                    self.errors += 1
+
+
+def describe_environment(**extra):
+    """结果中用于跨提交、跨传输方式比较的元数据."""
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    info.update(extra)
+    return info
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import threading
+
+try:
+    from socketserver import ThreadingMixIn
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+except ImportError:
+    from SocketServer import ThreadingMixIn
+    from urllib2 import HTTPError, Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+
+from ...history import chat_history
+from ...loadtest import LoadRunner, describe_environment, parse_mix
+from ...mcp_client import MCPClientPool
+from ...mcp_utils import DEFAULT_SERVER_PYTHON, mcp_bot
+
+TRANSPORTS = ('client', 'wsgi', 'http', 'mcp')
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ("Load-test the chat path and print throughput and latency percentiles as JSON.\n\n"
+            "Transports: client (Django test client), wsgi (local threaded WSGI server), "
+            "http (an already running server, see --url) and mcp (SimpleMCPClient straight "
+            "to WeatherMCPServer, bypassing Django).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transport', choices=TRANSPORTS, default='client')
+        parser.add_argument('--concurrency', type=int, default=4, help="Concurrent workers (default 4).")
+        parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds (default 10).")
+        parser.add_argument('--warmup', type=float, default=1.0, help="Unmeasured seconds first (default 1).")
+        parser.add_argument('--mix', help='Message mix as a JSON object {"message": weight} or a JSON file.')
+        parser.add_argument('--pool-size', type=int, help="MCP server processes (default MCP_SERVER_POOL_SIZE).")
+        parser.add_argument('--url', help="Chat endpoint for the http transport.")
+        parser.add_argument('--seed', type=int, help="Seed for the message choice, for repeatable runs.")
+        parser.add_argument('--output', help="Also write the JSON result to this file "
+                                             "(stdout may also carry MCP client error messages).")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except (IOError, ValueError) as e:
+            raise CommandError("Invalid message mix: {}".format(e))
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError("--concurrency and --duration must be positive")
+
+        transport = options['transport']
+        pool_size = options['pool_size'] or getattr(settings, 'MCP_SERVER_POOL_SIZE', 1)
+        # 视图通过 mcp_bot 连接服务器，池大小在第一次连接时读取
+        mcp_bot.pool_size = pool_size
+        # 压测的对话不写入聊天记录和汇总表（本进程内的视图）
+        history_enabled = chat_history.config['ENABLED']
+        chat_history.config['ENABLED'] = False
+
+        try:
+            send, cleanup = getattr(self, '_setup_' + transport)(options, pool_size)
+            try:
+                runner = LoadRunner(send, mix, options['concurrency'], options['duration'],
+                                    options['warmup'], options['seed'])
+                result = runner.run()
+            finally:
+                cleanup()
+        finally:
+            chat_history.config['ENABLED'] = history_enabled
+            mcp_bot.pool_size = None
+
+        result['config'] = describe_environment(
+            transport=transport,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            warmup=options['warmup'],
+            pool_size=pool_size,
+            mix=dict(mix),
+            seed=options['seed'],
+        )
+        output = json.dumps(result, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                f.write(output.encode('utf-8'))
+        self.stdout.write(output)
+
+    def _setup_client(self, options, pool_size):
+        local = threading.local()
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        url = reverse('chat_api')
+
+        def send(message):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_HOST=host)
+            response = local.client.post(url, json.dumps({'message': message}),
+                                         content_type='application/json')
+            return self._outcome(response.status_code, response.content)
+
+        return send, mcp_bot.close
+
+    def _setup_wsgi(self, options, pool_size):
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        send = self._http_sender('http://127.0.0.1:{}{}'.format(server.server_port, reverse('chat_api')))
+
+        def cleanup():
+            server.shutdown()
+            server.server_close()
+            mcp_bot.close()
+
+        return send, cleanup
+
+    def _setup_http(self, options, pool_size):
+        if not options['url']:
+            raise CommandError("--url is required for the http transport")
+        return self._http_sender(options['url']), lambda: None
+
+    def _setup_mcp(self, options, pool_size):
+        server_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                   'mcp_server.py')
+        pool = MCPClientPool(getattr(settings, 'MCP_SERVER_PYTHON', DEFAULT_SERVER_PYTHON), [server_path], pool_size)
+        if not pool.connect():
+            raise CommandError("Could not start the MCP server")
+
+        def send(message):
+            tool_name, arguments = mcp_bot.route_message(message)
+            if not tool_name:
+                # 未匹配工具的消息在 Django 中直接返回备用响应，这里用 tools/list 代替
+                response = pool.send_request('tools/list')
+            else:
+                response = pool.call_tool(tool_name, arguments)
+            if not response or 'result' not in response:
+                return 'no result', False
+            if response['result'].get('isError'):
+                return 'tool error', False
+            return 'ok', True
+
+        return send, pool.close
+
+    def _http_sender(self, url):
+        def send(message):
+            request = Request(url, json.dumps({'message': message}).encode('utf-8'),
+                              {'Content-Type': 'application/json'})
+            try:
+                response = urlopen(request, timeout=60)
+                return self._outcome(response.getcode(), response.read())
+            except HTTPError as e:
+                return self._outcome(e.code, e.read())
+        return send
+
+    def _outcome(self, status, body):
+        """结果标签为状态码加缓存状态，例如 "200 hit"."""
+        label = str(status)
+        if status == 200:
+            try:
+                label += ' ' + json.loads(body.decode('utf-8')).get('cache', '')
+            except ValueError:
+                pass
+        return label.strip(), 200 <= status < 300
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...microbench import CASES, compare, measure
+
+
+class Command(BaseCommand):
+    help = ("Run the hot-path microbenchmarks and compare them with a baseline file.\n\n"
+            "Fails when a case is slower than its baseline by more than --threshold percent. "
+            "Baselines are machine specific: record one with --save-baseline on the machine "
+            "that runs the comparison.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', nargs='*', help="Only these cases (default: all).")
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'microbench_baseline.json'),
+                            help="Baseline file (default microbench_baseline.json in the project).")
+        parser.add_argument('--threshold', type=float, default=25.0,
+                            help="Allowed slowdown in percent before a case fails (default 25).")
+        parser.add_argument('--repeat', type=int, default=5, help="Measured rounds per case (default 5).")
+        parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline.")
+        parser.add_argument('--list', action='store_true', help="List the cases and exit.")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in CASES:
+                self.stdout.write(name)
+            return
+
+        names = options['cases'] or list(CASES)
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            raise CommandError("Unknown cases: " + ", ".join(unknown))
+
+        # 服务器会把调试日志写到当前目录，测量时切到临时目录
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp(prefix='microbench-')
+        os.chdir(workdir)
+        try:
+            results = OrderedDict()
+            for name in names:
+                results[name] = measure(CASES[name](), options['repeat'])
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f).get('cases', {})
+        changes, regressions = compare(results, baseline, options['threshold'])
+
+        for name in names:
+            result = results[name]
+            line = "{:<34} {:>12.3f} us  (median {:.3f} us, {} iterations)".format(
+                name, result['best_us'], result['median_us'], result['iterations'])
+            if name in changes:
+                line += "  {:+.1f}% vs baseline".format(changes[name])
+            style = self.style.ERROR if name in regressions else (lambda text: text)
+            self.stdout.write(style(line))
+
+        if options['save_baseline']:
+            baseline.update(results)
+            with open(options['baseline'], 'w') as f:
+                json.dump({'cases': baseline}, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS("Baseline saved to " + options['baseline']))
+        elif regressions:
+            raise CommandError("{} case(s) regressed by more than {}%: {}".format(
+                len(regressions), options['threshold'], ", ".join(regressions)))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...loadtest import describe_environment, summarize
+from ...mcp_replay import CHECKS, STATUS, Replayer, load_capture
+from ...mcp_server import WeatherMCPServer
+
+
+class Command(BaseCommand):
+    help = ("Replay a JSON-RPC capture into an in-process WeatherMCPServer and check the responses.\n\n"
+            "Record a capture by starting the MCP server with MCP_RECORD_FILE set. Prints latency "
+            "statistics for the replay and for the original run as JSON, and fails when responses "
+            "differ from the capture.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture', help="Capture file written by the MCP server (JSONL).")
+        parser.add_argument('--pacing', choices=('original', 'fast'), default='fast',
+                            help="Keep the recorded gaps between requests or send them back to back (default).")
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help="Divide the recorded gaps by this factor with --pacing original.")
+        parser.add_argument('--check', choices=CHECKS, default=STATUS,
+                            help="status: same result or error per request (default); "
+                                 "exact: identical results except time-dependent methods.")
+        parser.add_argument('--limit', type=int, help="Only replay the first N records.")
+        parser.add_argument('--output', help="Also write the JSON result to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            records = load_capture(options['capture'])
+        except IOError as e:
+            raise CommandError("Could not read the capture: {}".format(e))
+        if options['limit']:
+            records = records[:options['limit']]
+        if not records:
+            raise CommandError("The capture contains no records")
+        if options['speed'] <= 0:
+            raise CommandError("--speed must be positive")
+
+        # 服务器会把调试日志写到当前目录，回放时切到临时目录
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp(prefix='replay-')
+        os.chdir(workdir)
+        try:
+            replayer = Replayer(WeatherMCPServer(), records, options['pacing'] == 'original',
+                                options['speed'], options['check'])
+            report = replayer.run()
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        report['latency_ms'] = summarize(report.pop('latencies'))
+        report['original_latency_ms'] = summarize(report.pop('original_latencies'))
+        report['config'] = describe_environment(
+            capture=os.path.abspath(options['capture']),
+            pacing=options['pacing'],
+            speed=options['speed'],
+            check=options['check'],
+        )
+        output = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                f.write(output.encode('utf-8'))
+        self.stdout.write(output)
+
+        if report['mismatch_count']:
+            raise CommandError("{} of {} responses differ from the capture".format(
+                report['mismatch_count'], report['requests']))
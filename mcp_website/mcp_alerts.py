@@ -0,0 +1,242 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import calendar
+import datetime
+import heapq
+import json
+import os
+import re
+import threading
+import time
+
+_ISO_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$")
+
+
+def parse_timestamp(value):
+    """Epoch seconds for an ISO 8601 string (as used by CAP) or a number."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _ISO_RE.match(value.strip())
+    if not match:
+        raise ValueError("Invalid timestamp: " + value)
+    parts = [int(part) for part in match.groups()[:6]]
+    seconds = calendar.timegm(datetime.datetime(*parts).timetuple())
+    zone = match.group(7)
+    if zone and zone != "Z":
+        sign = -1 if zone[0] == "-" else 1
+        zone = zone[1:].replace(":", "")
+        seconds -= sign * (int(zone[:2]) * 3600 + int(zone[2:]) * 60)
+    return float(seconds)
+
+
+def _alert_states(properties):
+    """Two-letter state codes an alert applies to.
+
+    Uses an explicit "states" list when present, otherwise the state
+    prefix of the UGC zone codes (e.g. CAZ006 -> CA).
+    """
+    states = properties.get("states")
+    if not states:
+        geocode = properties.get("geocode") or {}
+        states = [zone[:2] for zone in geocode.get("UGC", [])]
+    return set(state.upper() for state in states if state)
+
+
+class AlertStore(object):
+    """Weather alerts indexed by state and expiry, loaded from a local feed.
+
+    The feed is a JSON Lines file with one GeoJSON Feature per line whose
+    properties follow the CAP fields used by the NWS alerts API (id, event,
+    severity, headline, areaDesc, geocode.UGC, effective, expires,
+    messageType). The feed is append-only: a later line with the same id
+    replaces the earlier alert, and messageType "Cancel" removes it.
+
+    Only the bytes appended since the last load are parsed. A file that
+    shrank, was replaced or was rewritten in place (detected by its first
+    bytes) is reloaded from the start.
+    """
+
+    # 用文件开头的字节判断文件是否被原地重写
+    HEAD_SIZE = 256
+
+    def __init__(self, path=None, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.alerts = {}
+        self.by_state = {}
+        # (expires, id) 小顶堆，过期淘汰时只看堆顶
+        self.expiry_heap = []
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.offset = 0
+        self.mtime = None
+        self.inode = None
+        self.head = b""
+        self.loaded = False
+        self.thread = None
+        self.counters = {
+            "reloads": 0,
+            "full_reloads": 0,
+            "lines_applied": 0,
+            "bad_lines": 0,
+            "evicted": 0
+        }
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get("MCP_ALERTS_FEED") or None,
+                   float(os.environ.get("MCP_ALERTS_RELOAD_INTERVAL", 5.0)))
+
+    def start(self):
+        """Start the background reloader; does nothing without a feed."""
+        if self.path is None or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="alert-reloader")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def after_fork(self):
+        """Restart the reloader in a forked child.
+
+        Only the forking thread survives a fork, so the locks may be held by
+        a reloader that no longer exists.
+        """
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.thread = None
+        self.start()
+
+    def get(self, state, now=None):
+        """Active alerts for a state code."""
+        if not self.loaded:
+            self.reload()
+        self.evict_expired(now)
+        with self.lock:
+            return list(self.by_state.get(state.upper(), {}).values())
+
+    def reload(self):
+        """Apply changes made to the feed since the last call."""
+        if self.path is None:
+            self.loaded = True
+            return
+        with self.reload_lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self.loaded = True
+                return
+            if self.loaded and stat.st_mtime == self.mtime and stat.st_size == self.offset:
+                return
+
+            with open(self.path, "rb") as f:
+                head = f.read(self.HEAD_SIZE)
+                full = (stat.st_size < self.offset or stat.st_ino != self.inode or
+                        not head.startswith(self.head))
+                start = 0 if full else self.offset
+                f.seek(start)
+                chunk = f.read(stat.st_size - start)
+            # 只处理完整的行，未写完的最后一行留到下次
+            end = chunk.rfind(b"\n") + 1
+            lines = chunk[:end].splitlines()
+
+            with self.lock:
+                if full:
+                    self._clear()
+                    self.counters["full_reloads"] += 1
+                for line in lines:
+                    self._apply_line(line)
+                self.counters["reloads"] += 1
+
+            self.offset = start + end
+            self.mtime = stat.st_mtime
+            self.inode = stat.st_ino
+            self.head = head[:self.offset]
+            self.loaded = True
+
+    def evict_expired(self, now=None):
+        """Drop alerts whose expiry time has passed."""
+        now = time.time() if now is None else now
+        with self.lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                expires, alert_id = heapq.heappop(self.expiry_heap)
+                alert = self.alerts.get(alert_id)
+                # 堆中可能有被更新过的旧记录，过期时间一致时才删除
+                if alert is not None and alert["expires_at"] == expires:
+                    self._remove(alert_id)
+                    self.counters["evicted"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update({
+                "alerts": len(self.alerts),
+                "states": len(self.by_state),
+                "offset": self.offset
+            })
+            return stats
+
+    def _run(self):
+        while True:
+            try:
+                self.reload()
+                self.evict_expired()
+            except Exception as e:
+                print("Alert reload failed: " + str(e))
+            time.sleep(self.reload_interval)
+
+    def _apply_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            feature = json.loads(line.decode("utf-8"))
+            properties = feature.get("properties") or {}
+            alert_id = properties.get("id") or feature.get("id")
+            if not alert_id:
+                raise ValueError("Alert without id")
+            if properties.get("messageType") == "Cancel":
+                self._remove(alert_id)
+            else:
+                self._add(alert_id, properties)
+            self.counters["lines_applied"] += 1
+        except (ValueError, TypeError, AttributeError):
+            self.counters["bad_lines"] += 1
+
+    def _add(self, alert_id, properties):
+        expires_at = parse_timestamp(properties.get("expires") or properties.get("ends"))
+        alert = {
+            "id": alert_id,
+            "event": properties.get("event", ""),
+            "severity": properties.get("severity", "Unknown"),
+            "headline": properties.get("headline") or properties.get("event", ""),
+            "area": properties.get("areaDesc", ""),
+            "effective": properties.get("effective"),
+            "expires": properties.get("expires"),
+            "expires_at": expires_at,
+            "states": sorted(_alert_states(properties))
+        }
+        self._remove(alert_id)
+        self.alerts[alert_id] = alert
+        for state in alert["states"]:
+            self.by_state.setdefault(state, {})[alert_id] = alert
+        if expires_at is not None:
+            heapq.heappush(self.expiry_heap, (expires_at, alert_id))
+
+    def _remove(self, alert_id):
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        for state in alert["states"]:
+            alerts = self.by_state.get(state)
+            if alerts is not None:
+                alerts.pop(alert_id, None)
+                if not alerts:
+                    del self.by_state[state]
+
+    def _clear(self):
+        self.alerts = {}
+        self.by_state = {}
+        self.expiry_heap = []
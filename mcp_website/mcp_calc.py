@@ -0,0 +1,205 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import ast
+import math
+import numbers
+import operator
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class CalculationError(Exception):
+    """Raised for expressions that are invalid or exceed the evaluation budget."""
+    pass
+
+
+# / 总是真除法（7/2 == 3.5），与 NumPy 向量化计算一致；整除用 //
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def _is_int(value):
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
+def _finite(value):
+    """Reject results JSON cannot represent: inf, nan and complex numbers."""
+    if isinstance(value, complex):
+        raise CalculationError("Result is not a real number")
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        raise CalculationError("Result is not a finite number")
+    return value
+
+
+class SafeCalculator(object):
+    """Arithmetic evaluator that compiles expressions to closures once.
+
+    Only numbers, the + - * / // % ** operators, parentheses, a top-level
+    tuple and (in batch mode) caller-supplied variable names are accepted.
+    An expression may contain at most max_steps nodes, and integer results
+    are refused once they would exceed max_bits bits, so inputs like 9**9**9
+    fail fast instead of running without limit.
+    """
+
+    def __init__(self, max_bits=4096, max_steps=200, max_length=1000, cache_size=1024):
+        self.max_bits = max_bits
+        self.max_steps = max_steps
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, expression, names=()):
+        """Return the compiled form of an expression, using the LRU cache."""
+        key = (expression, tuple(sorted(names)))
+        compiled = self._cache.pop(key, None)
+        if compiled is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            compiled = self._compile(expression, set(names))
+            if len(self._cache) >= self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = compiled
+        return compiled
+
+    def evaluate(self, expression, variables=None):
+        """Evaluate one expression, optionally with scalar variables.
+
+        Raises CalculationError for results that are not finite real numbers.
+        """
+        variables = variables or {}
+        result = self.compile(expression, variables.keys())(variables)
+        if isinstance(result, tuple):
+            return tuple(_finite(item) for item in result)
+        return _finite(result)
+
+    def evaluate_vectorized(self, expression, columns):
+        """Evaluate one expression over equally long arrays of variable values.
+
+        With NumPy the compiled expression runs once over float arrays,
+        otherwise it is evaluated row by row. Returns a list with None where a
+        row failed or the result is not finite.
+        """
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) > 1:
+            raise CalculationError("Variable arrays must have the same length")
+        size = lengths.pop() if lengths else 1
+        compiled = self.compile(expression, columns.keys())
+
+        if numpy is not None:
+            env = dict((name, numpy.asarray(values, dtype=float)) for name, values in columns.items())
+            with numpy.errstate(all="ignore"):
+                result = compiled(env)
+                if isinstance(result, tuple):
+                    raise CalculationError("Vectorized expressions must produce a single value")
+                result = numpy.broadcast_to(result, (size,)).astype(float)
+            return [float(value) if numpy.isfinite(value) else None for value in result]
+
+        results = []
+        for i in range(size):
+            try:
+                value = compiled(dict((name, values[i]) for name, values in columns.items()))
+            except (ArithmeticError, ValueError, CalculationError):
+                results.append(None)
+                continue
+            if isinstance(value, tuple):
+                raise CalculationError("Vectorized expressions must produce a single value")
+            # 与 NumPy 路径一样返回浮点数
+            try:
+                results.append(float(_finite(value)))
+            except (ArithmeticError, CalculationError):
+                results.append(None)
+        return results
+
+    def cache_info(self):
+        return {
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _compile(self, expression, names):
+        if len(expression) > self.max_length:
+            raise CalculationError("Expression is too long")
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError:
+            raise CalculationError("Invalid expression")
+        steps = [0]
+        # 元组只允许出现在最外层，避免 (1, 2) * 10**9 这样的内存炸弹
+        if isinstance(tree.body, ast.Tuple):
+            items = [self._compile_node(item, names, steps) for item in tree.body.elts]
+            return lambda env: tuple(item(env) for item in items)
+        return self._compile_node(tree.body, names, steps)
+
+    def _compile_node(self, node, names, steps):
+        steps[0] += 1
+        if steps[0] > self.max_steps:
+            raise CalculationError("Expression is too complex")
+
+        if isinstance(node, ast.Num) or (
+                hasattr(ast, "Constant") and isinstance(node, ast.Constant) and
+                isinstance(node.value, numbers.Number) and not isinstance(node.value, bool)):
+            value = node.n
+            self._check_bits(value)
+            return lambda env: value
+
+        if isinstance(node, ast.Name):
+            if node.id not in names:
+                raise CalculationError("Unknown name: " + node.id)
+            name = node.id
+            return lambda env: env[name]
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            op = _UNARY_OPS[type(node.op)]
+            operand = self._compile_node(node.operand, names, steps)
+            return lambda env: op(operand(env))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            left = self._compile_node(node.left, names, steps)
+            right = self._compile_node(node.right, names, steps)
+            if isinstance(node.op, ast.Pow):
+                return lambda env: self._pow(left(env), right(env))
+            if isinstance(node.op, ast.Mult):
+                return lambda env: self._mul(left(env), right(env))
+            op = _BINARY_OPS[type(node.op)]
+            return lambda env: self._check_bits(op(left(env), right(env)))
+
+        raise CalculationError("Unsupported expression: " + type(node).__name__)
+
+    def _check_bits(self, value):
+        if _is_int(value) and value.bit_length() > self.max_bits:
+            raise CalculationError("Result exceeds " + str(self.max_bits) + " bits")
+        return value
+
+    def _mul(self, left, right):
+        # 在计算之前估算结果位数，避免先算出超大整数
+        if _is_int(left) and _is_int(right) and left.bit_length() + right.bit_length() > self.max_bits + 1:
+            raise CalculationError("Result exceeds " + str(self.max_bits) + " bits")
+        return left * right
+
+    def _pow(self, base, exponent):
+        if _is_int(base) and _is_int(exponent) and exponent > 0 and abs(base) > 1:
+            if (base.bit_length() - 1) * exponent > self.max_bits:
+                raise CalculationError("Result exceeds " + str(self.max_bits) + " bits")
+        return self._check_bits(base ** exponent)
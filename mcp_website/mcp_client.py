@@ -1,11 +1,33 @@
 #!/usr/bin/env python2.7
 # -*- coding: utf-8 -*-
 
+import errno
 import json
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
 import subprocess
+import tempfile
 import threading
 import time
 
+from . import mcp_trace
+from .mcp_metrics import Metrics
+
+# 本进程内所有客户端共用的指标
+client_metrics = Metrics()
+
+# 每个请求和响应的调试输出，只记录方法名和 id，不序列化整个消息
+logger = logging.getLogger(__name__)
+
+
+def _error_response(message):
+    """A JSON-RPC error standing in for a batch response that never arrived."""
+    return {"jsonrpc": "2.0", "id": None, "error": {"code": -32603, "message": message}}
+
 
 class SimpleMCPClient:
     def __init__(self, command, args):
@@ -17,25 +39,17 @@ class SimpleMCPClient:
         self.responses = {}
         self.response_events = {}
         self.lock = threading.Lock()
+        # 多个线程共用一个管道时，保证每个请求行完整写入
+        self.write_lock = threading.Lock()
         self.reader_thread = None
         self.is_connected = False
+        # 最近一次收到服务器输出的时间，用于区分忙碌和卡死的进程
+        self.last_activity = time.time()
 
     def connect(self):
         """Connect to MCP server."""
         try:
-            full_command = [self.command] + self.args
-
-            # 🔧 最简单的进程创建方式
-            self.server_process = subprocess.Popen(
-                full_command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-                # 不使用任何特殊标志
-            )
-
-            # 等待一下让进程启动
-            time.sleep(0.5)
+            self.server_process = self._start_process()
 
             # 检查进程是否还在运行
             if self.server_process.poll() is not None:
@@ -60,6 +74,23 @@ class SimpleMCPClient:
             traceback.print_exc()  # 打印详细错误信息
             return False
 
+    def _start_process(self):
+        """Start the server process."""
+        full_command = [self.command] + self.args
+
+        # 🔧 最简单的进程创建方式
+        process = subprocess.Popen(
+            full_command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+            # 不使用任何特殊标志
+        )
+
+        # 等待一下让进程启动
+        time.sleep(0.5)
+        return process
+
     def _read_responses(self):
         """Continuously read responses from the server."""
         while self.server_process and self.server_process.poll() is None:
@@ -72,14 +103,21 @@ class SimpleMCPClient:
                 if not response_str:
                     continue
 
-                response = json.loads(response_str)
-                print("Received response: " + str(response))  # 调试输出
+                self.last_activity = time.time()
+                response = self._decode(response_str)
 
-                if "id" in response:
-                    req_id = response["id"]
-                    with self.lock:
-                        self.responses[req_id] = response
-                        if req_id in self.response_events:
+                # 批量请求的响应是一个数组
+                batch = response if isinstance(response, list) else [response]
+                logger.debug("Received %d response(s)", len(batch))
+                for item in batch:
+                    if "id" in item:
+                        req_id = item["id"]
+                        with self.lock:
+                            # 等待方已超时放弃的响应直接丢弃，否则会一直留在 responses 中
+                            if req_id not in self.response_events:
+                                client_metrics.inc("mcp_client_late_responses_total")
+                                continue
+                            self.responses[req_id] = item
                             self.response_events[req_id].set()
             except ValueError as e:
                 print("JSON decode error: " + str(e))
@@ -89,6 +127,12 @@ class SimpleMCPClient:
                 print("Error reading response: " + str(e))
                 break
 
+        # 服务器已退出：不再接收新请求，并立即唤醒等待中的请求（它们得到 None），不必等到超时
+        self.is_connected = False
+        with self.lock:
+            for event in self.response_events.values():
+                event.set()
+
     def send_request(self, method, params=None, timeout=10):  # 减少超时时间
         """Send a request to the MCP server."""
         if not self.server_process or self.server_process.poll() is not None:
@@ -104,46 +148,174 @@ class SimpleMCPClient:
 
         # For notifications, we don't expect a response
         if method == "notifications/initialized":
-            request_str = json.dumps(request) + "\n"
-            print("Sending notification: " + request_str.strip())  # 调试输出
+            request_str = self._encode(request)
+            logger.debug("Sending notification: %s", method)
             try:
-                self.server_process.stdin.write(request_str)
-                self.server_process.stdin.flush()
+                self._write(request_str)
                 return {"success": True}
             except Exception as e:
                 raise Exception("Failed to send notification: " + str(e))
 
         # For regular requests, we expect a response
-        with self.lock:
-            req_id = self.request_id
-            self.request_id += 1
-            request["id"] = req_id
-            event = threading.Event()
-            self.response_events[req_id] = event
+        labels = {"method": method}
+        trace = mcp_trace.current()
+        if trace is not None:
+            # 通过 _meta 把 trace id 传给服务器
+            request["params"] = dict(params or {}, _meta=trace.meta())
+        with client_metrics.track("mcp_client_requests", labels):
+            with self.lock:
+                req_id = self.request_id
+                self.request_id += 1
+                request["id"] = req_id
+                event = threading.Event()
+                self.response_events[req_id] = event
 
-        request_str = json.dumps(request) + "\n"
-        print("Sending request: " + request_str.strip())  # 调试输出
+            request_str = self._encode(request)
+            logger.debug("Sending request %d: %s", req_id, method)
+
+            queued_at = time.time()
+            try:
+                self._write(request_str, labels)
+            except Exception as e:
+                with self.lock:
+                    self.response_events.pop(req_id, None)
+                raise Exception("Failed to send request: " + str(e))
+            sent_at = time.time()
+
+            # Wait for the response
+            logger.debug("Waiting for response to request %d", req_id)
+            if not event.wait(timeout):
+                with self.lock:
+                    self.response_events.pop(req_id, None)
+                raise Exception("Request timed out")
+            received_at = time.time()
+            client_metrics.observe("mcp_client_round_trip_seconds", labels, received_at - sent_at)
 
-        try:
-            self.server_process.stdin.write(request_str)
-            self.server_process.stdin.flush()
-        except Exception as e:
             with self.lock:
+                response = self.responses.pop(req_id, None)
                 self.response_events.pop(req_id, None)
-            raise Exception("Failed to send request: " + str(e))
 
-        # Wait for the response
-        print("Waiting for response to request " + str(req_id))
-        if not event.wait(timeout):
+        if trace is not None:
+            trace.add("client.pipe_wait", queued_at, sent_at, method=method)
+            trace.add("client.round_trip", sent_at, received_at, method=method)
+            result = (response or {}).get("result")
+            if isinstance(result, dict) and isinstance(result.get("_meta"), dict):
+                trace.extend(result.pop("_meta").get("trace", []))
+        return response
+
+    def send_batch(self, requests, timeout=30):
+        """Send (method, params) pairs as one JSON-RPC batch.
+
+        Responses are returned in request order; requests that got no answer
+        before the timeout are returned as None.
+        """
+        if not requests:
+            return []
+        if not self.server_process or self.server_process.poll() is not None:
+            raise Exception("Server process is not running")
+
+        batch = []
+        events = []
+        with self.lock:
+            for method, params in requests:
+                req_id = self.request_id
+                self.request_id += 1
+                request = {
+                    "method": method,
+                    "jsonrpc": "2.0",
+                    "id": req_id
+                }
+                if params:
+                    request["params"] = params
+                event = threading.Event()
+                self.response_events[req_id] = event
+                batch.append(request)
+                events.append((req_id, event))
+
+        request_str = self._encode(batch)
+        logger.debug("Sending batch of %d requests", len(batch))
+
+        labels = {"method": "batch"}
+        with client_metrics.track("mcp_client_requests", labels) as outcome:
+            try:
+                self._write(request_str, labels)
+            except Exception as e:
+                with self.lock:
+                    for req_id, event in events:
+                        self.response_events.pop(req_id, None)
+                raise Exception("Failed to send batch: " + str(e))
+            sent_at = time.time()
+
+            deadline = time.time() + timeout
+            for req_id, event in events:
+                if not event.wait(max(0, deadline - time.time())):
+                    print("Batch timed out waiting for request " + str(req_id))
+                    outcome["error"] = True
+                    break
+            client_metrics.observe("mcp_client_round_trip_seconds", labels, time.time() - sent_at)
+
             with self.lock:
-                self.response_events.pop(req_id, None)
-            raise Exception("Request timed out")
+                responses = [self.responses.pop(req_id, None) for req_id, event in events]
+                for req_id, event in events:
+                    self.response_events.pop(req_id, None)
+        return responses
 
+    def _encode(self, message):
+        """把 JSON-RPC 请求（或批量请求）编码为一行."""
+        return json.dumps(message) + "\n"
+
+    def _decode(self, line):
+        """解码服务器返回的一行 JSON-RPC 响应."""
+        return json.loads(line)
+
+    def _write(self, request_str, labels=None):
+        """向服务器写入一行请求，labels 不为空时记录等待写锁的时间."""
+        queued_at = time.time()
+        with self.write_lock:
+            queue_wait = time.time() - queued_at
+            self.server_process.stdin.write(request_str)
+            self.server_process.stdin.flush()
+        if labels is not None:
+            client_metrics.observe("mcp_client_queue_wait_seconds", labels, queue_wait)
+
+    def ping(self, timeout=2):
+        """Check that the server answers a ping within timeout seconds."""
+        try:
+            response = self.send_request("ping", timeout=timeout)
+        except Exception:
+            return False
+        return bool(response) and "result" in response
+
+    def in_flight(self):
+        """Number of requests still waiting for a response."""
         with self.lock:
-            response = self.responses.pop(req_id, None)
-            self.response_events.pop(req_id, None)
+            return len(self.response_events)
 
-        return response
+    def drain(self, timeout=10):
+        """Stop taking new requests and wait for the in-flight ones to finish.
+
+        Returns False if requests were still pending after timeout seconds.
+        """
+        self.is_connected = False
+        deadline = time.time() + timeout
+        while self.in_flight():
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def table_sizes(self):
+        """Number of entries in the request bookkeeping tables."""
+        with self.lock:
+            return {
+                "responses": len(self.responses),
+                "response_events": len(self.response_events)
+            }
+
+    def memory(self, action="report", **params):
+        """Send a server/memory request, e.g. memory("report", diff=True)."""
+        params["action"] = action
+        return self.send_request("server/memory", params)
 
     def initialize(self):
         """Initialize the MCP connection."""
@@ -175,16 +347,42 @@ class SimpleMCPClient:
         }
         return self.send_request("tools/call", params)
 
-    def close(self):
-        """Close the connection to the server."""
+    def call_tools_batch(self, calls, timeout=30, item_timeout=0.5):
+        """Call several (name, arguments) tools in one batch.
+
+        The server runs the calls in turn and answers them together, so the
+        wait is timeout plus item_timeout per call. Calls left unanswered get
+        a timeout error response in their place.
+        """
+        requests = [("tools/call", {"name": name, "arguments": arguments})
+                    for name, arguments in calls]
+        responses = self.send_batch(requests, timeout + item_timeout * len(calls))
+        return [response if response is not None else _error_response("Request timed out")
+                for response in responses]
+
+    def close(self, timeout=10):
+        """Close the connection to the server.
+
+        In-flight requests get up to timeout seconds to finish; the server
+        then exits on EOF and is terminated if it has not within a second.
+        """
         self.is_connected = False
-        if self.server_process:
+        process = self.server_process
+        if process:
+            if process.poll() is None:
+                self.drain(timeout)
             try:
-                self.server_process.terminate()
-                self.server_process.wait()
+                with self.write_lock:
+                    process.stdin.close()
+                deadline = time.time() + 1
+                while process.poll() is None and time.time() < deadline:
+                    time.sleep(0.01)
+                if process.poll() is None:
+                    process.terminate()
+                process.wait()
             except:
                 try:
-                    self.server_process.kill()
+                    process.kill()
                 except:
                     pass
             self.server_process = None
@@ -198,3 +396,349 @@ class SimpleMCPClient:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
         self.close()
+
+
+class _SocketWriter(object):
+    """The write end of a unix socket; close() sends EOF but keeps reading possible."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+        except socket.error:
+            pass
+
+
+class ForkedProcess(object):
+    """Popen-like handle for a server forked by the zygote.
+
+    stdin and stdout are the two directions of the connection the server was
+    forked for. The server is not our child, so poll() checks the pid.
+    """
+
+    def __init__(self, sock):
+        self.socket = sock
+        self.stdin = _SocketWriter(sock)
+        self.stdout = sock.makefile("rb")
+        self.stderr = None
+        self.returncode = None
+        # 子进程先发送自己的 pid
+        line = self.stdout.readline()
+        if not line:
+            raise Exception("Zygote closed the connection before forking")
+        self.pid = int(line)
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 0)
+            except OSError as e:
+                if e.errno == errno.ESRCH:
+                    # 退出状态由 zygote 回收，这里无法得知
+                    self.returncode = -1
+        return self.returncode
+
+    def wait(self):
+        while self.poll() is None:
+            time.sleep(0.01)
+        self.socket.close()
+        return self.returncode
+
+    def send_signal(self, sig):
+        try:
+            os.kill(self.pid, sig)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class Zygote(object):
+    """A pre-initialized server process that forks ready servers on request.
+
+    The zygote loads the server's data once; each spawn() forks it, so a new
+    server is ready in milliseconds and shares the loaded data copy-on-write.
+    Its socket lives in a private (0700) temporary directory. Needs fork()
+    and unix sockets, see supported().
+    """
+
+    def __init__(self, command, args, start_timeout=60):
+        self.command = command
+        self.args = args
+        self.start_timeout = start_timeout
+        self.process = None
+        self.socket_dir = None
+        self.socket_path = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def supported():
+        return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the zygote unless it is running; False if it did not come up."""
+        with self.lock:
+            if self.alive:
+                return True
+            self._stop()
+            # mkdtemp 创建的目录只有本用户可以访问，其他用户无法连接套接字
+            self.socket_dir = tempfile.mkdtemp(prefix="mcp-zygote-")
+            self.socket_path = os.path.join(self.socket_dir, "zygote.sock")
+            self.process = subprocess.Popen(
+                [self.command] + self.args + ["--zygote", self.socket_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            if self._wait_ready():
+                return True
+            print("MCP zygote did not start")
+            self._stop()
+            return False
+
+    def _wait_ready(self):
+        """Wait for the "ready" line the zygote writes once it is listening."""
+        # 数据加载完成后 zygote 才开始监听；之前的其他输出忽略
+        deadline = time.time() + self.start_timeout
+        fd = self.process.stdout.fileno()
+        pending = b""
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if not readable:
+                return False
+            # 直接读文件描述符，避免数据停在文件对象的缓冲区里而 select 不再返回
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                return False
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if b"ready" in [line.strip() for line in lines]:
+                return True
+
+    def spawn(self):
+        """Fork a new server and return its Popen-like handle."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            return ForkedProcess(sock)
+        except Exception:
+            sock.close()
+            raise
+
+    def restart(self):
+        """Replace the zygote, e.g. to pick up new server code."""
+        with self.lock:
+            self._stop()
+        return self.start()
+
+    def close(self):
+        with self.lock:
+            self._stop()
+
+    def _stop(self):
+        if self.process is not None:
+            # zygote 在 stdin 关闭后退出，已 fork 的服务器不受影响
+            try:
+                self.process.stdin.close()
+                deadline = time.time() + 1
+                while self.process.poll() is None and time.time() < deadline:
+                    time.sleep(0.01)
+                if self.process.poll() is None:
+                    self.process.terminate()
+                self.process.wait()
+            except:
+                pass
+            self.process = None
+        if self.socket_dir is not None:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+            self.socket_dir = None
+
+
+class ZygoteMCPClient(SimpleMCPClient):
+    """SimpleMCPClient whose server is forked by a Zygote instead of started."""
+
+    def __init__(self, zygote):
+        SimpleMCPClient.__init__(self, zygote.command, zygote.args)
+        self.zygote = zygote
+
+    def _start_process(self):
+        if not self.zygote.start():
+            raise Exception("MCP zygote is not running")
+        return self.zygote.spawn()
+
+
+class MCPClientPool(object):
+    """A fixed number of server processes behind the SimpleMCPClient interface."""
+
+    def __init__(self, command, args, size=1, zygote=False):
+        self.command = command
+        self.args = args
+        # zygote 模式只在支持 fork 的平台上生效，否则照常启动进程
+        self.zygote = Zygote(command, args) if zygote and Zygote.supported() else None
+        self.clients = [self._new_client() for _ in range(max(1, size))]
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    @property
+    def is_connected(self):
+        return any(client.is_connected for client in self.clients)
+
+    def _new_client(self):
+        if self.zygote is not None:
+            return ZygoteMCPClient(self.zygote)
+        return SimpleMCPClient(self.command, self.args)
+
+    def connect(self):
+        """Connect all servers in parallel; succeeds if at least one is up."""
+        if self.zygote is not None:
+            self.zygote.start()
+        threads = [threading.Thread(target=client.connect) for client in self.clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.is_connected
+
+    def connected_clients(self):
+        return [client for client in self.clients if client.is_connected]
+
+    def _next_client(self):
+        """Pick the next connected client round-robin."""
+        with self.lock:
+            clients = self.connected_clients()
+            if not clients:
+                raise Exception("No connected MCP server")
+            self.next_index = (self.next_index + 1) % len(clients)
+            return clients[self.next_index]
+
+    def _call(self, call):
+        """Run call(client) on the next client.
+
+        If that server exits before answering, the call is retried once on
+        another server; all methods the pool exposes are read-only.
+        """
+        client = self._next_client()
+        try:
+            response = call(client)
+        except Exception:
+            if client.is_connected:
+                raise
+            response = None
+        if response is None and not client.is_connected:
+            client_metrics.inc("mcp_client_retries_total")
+            return call(self._next_client())
+        return response
+
+    def send_request(self, method, params=None, timeout=10):
+        return self._call(lambda client: client.send_request(method, params, timeout))
+
+    def list_tools(self):
+        return self._call(lambda client: client.list_tools())
+
+    def call_tool(self, name, arguments):
+        return self._call(lambda client: client.call_tool(name, arguments))
+
+    def call_tools_batch(self, calls, timeout=30, item_timeout=0.5):
+        """Split the calls across all connected servers and run them concurrently.
+
+        Calls sent to a server that failed get an error response each.
+        """
+        clients = self.connected_clients()
+        if not clients:
+            raise Exception("No connected MCP server")
+
+        chunk_size = (len(calls) + len(clients) - 1) // len(clients)
+        chunks = [(clients[i], calls[i * chunk_size:(i + 1) * chunk_size])
+                  for i in range(len(clients)) if calls[i * chunk_size:(i + 1) * chunk_size]]
+        results = [None] * len(chunks)
+
+        def run(index, client, chunk):
+            try:
+                results[index] = client.call_tools_batch(chunk, timeout, item_timeout)
+            except Exception as e:
+                print("Batch call failed: " + str(e))
+                results[index] = [_error_response("Batch call failed: " + str(e))] * len(chunk)
+
+        threads = [threading.Thread(target=run, args=(i, client, chunk))
+                   for i, (client, chunk) in enumerate(chunks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        responses = []
+        for result in results:
+            responses.extend(result)
+        return responses
+
+    def replace(self, index, drain_timeout=30, expected=None):
+        """Swap clients[index] for a freshly started server.
+
+        The replacement is connected before the swap and the old server is
+        drained afterwards, so no request sees a missing server. The swap
+        happens under the pool lock, which _next_client also takes, so no
+        request is handed the old client once draining starts. Returns
+        False, keeping the current client, if the replacement does not
+        start or if clients[index] is no longer expected (when given).
+        """
+        client = self._new_client()
+        if not client.connect():
+            client.close(0)
+            return False
+        with self.lock:
+            old = self.clients[index]
+            swapped = expected is None or old is expected
+            if swapped:
+                self.clients[index] = client
+                old.is_connected = False
+        if not swapped:
+            # 其他线程已经替换过这个位置
+            client.close(0)
+            return False
+        old.close(drain_timeout)
+        return True
+
+    def rolling_restart(self, drain_timeout=30):
+        """Replace the servers one at a time; returns how many were replaced."""
+        if self.zygote is not None:
+            # 新进程要用新代码，先替换 zygote
+            self.zygote.restart()
+        return sum(1 for index in range(len(self.clients)) if self.replace(index, drain_timeout))
+
+    def close(self, timeout=10):
+        """Drain and close all servers in parallel."""
+        threads = [threading.Thread(target=client.close, args=(timeout,)) for client in self.clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.zygote is not None:
+            self.zygote.close()
+
+    def __enter__(self):
+        if self.connect():
+            return self
+        raise Exception("Failed to connect to MCP server")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# 网格中每个时段保存的变量，风用 u/v 分量保存，便于插值
+VARIABLES = ("temperature", "wind_u", "wind_v", "precipitation", "cloud_cover")
+
+_COMPASS = ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+            "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW")
+
+NEAREST = "nearest"
+BILINEAR = "bilinear"
+METHODS = (NEAREST, BILINEAR)
+
+
+class ForecastError(Exception):
+    """Raised when a forecast cannot be produced for the requested location."""
+    pass
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ForecastError("The forecast engine requires NumPy")
+
+
+class GridIndex(object):
+    """Spatial index over a rectilinear latitude/longitude grid.
+
+    Both axes must be strictly increasing; they do not need to be evenly
+    spaced. Points are located with a binary search per axis, so a lookup
+    never scans the grid.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        self.latitudes = numpy.asarray(latitudes, dtype=float)
+        self.longitudes = numpy.asarray(longitudes, dtype=float)
+        for axis in (self.latitudes, self.longitudes):
+            if len(axis) < 2 or not (numpy.diff(axis) > 0).all():
+                raise ForecastError("Grid axes must be strictly increasing")
+
+    def contains(self, lats, lons):
+        """Boolean mask of the points that fall inside the grid."""
+        return ((lats >= self.latitudes[0]) & (lats <= self.latitudes[-1]) &
+                (lons >= self.longitudes[0]) & (lons <= self.longitudes[-1]))
+
+    def nearest(self, lats, lons):
+        """Row and column of the closest grid node for each point."""
+        i, wy = self._locate(self.latitudes, lats)
+        j, wx = self._locate(self.longitudes, lons)
+        return i + (wy >= 0.5), j + (wx >= 0.5)
+
+    def bilinear(self, lats, lons):
+        """Lower-left cell corner and fractional offsets for each point."""
+        i, wy = self._locate(self.latitudes, lats)
+        j, wx = self._locate(self.longitudes, lons)
+        return i, j, wy, wx
+
+    def _locate(self, axis, values):
+        i = numpy.clip(numpy.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+        weight = (values - axis[i]) / (axis[i + 1] - axis[i])
+        return i, numpy.clip(weight, 0.0, 1.0)
+
+
+class ForecastGrid(object):
+    """Gridded forecast data of shape (latitude, longitude, period, variable).
+
+    The data array is usually a read-only memory map, so only the cells
+    touched by a lookup are ever read from disk.
+    """
+
+    DATA_FILE = "grid.npy"
+    METADATA_FILE = "grid.json"
+
+    def __init__(self, data, metadata, source):
+        self.data = data
+        self.metadata = metadata
+        self.source = source
+        self.variables = list(metadata["variables"])
+        self.start_time = metadata["start_time"]
+        self.period_hours = metadata.get("period_hours", 12)
+        self.index = GridIndex(metadata["latitudes"], metadata["longitudes"])
+
+        expected = (len(self.index.latitudes), len(self.index.longitudes))
+        if data.ndim != 4 or data.shape[:2] != expected or data.shape[3] != len(self.variables):
+            raise ForecastError("Grid data shape does not match its metadata")
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a dataset written by save() or generate_synthetic()."""
+        _require_numpy()
+        data_path = os.path.join(directory, cls.DATA_FILE)
+        metadata_path = os.path.join(directory, cls.METADATA_FILE)
+        if not os.path.exists(data_path) or not os.path.exists(metadata_path):
+            raise ForecastError("No forecast dataset found in " + directory)
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        return cls(numpy.load(data_path, mmap_mode="r"), metadata, directory)
+
+    def save(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        numpy.save(os.path.join(directory, self.DATA_FILE), numpy.asarray(self.data))
+        with open(os.path.join(directory, self.METADATA_FILE), "w") as f:
+            json.dump(self.metadata, f)
+
+    @property
+    def period_count(self):
+        return self.data.shape[2]
+
+    def sample(self, lats, lons, method=BILINEAR):
+        """Values for many points at once.
+
+        Returns an array of shape (points, periods, variables) and the mask
+        of points inside the grid; rows for points outside are NaN.
+        """
+        if method not in METHODS:
+            raise ForecastError("Unknown interpolation method: " + str(method))
+        lats = numpy.asarray(lats, dtype=float).reshape(-1)
+        lons = numpy.asarray(lons, dtype=float).reshape(-1)
+        inside = self.index.contains(lats, lons)
+
+        if method == NEAREST:
+            i, j = self.index.nearest(lats, lons)
+            values = numpy.asarray(self.data[i, j], dtype=float)
+        else:
+            i, j, wy, wx = self.index.bilinear(lats, lons)
+            wy = wy[:, None, None]
+            wx = wx[:, None, None]
+            # 四个角点各读一次，内存映射只会加载这些单元
+            values = ((1 - wy) * (1 - wx) * self.data[i, j] +
+                      (1 - wy) * wx * self.data[i, j + 1] +
+                      wy * (1 - wx) * self.data[i + 1, j] +
+                      wy * wx * self.data[i + 1, j + 1])
+
+        values[~inside] = numpy.nan
+        return values, inside
+
+    def period_bounds(self, period):
+        start = self.start_time + period * self.period_hours * 3600
+        return start, start + self.period_hours * 3600
+
+
+def generate_synthetic(directory=None, resolution=1.0, periods=14, start_time=None):
+    """Build a deterministic global dataset for tests and local development.
+
+    Periods are 12 hours long and start at 06:00 local time today unless
+    start_time is given. When directory is set the dataset is written there
+    and returned memory-mapped.
+    """
+    _require_numpy()
+    if start_time is None:
+        today = datetime.date.today()
+        start_time = time.mktime(datetime.datetime(today.year, today.month, today.day, 6).timetuple())
+
+    latitudes = numpy.arange(-90.0, 90.0 + resolution / 2, resolution)
+    longitudes = numpy.arange(-180.0, 180.0 + resolution / 2, resolution)
+    lat = numpy.radians(latitudes)[:, None, None]
+    lon = numpy.radians(longitudes)[None, :, None]
+    t = numpy.arange(periods, dtype=float)[None, None, :]
+    daytime = (numpy.arange(periods) % 2 == 0)[None, None, :]
+
+    temperature = (85 - 60 * numpy.sin(lat) ** 2 + 5 * numpy.sin(3 * lon) +
+                   numpy.where(daytime, 8.0, -8.0) + 4 * numpy.sin(0.7 * t + 2 * lat))
+    wind_u = 12 * numpy.cos(3 * lat) + 4 * numpy.sin(t + lon)
+    wind_v = 6 * numpy.sin(2 * lon + 0.5 * t)
+    precipitation = numpy.clip(45 * numpy.sin(5 * lat + 3 * lon + 0.9 * t) + 30, 0, 100)
+    cloud_cover = numpy.clip(precipitation + 25 * numpy.cos(4 * lon - 0.6 * t) + 20, 0, 100)
+
+    shape = (len(latitudes), len(longitudes), periods)
+    data = numpy.stack([numpy.broadcast_to(v, shape) for v in
+                        (temperature, wind_u, wind_v, precipitation, cloud_cover)], axis=-1)
+    metadata = {
+        "latitudes": latitudes.tolist(),
+        "longitudes": longitudes.tolist(),
+        "variables": list(VARIABLES),
+        "start_time": start_time,
+        "period_hours": 12,
+        "synthetic": True
+    }
+    grid = ForecastGrid(data.astype(numpy.float32), metadata, "synthetic")
+    if directory is None:
+        return grid
+    grid.save(directory)
+    return ForecastGrid.load(directory)
+
+
+def wind_speed(u, v):
+    return numpy.hypot(u, v)
+
+
+def wind_direction(u, v):
+    """Compass point the wind blows from."""
+    degrees = (numpy.degrees(numpy.arctan2(-u, -v)) + 360) % 360
+    return numpy.array(_COMPASS)[(numpy.round(degrees / 22.5).astype(int)) % 16]
+
+
+def describe(temperature, precipitation, cloud_cover, is_daytime):
+    """Short NWS-style summary of one period."""
+    if precipitation >= 30:
+        kind = "Snow" if temperature <= 32 else "Rain"
+        if precipitation >= 60:
+            return kind + " Likely"
+        return "Chance Of " + kind
+    if cloud_cover < 25:
+        return "Sunny" if is_daytime else "Clear"
+    if cloud_cover < 50:
+        return "Mostly Sunny" if is_daytime else "Mostly Clear"
+    if cloud_cover < 75:
+        return "Partly Cloudy"
+    return "Mostly Cloudy"
+
+
+class ForecastEngine(object):
+    """Lazily loaded forecast lookups.
+
+    The dataset is opened on the first lookup, not at server start. With no
+    data directory a small synthetic grid is generated in memory instead,
+    and generated again once its start day has passed, so it never runs out
+    of periods ahead.
+    """
+
+    def __init__(self, data_dir=None, synthetic_resolution=2.0, max_periods=6):
+        self.data_dir = data_dir
+        self.synthetic_resolution = synthetic_resolution
+        self.max_periods = max_periods
+        self._grid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get("MCP_FORECAST_DATA") or None)
+
+    @property
+    def grid(self):
+        grid = self._grid
+        if grid is None or self._stale(grid):
+            with self._lock:
+                # 其他线程可能已经加载或重新生成
+                if self._grid is grid:
+                    if self.data_dir:
+                        self._grid = ForecastGrid.load(self.data_dir)
+                    else:
+                        self._grid = generate_synthetic(resolution=self.synthetic_resolution)
+                grid = self._grid
+        return grid
+
+    def _stale(self, grid):
+        """Whether a synthetic grid was generated for an earlier day."""
+        return (not self.data_dir and
+                datetime.date.fromtimestamp(grid.start_time) != datetime.date.today())
+
+    @property
+    def loaded(self):
+        return self._grid is not None
+
+    def current_periods(self, now=None):
+        """Indices of the periods that have not ended yet, at most max_periods."""
+        now = time.time() if now is None else now
+        grid = self.grid
+        periods = [p for p in range(grid.period_count) if grid.period_bounds(p)[1] > now]
+        return periods[:self.max_periods]
+
+    def forecast(self, latitude, longitude, method=BILINEAR, now=None):
+        """Structured forecast periods for one location."""
+        _require_numpy()
+        grid = self.grid
+        values, inside = grid.sample([latitude], [longitude], method)
+        if not inside[0]:
+            raise ForecastError("Location {:.4f}, {:.4f} is outside the forecast grid".format(latitude, longitude))
+        periods = self._describe_periods(now)
+
+        columns = dict((name, values[0, :, k]) for k, name in enumerate(grid.variables))
+        speeds = wind_speed(columns["wind_u"], columns["wind_v"])
+        directions = wind_direction(columns["wind_u"], columns["wind_v"])
+
+        result = []
+        for p, period in periods:
+            temperature = int(round(columns["temperature"][p]))
+            precipitation = int(round(columns["precipitation"][p]))
+            period = dict(period)
+            period.update({
+                "temperature": temperature,
+                "temperature_unit": "F",
+                "wind_speed": int(round(speeds[p])),
+                "wind_direction": str(directions[p]),
+                "precipitation_probability": precipitation,
+                "short_forecast": describe(temperature, precipitation, columns["cloud_cover"][p],
+                                           period["is_daytime"])
+            })
+            result.append(period)
+
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "method": method,
+            "source": grid.source,
+            "periods": result
+        }
+
+    def forecast_batch(self, latitudes, longitudes, method=BILINEAR, now=None):
+        """Forecasts for many locations in one vectorized pass.
+
+        The result is columnar: the periods are listed once, and every
+        value column is a list with one row per location and one entry per
+        period. Rows for locations outside the grid are None.
+        """
+        _require_numpy()
+        lats = numpy.asarray(latitudes, dtype=float).reshape(-1)
+        lons = numpy.asarray(longitudes, dtype=float).reshape(-1)
+        if lats.shape != lons.shape:
+            raise ForecastError("latitudes and longitudes must have the same length")
+
+        grid = self.grid
+        periods = self._describe_periods(now)
+        values, inside = grid.sample(lats, lons, method)
+        # 只保留当前时段，网格外的点先填 0，输出时再替换为 None
+        values = numpy.where(inside[:, None, None], values[:, [p for p, _ in periods], :], 0.0)
+        columns = dict((name, values[:, :, k]) for k, name in enumerate(grid.variables))
+
+        def rows(array):
+            array = array.tolist()
+            for i in numpy.flatnonzero(~inside):
+                array[i] = None
+            return array
+
+        return {
+            "method": method,
+            "source": grid.source,
+            "count": len(lats),
+            "periods": [period for _, period in periods],
+            "latitude": lats.tolist(),
+            "longitude": lons.tolist(),
+            "valid": inside.tolist(),
+            "temperature_unit": "F",
+            "temperature": rows(numpy.rint(columns["temperature"]).astype(int)),
+            "wind_speed": rows(numpy.rint(wind_speed(columns["wind_u"], columns["wind_v"])).astype(int)),
+            "wind_direction": rows(wind_direction(columns["wind_u"], columns["wind_v"])),
+            "precipitation_probability": rows(numpy.rint(columns["precipitation"]).astype(int)),
+            "cloud_cover": rows(numpy.rint(columns["cloud_cover"]).astype(int))
+        }
+
+    def _describe_periods(self, now=None):
+        """(grid period, description) pairs for the periods still ahead."""
+        periods = self.current_periods(now)
+        if not periods:
+            raise ForecastError("The forecast dataset has expired")
+
+        grid = self.grid
+        today = datetime.date.fromtimestamp(time.time() if now is None else now)
+        result = []
+        for number, p in enumerate(periods, 1):
+            start, end = grid.period_bounds(p)
+            start_dt = datetime.datetime.fromtimestamp(start)
+            is_daytime = 6 <= start_dt.hour < 18
+            result.append((p, {
+                "number": number,
+                "name": self._period_name(start_dt, is_daytime, today),
+                "start_time": start_dt.isoformat(),
+                "end_time": datetime.datetime.fromtimestamp(end).isoformat(),
+                "is_daytime": is_daytime
+            }))
+        return result
+
+    def _period_name(self, start, is_daytime, today):
+        if start.date() == today:
+            return "Today" if is_daytime else "Tonight"
+        if start.date() < today:
+            return "Overnight"
+        return start.strftime("%A") + ("" if is_daytime else " Night")
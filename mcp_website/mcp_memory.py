@@ -0,0 +1,198 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import collections
+import gc
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 没有 tracemalloc（除非安装了打过补丁的 pytracemalloc）
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块
+    resource = None
+
+
+def _max_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _print(message):
+    print(message)
+
+
+def _type_counts():
+    """Live GC-tracked objects per type, the fallback for allocation sites."""
+    counts = collections.Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        counts[cls.__module__ + "." + cls.__name__] += 1
+    return counts
+
+
+def _growth(previous, sample):
+    """Per-second change of every numeric total between two samples."""
+    elapsed = float(sample["time"] - previous["time"])
+    if elapsed <= 0:
+        return {}
+    rates = {}
+    for name in ("gc_objects", "max_rss_kb", "current_bytes"):
+        if sample.get(name) is not None and previous.get(name) is not None:
+            rates[name] = (sample[name] - previous[name]) / elapsed
+    tables = sample.get("tables") or {}
+    previous_tables = previous.get("tables") or {}
+    for name in tables:
+        if name in previous_tables:
+            rates["tables." + name] = (tables[name] - previous_tables[name]) / elapsed
+    return rates
+
+
+class MemoryInspector(object):
+    """Process memory reports built on tracemalloc snapshots.
+
+    start() begins tracing and takes a baseline snapshot; report() lists the
+    top allocation sites, either absolute or as a diff against the baseline.
+    Python 2 has no tracemalloc, so there start() takes a baseline of live
+    object counts per type instead and the "sites" reported are types. Every
+    report also carries the GC object count, peak RSS and the table sizes
+    supplied by the caller.
+    """
+
+    def __init__(self, max_samples=360):
+        self.baseline = None
+        self.samples = collections.deque(maxlen=max_samples)
+        self.sampler = None
+        self.sampler_stop = None
+        self.lock = threading.Lock()
+
+    @property
+    def available(self):
+        return tracemalloc is not None
+
+    @property
+    def tracing(self):
+        return self.available and tracemalloc.is_tracing()
+
+    def start(self, frames=10):
+        """Start tracing allocations and record the baseline snapshot."""
+        if not self.available:
+            self.baseline = _type_counts()
+            return True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot()
+        return True
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+        self.baseline = None
+
+    def report(self, tables=None, limit=10, diff=False, key_type="lineno"):
+        """Memory report; diff=True compares against the baseline snapshot."""
+        result = {
+            "tracemalloc": {"available": self.available, "tracing": self.tracing},
+            "gc_objects": len(gc.get_objects()),
+            "max_rss_kb": _max_rss_kb(),
+            "tables": tables or {}
+        }
+        if not self.available and self.baseline is not None:
+            result["top"] = self._type_report(limit, diff)
+            return result
+        if not self.tracing:
+            return result
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        result["tracemalloc"].update({"current_bytes": current, "peak_bytes": peak})
+
+        if diff and self.baseline is not None:
+            stats = snapshot.compare_to(self.baseline, key_type)[:limit]
+            result["top"] = [{
+                "site": str(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            } for stat in stats]
+        else:
+            stats = snapshot.statistics(key_type)[:limit]
+            result["top"] = [{
+                "site": str(stat.traceback),
+                "size_bytes": stat.size,
+                "count": stat.count
+            } for stat in stats]
+        return result
+
+    def _type_report(self, limit, diff):
+        counts = _type_counts()
+        if diff:
+            changes = sorted(((counts[name] - self.baseline.get(name, 0), name)
+                              for name in set(counts) | set(self.baseline)), reverse=True)[:limit]
+            return [{
+                "site": name,
+                "count": counts.get(name, 0),
+                "count_diff": change
+            } for change, name in changes]
+        return [{"site": name, "count": count} for name, count in counts.most_common(limit)]
+
+    def start_sampling(self, interval=10.0, tables=None, log=None):
+        """Record memory totals every interval seconds in a bounded history.
+
+        tables is an optional callable returning the caller's table sizes.
+        From the second sample on, each one carries the per-second growth
+        since the previous sample in "rates", which is also passed to log
+        (print by default; servers must not print, stdout is their channel).
+        """
+        with self.lock:
+            if self.sampler is not None:
+                return False
+            self.sampler_stop = threading.Event()
+            self.sampler = threading.Thread(target=self._sample,
+                                            args=(self.sampler_stop, interval, tables, log or _print),
+                                            name="memory-sampler")
+            self.sampler.daemon = True
+            self.sampler.start()
+            return True
+
+    def stop_sampling(self):
+        with self.lock:
+            if self.sampler is not None:
+                self.sampler_stop.set()
+                self.sampler.join()
+                self.sampler = None
+
+    def history(self):
+        return list(self.samples)
+
+    def _sample(self, stop_event, interval, tables, log):
+        previous = None
+        while True:
+            sample = {
+                "time": time.time(),
+                "gc_objects": len(gc.get_objects()),
+                "max_rss_kb": _max_rss_kb()
+            }
+            if self.tracing:
+                sample["current_bytes"], sample["peak_bytes"] = tracemalloc.get_traced_memory()
+            if tables is not None:
+                sample["tables"] = tables()
+            if previous is not None:
+                sample["rates"] = _growth(previous, sample)
+                log("Memory growth per second: " + ", ".join(
+                    "%s %+.1f" % (name, rate) for name, rate in sorted(sample["rates"].items())))
+            self.samples.append(sample)
+            previous = sample
+            if stop_event.wait(interval):
+                break
@@ -0,0 +1,162 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 固定的对数刻度桶（秒），1-2.5-5 序列，从 100 微秒到 60 秒
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0,
+)
+
+
+class Histogram(object):
+    """Latency histogram with fixed buckets; the last slot counts overflow."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "sum": self.sum,
+            "count": self.count
+        }
+
+
+class Metrics(object):
+    """Process-local counters, gauges and histograms keyed by name and labels.
+
+    Labels are passed as a dict. Every update takes one short lock, so
+    recording costs a couple of microseconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, self._label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels=None, delta=1):
+        key = (name, self._label_key(labels))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def observe(self, name, labels, value):
+        key = (name, self._label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def track(self, prefix, labels):
+        """Record one operation under a metric name prefix.
+
+        <prefix>_in_flight is raised while it runs; afterwards
+        <prefix>_total, <prefix>_duration_seconds and, on failure,
+        <prefix>_errors_total are updated. Exceptions count as errors and
+        are re-raised; the caller can also flag an error without raising by
+        setting outcome["error"] = True.
+        """
+        outcome = {"error": False}
+        self.gauge_add(prefix + "_in_flight", labels, 1)
+        start = time.time()
+        try:
+            yield outcome
+        except Exception:
+            outcome["error"] = True
+            raise
+        finally:
+            elapsed = time.time() - start
+            self.gauge_add(prefix + "_in_flight", labels, -1)
+            self.observe(prefix + "_duration_seconds", labels, elapsed)
+            self.inc(prefix + "_total", labels)
+            if outcome["error"]:
+                self.inc(prefix + "_errors_total", labels)
+
+    def snapshot(self):
+        """JSON-serializable copy of all metrics."""
+        with self.lock:
+            return {
+                "uptime_seconds": time.time() - self.started_at,
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                "histograms": [dict(histogram.to_dict(), name=name, labels=dict(labels))
+                               for (name, labels), histogram in sorted(self.histograms.items())]
+            }
+
+    def _label_key(self, labels):
+        return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = u"{}".format(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(u"{}=\"{}\"".format(key, value))
+    return u"{" + u",".join(pairs) + u"}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return u"+Inf"
+    return repr(float(value)) if isinstance(value, float) else u"{}".format(value)
+
+
+def render_prometheus(snapshots):
+    """Render (snapshot, extra labels) pairs in the Prometheus text format.
+
+    Samples of the same metric from several snapshots (for example one per
+    server process) are grouped under a single TYPE line.
+    """
+    families = {}
+    for snapshot, extra in snapshots:
+        for kind, key in (("counter", "counters"), ("gauge", "gauges"), ("histogram", "histograms")):
+            for sample in snapshot.get(key, []):
+                labels = dict(sample["labels"])
+                labels.update(extra or {})
+                families.setdefault((sample["name"], kind), []).append((labels, sample))
+
+    lines = []
+    for (name, kind), samples in sorted(families.items()):
+        lines.append(u"# TYPE {} {}".format(name, kind))
+        for labels, sample in samples:
+            if kind != "histogram":
+                lines.append(u"{}{} {}".format(name, _format_labels(labels), _format_value(sample["value"])))
+                continue
+            cumulative = 0
+            for bound, count in zip(list(sample["buckets"]) + [float("inf")], sample["counts"]):
+                cumulative += count
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append(u"{}_bucket{} {}".format(name, _format_labels(bucket_labels), cumulative))
+            lines.append(u"{}_sum{} {}".format(name, _format_labels(labels), _format_value(sample["sum"])))
+            lines.append(u"{}_count{} {}".format(name, _format_labels(labels), sample["count"]))
+    return u"\n".join(lines) + u"\n"
@@ -0,0 +1,95 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler(object):
+    """Statistical profiler that samples the stacks of all other threads.
+
+    While stopped there is no sampling thread and no hook installed, so it
+    costs nothing. Results are returned in the collapsed-stack format used
+    by flamegraph.pl and speedscope: one "frame;frame;frame count" per line.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = None
+        self.stacks = {}
+        self.samples = 0
+        self.interval = None
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=0.005, max_seconds=60):
+        """Start sampling every interval seconds; stops by itself after max_seconds."""
+        with self.lock:
+            if self.running:
+                return False
+            self.stacks = {}
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(self.stop_event, max_seconds),
+                                           name="sampling-profiler")
+            self.thread.daemon = True
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and return the results."""
+        with self.lock:
+            if self.thread is not None:
+                self.stop_event.set()
+                self.thread.join()
+                self.thread = None
+        return self.results()
+
+    def status(self):
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval": self.interval,
+            "started_at": self.started_at
+        }
+
+    def results(self):
+        end = self.stopped_at or time.time()
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "duration": end - self.started_at if self.started_at else 0,
+            "collapsed": self.collapsed()
+        }
+
+    def collapsed(self):
+        stacks = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return "\n".join("{} {}".format(stack, count) for stack, count in stacks)
+
+    def _run(self, stop_event, max_seconds):
+        me = threading.current_thread().ident
+        deadline = time.time() + max_seconds
+        while not stop_event.wait(self.interval) and time.time() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename),
+                                                    code.co_firstlineno))
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+        self.stopped_at = time.time()
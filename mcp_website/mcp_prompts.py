@@ -0,0 +1,266 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_ROLES = ("user", "assistant")
+
+
+class PromptError(Exception):
+    """Raised for invalid prompt templates or prompts/get arguments."""
+    pass
+
+
+def _compile_text(text, declared):
+    """Split text with {name} placeholders into (literal, name) pairs.
+
+    {{ and }} stand for literal braces. Placeholders must name a declared
+    argument; format specs and conversions are not allowed.
+    """
+    parts = []
+    try:
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field is not None:
+                if spec or conversion or not _NAME_RE.match(field):
+                    raise PromptError("Unsupported placeholder {" + field + "} in prompt text")
+                if field not in declared:
+                    raise PromptError("Placeholder {" + field + "} is not a declared argument")
+            parts.append((literal, field))
+    except ValueError as e:
+        raise PromptError("Invalid prompt text: " + str(e))
+    return tuple(parts)
+
+
+class PromptTemplate(object):
+    """A prompt whose messages are text templates over its declared arguments.
+
+    The message texts are parsed once, when the template is created;
+    render() only joins the literal parts with the argument values.
+    """
+
+    def __init__(self, name, description, arguments, messages):
+        if not _NAME_RE.match(name or ""):
+            raise PromptError("Invalid prompt name: " + repr(name))
+        self.name = name
+        self.description = description or ""
+        self.arguments = []
+        for argument in arguments or []:
+            if not _NAME_RE.match(argument.get("name") or ""):
+                raise PromptError("Invalid argument name in prompt " + name)
+            self.arguments.append({
+                "name": argument["name"],
+                "description": argument.get("description", ""),
+                "required": bool(argument.get("required", False))
+            })
+        self.argument_names = tuple(argument["name"] for argument in self.arguments)
+        self.required = frozenset(argument["name"] for argument in self.arguments if argument["required"])
+        if len(set(self.argument_names)) != len(self.argument_names):
+            raise PromptError("Duplicate argument in prompt " + name)
+
+        self.messages = []
+        for message in messages or []:
+            role = message.get("role", "user")
+            if role not in _ROLES:
+                raise PromptError("Invalid role " + repr(role) + " in prompt " + name)
+            self.messages.append((role, _compile_text(message.get("text", ""), self.argument_names)))
+        if not self.messages:
+            raise PromptError("Prompt " + name + " has no messages")
+
+    @classmethod
+    def from_dict(cls, data, default_name=None):
+        return cls(data.get("name") or default_name, data.get("description"),
+                   data.get("arguments"), data.get("messages"))
+
+    def describe(self):
+        """The prompts/list entry."""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "arguments": self.arguments
+        }
+
+    def values(self, arguments):
+        """Validated argument values as a tuple in declaration order."""
+        arguments = arguments or {}
+        unknown = set(arguments) - set(self.argument_names)
+        if unknown:
+            raise PromptError("Unknown argument(s) for prompt " + self.name + ": " + ", ".join(sorted(unknown)))
+        missing = [name for name in self.argument_names if name in self.required and arguments.get(name) in (None, "")]
+        if missing:
+            raise PromptError("Missing required argument(s) for prompt " + self.name + ": " + ", ".join(missing))
+        values = []
+        for name in self.argument_names:
+            value = arguments.get(name)
+            if value is None:
+                value = u""
+            elif isinstance(value, bytes):
+                value = value.decode("utf-8")
+            elif isinstance(value, (dict, list, bool)):
+                raise PromptError("Argument " + name + " of prompt " + self.name + " must be a string")
+            values.append(u"{}".format(value))
+        return tuple(values)
+
+    def render(self, values):
+        """MCP messages for a tuple returned by values()."""
+        variables = dict(zip(self.argument_names, values))
+        messages = []
+        for role, parts in self.messages:
+            text = u"".join([literal + variables[field] if field is not None else literal
+                             for literal, field in parts])
+            messages.append({"role": role, "content": {"type": "text", "text": text}})
+        return messages
+
+
+class PromptRegistry(object):
+    """Prompt templates registered in code or loaded from a directory.
+
+    Each *.json file in the directory holds one template (name, description,
+    arguments, messages with role and text); the name defaults to the file
+    name. A file overrides a template of the same name registered in code.
+    The directory is checked for changed mtimes at most every
+    reload_interval seconds, when prompts are listed or fetched. A file that
+    fails to load keeps its previous version.
+
+    Rendered message lists are cached by (name, argument values) in an LRU
+    cache, which is cleared whenever templates change.
+    """
+
+    def __init__(self, directory=None, reload_interval=2.0, cache_size=1024):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.cache_size = cache_size
+        self.builtin = {}
+        # 从目录加载的模板：名称 -> 模板，文件名 -> (mtime, 名称, 模板)
+        self.loaded = {}
+        self.files = {}
+        self.checked_at = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "reloads": 0,
+            "load_errors": 0
+        }
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get("MCP_PROMPTS_DIR") or None,
+                   float(os.environ.get("MCP_PROMPTS_RELOAD_INTERVAL", 2.0)))
+
+    def add(self, template):
+        with self.lock:
+            self.builtin[template.name] = template
+            self._cache.clear()
+
+    def templates(self):
+        """Current templates by name."""
+        self.maybe_reload()
+        with self.lock:
+            templates = dict(self.builtin)
+            templates.update(self.loaded)
+        return templates
+
+    def get(self, name):
+        self.maybe_reload()
+        with self.lock:
+            return self.loaded.get(name) or self.builtin.get(name)
+
+    def render(self, name, arguments):
+        """(template, messages) for a prompts/get call, or None for an unknown name.
+
+        The returned messages are shared with the cache and must not be modified.
+        """
+        template = self.get(name)
+        if template is None:
+            return None
+        key = (name, template.values(arguments))
+        with self.lock:
+            messages = self._cache.pop(key, None)
+            if messages is not None:
+                self.counters["hits"] += 1
+                self._cache[key] = messages
+                return template, messages
+            self.counters["misses"] += 1
+        messages = template.render(key[1])
+        with self.lock:
+            # 渲染期间模板可能已重新加载，只缓存仍是当前版本的结果
+            if (self.loaded.get(name) or self.builtin.get(name)) is template:
+                if len(self._cache) >= self.cache_size:
+                    self._cache.popitem(last=False)
+                self._cache[key] = messages
+        return template, messages
+
+    def maybe_reload(self, now=None):
+        """Reload the directory if reload_interval has passed since the last check."""
+        if self.directory is None:
+            return
+        now = time.time() if now is None else now
+        if self.checked_at is not None and now - self.checked_at < self.reload_interval:
+            return
+        self.checked_at = now
+        self.reload()
+
+    def reload(self):
+        """Load new and changed files and drop templates whose file was removed."""
+        if self.directory is None:
+            return
+        with self.reload_lock:
+            self._reload()
+
+    def _reload(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except OSError:
+            names = []
+
+        files = {}
+        changed = False
+        for filename in names:
+            path = os.path.join(self.directory, filename)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            previous = self.files.get(filename)
+            if previous is not None and previous[0] == mtime:
+                files[filename] = previous
+                continue
+            try:
+                with open(path, "rb") as f:
+                    template = PromptTemplate.from_dict(json.loads(f.read().decode("utf-8")), filename[:-5])
+            except (IOError, ValueError, AttributeError, PromptError):
+                self.counters["load_errors"] += 1
+                # 保留上一个可用版本（如果有），文件再次修改后才重试
+                files[filename] = (mtime,) + (previous[1:] if previous is not None else (None, None))
+                continue
+            files[filename] = (mtime, template.name, template)
+            changed = True
+
+        if changed or set(files) != set(self.files):
+            loaded = dict((entry[1], entry[2]) for entry in files.values() if entry[2] is not None)
+            with self.lock:
+                self.loaded = loaded
+                self._cache.clear()
+                self.counters["reloads"] += 1
+        self.files = files
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update({
+                "directory": self.directory,
+                "builtin": len(self.builtin),
+                "loaded": len(self.loaded),
+                "cache_size": len(self._cache),
+                "cache_max_size": self.cache_size
+            })
+        return stats
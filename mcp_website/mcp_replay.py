@@ -0,0 +1,193 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+
+# 返回结果随时间或进程状态变化的方法，只比较结果/错误的类型
+VOLATILE_METHODS = ("server/stats", "server/profile", "server/memory")
+VOLATILE_TOOLS = ("get_time",)
+
+STATUS = "status"
+EXACT = "exact"
+CHECKS = (STATUS, EXACT)
+
+
+class Recorder(object):
+    """Appends JSON-RPC request/response pairs to a JSONL capture file.
+
+    Each line is {"t": received, "d": seconds, "req": ..., "resp": ...}
+    where req is the decoded message as read from the transport (a dict or
+    a batch list) and resp is what was written back, or null for
+    notifications.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "ab")
+        self.count = 0
+
+    @classmethod
+    def from_environment(cls):
+        """A Recorder for MCP_RECORD_FILE, or None when recording is off."""
+        path = os.environ.get("MCP_RECORD_FILE")
+        return cls(path) if path else None
+
+    def record(self, request, response, received, sent):
+        line = json.dumps({
+            "t": round(received, 6),
+            "d": round(sent - received, 6),
+            "req": request,
+            "resp": response
+        }, separators=(",", ":"), ensure_ascii=False)
+        if not isinstance(line, bytes):
+            line = line.encode("utf-8")
+        with self.lock:
+            self.file.write(line + b"\n")
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def load_capture(path):
+    """Read the records of a capture file, skipping a truncated last line."""
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                # 进程被杀死时最后一行可能不完整
+                continue
+    return records
+
+
+def _strip_meta(value):
+    """Drop _meta entries, which carry per-request trace data."""
+    if isinstance(value, dict):
+        return dict((k, _strip_meta(v)) for k, v in value.items() if k != "_meta")
+    if isinstance(value, list):
+        return [_strip_meta(v) for v in value]
+    return value
+
+
+def _status(response):
+    if response is None:
+        return None
+    if "error" in response:
+        return "error"
+    result = response.get("result")
+    if isinstance(result, dict) and ("error" in result or result.get("isError")):
+        return "error"
+    return "ok"
+
+
+def _volatile(request):
+    method = request.get("method")
+    if method in VOLATILE_METHODS:
+        return True
+    return method == "tools/call" and (request.get("params") or {}).get("name") in VOLATILE_TOOLS
+
+
+def compare(request, expected, actual, check=STATUS):
+    """Return None if actual matches expected, otherwise a description."""
+    if isinstance(request, list):
+        expected = expected or []
+        actual = actual or []
+        if not isinstance(actual, list):
+            return "expected a batch response"
+        if len(expected) != len(actual):
+            return "batch returned {} responses, expected {}".format(len(actual), len(expected))
+        by_id = dict((r.get("id"), r) for r in request if isinstance(r, dict))
+        for exp, act in zip(expected, actual):
+            problem = compare(by_id.get(exp.get("id"), {}), exp, act, check)
+            if problem:
+                return "id {}: {}".format(exp.get("id"), problem)
+        return None
+
+    if (expected is None) != (actual is None):
+        return "expected {}, got {}".format("no response" if expected is None else "a response",
+                                            "none" if actual is None else "a response")
+    if expected is None:
+        return None
+    if _status(expected) != _status(actual):
+        return "status {}, expected {}".format(_status(actual), _status(expected))
+    if check == EXACT and not _volatile(request):
+        if _strip_meta(expected) != _strip_meta(actual):
+            return "result differs"
+    return None
+
+
+class Replayer(object):
+    """Feeds captured requests into a server and checks its responses.
+
+    pacing=True keeps the original gaps between requests (divided by
+    speed); otherwise requests are sent back to back. Requests run in the
+    calling thread, one at a time, as the stdio transport does.
+    """
+
+    def __init__(self, server, records, pacing=False, speed=1.0, check=STATUS, max_mismatches=20):
+        self.server = server
+        self.records = records
+        self.pacing = pacing
+        self.speed = speed
+        self.check = check
+        self.max_mismatches = max_mismatches
+
+    def handle(self, request):
+        if isinstance(request, list):
+            return self.server.handle_batch(request)
+        return self.server.handle_request(request)
+
+    def run(self):
+        """Replay all records and return latencies, lag and mismatches."""
+        latencies = []
+        original = []
+        mismatches = []
+        mismatch_count = 0
+        max_lag = 0.0
+        first = self.records[0]["t"] if self.records else 0
+        start = time.time()
+
+        for index, record in enumerate(self.records):
+            if self.pacing:
+                due = start + (record["t"] - first) / self.speed
+                delay = due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            # 服务器可能修改请求中的参数，比较时使用原始副本
+            request = json.loads(json.dumps(record["req"]))
+            received = time.time()
+            response = self.handle(request)
+            # 和传输层一样经过一次 JSON 编码，使结果可以和捕获内容比较
+            response = json.loads(json.dumps(response, ensure_ascii=False))
+            latencies.append(time.time() - received)
+            original.append(record.get("d", 0))
+
+            problem = compare(record["req"], record.get("resp"), response, self.check)
+            if problem:
+                mismatch_count += 1
+                if len(mismatches) < self.max_mismatches:
+                    mismatches.append({"index": index, "request": record["req"], "problem": problem})
+
+        return {
+            "requests": len(self.records),
+            "elapsed_seconds": round(time.time() - start, 3),
+            "latencies": latencies,
+            "original_latencies": original,
+            "max_lag_seconds": round(max_lag, 6),
+            "mismatch_count": mismatch_count,
+            "mismatches": mismatches
+        }
@@ -5,18 +5,53 @@ import calendar
 import datetime
 import json
 import sys
+import time
 import traceback
 
+import mcp_trace
+import mcp_zygote
+from mcp_alerts import AlertStore
+from mcp_calc import CalculationError, SafeCalculator
+from mcp_forecast import BILINEAR, METHODS, ForecastEngine, ForecastError
+from mcp_memory import MemoryInspector
+from mcp_metrics import Metrics
+from mcp_profile import SamplingProfiler
+from mcp_prompts import PromptRegistry, PromptTemplate
+from mcp_replay import Recorder
+from mcp_shmcache import SharedCache
+from mcp_uritemplate import UriTemplateRouter
+
 
 class StandardMCPServer(object):
+    # 指标中按方法名分类，其余方法统一记为 unknown，避免标签无限增长
+    KNOWN_METHODS = (
+        "initialize", "notifications/initialized", "tools/list", "tools/call",
+        "resources/list", "resources/read", "resources/templates/list",
+        "prompts/list", "prompts/get", "server/stats", "server/profile",
+        "server/memory", "ping",
+    )
+
     def __init__(self, name, version):
         """Initialize the MCP Server following official spec."""
         self.name = name
         self.version = version
         self.tools = {}
         self.resources = {}
+        # URI -> 资源名，resources/read 按 URI 精确查找
+        self.resource_uris = {}
+        self.resource_templates = {}
+        self.template_router = UriTemplateRouter()
         self.prompts = {}
+        # 模板提示词，设置 MCP_PROMPTS_DIR 时还会从该目录热加载
+        self.prompt_registry = PromptRegistry.from_environment()
         self.initialized = False
+        self.metrics = Metrics()
+        self.profiler = SamplingProfiler()
+        self.memory = MemoryInspector()
+        # 设置 MCP_RECORD_FILE 时把收发的消息记录下来，供 replay 命令回放
+        self.recorder = Recorder.from_environment()
+        # 设置 MCP_SHARED_CACHE 时工具结果缓存在共享内存文件中，所有进程共用
+        self.tool_cache = SharedCache.from_environment()
 
         # 调试日志
         self.debug_log("Standard MCP Server initialized: " + name)
@@ -31,13 +66,18 @@ class StandardMCPServer(object):
         except:
             pass
 
-    def register_tool(self, name, description, input_schema, handler):
-        """Register a tool following MCP standard."""
+    def register_tool(self, name, description, input_schema, handler, cache_ttl=0):
+        """Register a tool following MCP standard.
+
+        Results of tools with a cache_ttl are kept in the shared cache for
+        that many seconds.
+        """
         self.tools[name] = {
             "name": name,
             "description": description,
             "inputSchema": input_schema,
-            "handler": handler
+            "handler": handler,
+            "cache_ttl": cache_ttl
         }
         self.debug_log("Tool registered: " + name)
 
@@ -50,8 +90,25 @@ class StandardMCPServer(object):
             "mimeType": mime_type,
             "handler": handler
         }
+        self.resource_uris[uri] = name
         self.debug_log("Resource registered: " + name)
 
+    def register_resource_template(self, name, uri_template, description, mime_type, handler):
+        """Register a resource template (RFC 6570, e.g. weather://forecast/{lat}/{lon}).
+
+        handler(uri, variables) is called with the values matched from the URI.
+        """
+        info = {
+            "uriTemplate": uri_template,
+            "name": name,
+            "description": description,
+            "mimeType": mime_type,
+            "handler": handler
+        }
+        self.template_router.add(uri_template, info)
+        self.resource_templates[name] = info
+        self.debug_log("Resource template registered: " + name)
+
     def register_prompt(self, name, description, arguments, handler):
         """Register a prompt following MCP standard."""
         self.prompts[name] = {
@@ -62,6 +119,15 @@ class StandardMCPServer(object):
         }
         self.debug_log("Prompt registered: " + name)
 
+    def register_prompt_template(self, name, description, arguments, messages):
+        """Register a prompt rendered from text templates.
+
+        messages is a list of {"role", "text"} dicts whose text may contain
+        {argument} placeholders; they are checked against arguments here.
+        """
+        self.prompt_registry.add(PromptTemplate(name, description, arguments, messages))
+        self.debug_log("Prompt template registered: " + name)
+
     def handle_request(self, request):
         """Handle incoming request following MCP standard."""
         method = request.get("method")
@@ -70,49 +136,86 @@ class StandardMCPServer(object):
 
         self.debug_log("Handling request: " + method)
 
-        try:
-            # Standard MCP methods
-            if method == "initialize":
-                result = self._handle_initialize(params)
-            elif method == "notifications/initialized":
-                self.initialized = True
-                self.debug_log("Server initialized")
-                return None  # No response for notifications
-            elif method == "tools/list":
-                result = self._handle_list_tools()
-            elif method == "tools/call":
-                result = self._handle_call_tool(params)
-            elif method == "resources/list":
-                result = self._handle_list_resources()
-            elif method == "resources/read":
-                result = self._handle_read_resource(params)
-            elif method == "resources/templates/list":
-                result = self._handle_list_resource_templates()
-            elif method == "prompts/list":
-                result = self._handle_list_prompts()
-            elif method == "prompts/get":
-                result = self._handle_get_prompt(params)
-            else:
-                result = {"error": {"code": -32601, "message": "Method not found: " + method}}
+        labels = {"method": method if method in self.KNOWN_METHODS else "unknown"}
+        with self.metrics.track("mcp_server_requests", labels) as outcome:
+            try:
+                # Standard MCP methods
+                if method == "ping":
+                    # 健康检查，不做任何工作
+                    result = {}
+                elif method == "initialize":
+                    result = self._handle_initialize(params)
+                elif method == "notifications/initialized":
+                    self.initialized = True
+                    self.debug_log("Server initialized")
+                    return None  # No response for notifications
+                elif method == "tools/list":
+                    result = self._handle_list_tools()
+                elif method == "tools/call":
+                    result = self._handle_call_tool(params)
+                elif method == "resources/list":
+                    result = self._handle_list_resources()
+                elif method == "resources/read":
+                    result = self._handle_read_resource(params)
+                elif method == "resources/templates/list":
+                    result = self._handle_list_resource_templates()
+                elif method == "prompts/list":
+                    result = self._handle_list_prompts()
+                elif method == "prompts/get":
+                    result = self._handle_get_prompt(params)
+                elif method == "server/stats":
+                    result = self._handle_stats()
+                elif method == "server/profile":
+                    result = self._handle_profile(params)
+                elif method == "server/memory":
+                    result = self._handle_memory(params)
+                else:
+                    result = {"error": {"code": -32601, "message": "Method not found: " + method}}
+                    outcome["error"] = True
+
+                if request_id is not None:
+                    response = {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "result": result
+                    }
+                    self.debug_log("Sending response: " + str(response))
+                    return response
+            except Exception as e:
+                outcome["error"] = True
+                self.debug_log("Error handling request: " + str(e))
+                self.debug_log("Traceback: " + traceback.format_exc())
+                if request_id is not None:
+                    return {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "error": {"code": -32603, "message": str(e)}
+                    }
+        return None
 
-            if request_id is not None:
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": result
-                }
-                self.debug_log("Sending response: " + str(response))
-                return response
-        except Exception as e:
-            self.debug_log("Error handling request: " + str(e))
-            self.debug_log("Traceback: " + traceback.format_exc())
-            if request_id is not None:
-                return {
+    def handle_batch(self, requests):
+        """Handle a JSON-RPC batch, returning the non-notification responses."""
+        if not requests:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {"code": -32600, "message": "Invalid Request: empty batch"}
+            }
+
+        self.debug_log("Handling batch of " + str(len(requests)) + " requests")
+        responses = []
+        for request in requests:
+            if not isinstance(request, dict):
+                responses.append({
                     "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {"code": -32603, "message": str(e)}
-                }
-        return None
+                    "id": None,
+                    "error": {"code": -32600, "message": "Invalid Request"}
+                })
+                continue
+            response = self.handle_request(request)
+            if response:
+                responses.append(response)
+        return responses or None
 
     def _handle_initialize(self, params):
         """Handle initialize request with standard capabilities."""
@@ -162,9 +265,35 @@ class StandardMCPServer(object):
         if tool_name not in self.tools:
             raise Exception("Tool not found: " + tool_name)
 
-        handler = self.tools[tool_name]["handler"]
+        # 客户端在 _meta 中带上 traceId 时记录本次调用的各阶段耗时，随结果返回
+        meta = params.get("_meta") or {}
+        trace = mcp_trace.Trace(meta["traceId"], "mcp-server") if meta.get("traceId") else None
+
+        tool = self.tools[tool_name]
+        cache = self.tool_cache if tool["cache_ttl"] else None
+        with mcp_trace.activate(trace), mcp_trace.span("server.call_tool", tool=tool_name):
+            result = None
+            if cache is not None:
+                with mcp_trace.span("server.shared_cache"):
+                    result = cache.get(tool_name, arguments)
+            if result is not None:
+                self.metrics.inc("mcp_server_tool_cache_hits_total", {"tool": tool_name})
+            else:
+                with self.metrics.track("mcp_server_tool_calls", {"tool": tool_name}) as outcome:
+                    result = self._run_tool(tool["handler"], arguments)
+                    outcome["error"] = result["isError"]
+                if cache is not None and not result["isError"]:
+                    cache.set(tool_name, arguments, result, tool["cache_ttl"])
+
+        if trace is not None:
+            result["_meta"] = {"traceId": trace.id, "trace": trace.events}
+        return result
+
+    def _run_tool(self, handler, arguments):
+        """Run a tool handler and wrap its output in MCP content."""
         try:
-            result_content = handler(arguments)
+            with mcp_trace.span("tool.handler"):
+                result_content = handler(arguments)
 
             # 标准化响应格式
             if isinstance(result_content, dict) and "error" in result_content:
@@ -178,9 +307,14 @@ class StandardMCPServer(object):
                     "isError": True
                 }
             else:
-                content_text = json.dumps(result_content, ensure_ascii=False) if isinstance(result_content,
-                                                                                            dict) else str(
-                    result_content)
+                if isinstance(result_content, dict):
+                    with mcp_trace.span("tool.encode_result"):
+                        content_text = json.dumps(result_content, ensure_ascii=False)
+                elif isinstance(result_content, bytes):
+                    # 统一为 unicode，避免批量响应中 str/unicode 混合时编码失败
+                    content_text = result_content.decode("utf-8")
+                else:
+                    content_text = u"{}".format(result_content)
                 return {
                     "content": [
                         {
@@ -201,6 +335,74 @@ class StandardMCPServer(object):
                 "isError": True
             }
 
+    def _handle_stats(self):
+        """Handle server/stats request: metrics recorded by this process."""
+        return {
+            "serverInfo": {
+                "name": self.name,
+                "version": self.version
+            },
+            "metrics": self.metrics.snapshot(),
+            "toolCache": self.tool_cache.stats() if self.tool_cache is not None else None,
+            "prompts": self.prompt_registry.stats()
+        }
+
+    def _handle_profile(self, params):
+        """Handle server/profile request: start, stop or query the sampling profiler.
+
+        stop returns the samples in collapsed-stack format.
+        """
+        action = params.get("action", "status")
+        if action == "start":
+            started = self.profiler.start(float(params.get("interval", 0.005)),
+                                          float(params.get("max_seconds", 60)))
+            return dict(self.profiler.status(), started=started)
+        elif action == "stop":
+            return self.profiler.stop()
+        elif action == "status":
+            return self.profiler.status()
+        raise Exception("Unknown profile action: " + str(action))
+
+    def _handle_memory(self, params):
+        """Handle server/memory request.
+
+        Actions: report (top allocation sites, optionally diffed against the
+        baseline taken by start), start/stop tracemalloc (object counts per
+        type on Python 2), and sample_start/sample_stop/history for periodic
+        sampling, whose growth rates go to the debug log.
+        """
+        action = params.get("action", "report")
+        if action == "report":
+            return self.memory.report(self._table_sizes(), int(params.get("limit", 10)),
+                                      bool(params.get("diff")), params.get("key_type", "lineno"))
+        elif action == "start":
+            return {"tracing": self.memory.start(int(params.get("frames", 10)))}
+        elif action == "stop":
+            self.memory.stop()
+            return {"tracing": False}
+        elif action == "sample_start":
+            return {"sampling": self.memory.start_sampling(float(params.get("interval", 10.0)),
+                                                           self._table_sizes, self.debug_log)}
+        elif action == "sample_stop":
+            self.memory.stop_sampling()
+            return {"sampling": False}
+        elif action == "history":
+            return {"samples": self.memory.history()}
+        raise Exception("Unknown memory action: " + str(action))
+
+    def _table_sizes(self):
+        """Sizes of the in-memory tables this server keeps."""
+        metrics = self.metrics
+        return {
+            "tools": len(self.tools),
+            "resources": len(self.resources),
+            "resource_templates": len(self.template_router),
+            "prompts": len(self.prompts),
+            "prompt_cache": len(self.prompt_registry._cache),
+            "metric_series": len(metrics.counters) + len(metrics.gauges) + len(metrics.histograms),
+            "profiler_stacks": len(self.profiler.stacks)
+        }
+
     def _handle_list_resources(self):
         """Handle resources/list request."""
         resources_list = []
@@ -214,27 +416,57 @@ class StandardMCPServer(object):
         return {"resources": resources_list}
 
     def _handle_read_resource(self, params):
-        """Handle resources/read request."""
+        """Handle resources/read request: exact URIs first, then templates."""
         uri = params.get("uri")
-        # 简化实现，实际应该根据 URI 找到对应的资源
+        if not uri:
+            raise Exception("Missing resource uri")
+
+        name = self.resource_uris.get(uri)
+        if name is not None:
+            info = self.resources[name]
+            content = info["handler"](uri)
+        else:
+            route = self.template_router.resolve(uri)
+            if route is None:
+                raise Exception("Resource not found: " + uri)
+            info, variables = route
+            content = info["handler"](uri, variables)
+
+        if isinstance(content, (dict, list)):
+            text = json.dumps(content, ensure_ascii=False)
+        elif isinstance(content, bytes):
+            text = content.decode("utf-8")
+        else:
+            text = u"{}".format(content)
         return {
             "contents": [
                 {
                     "uri": uri,
-                    "mimeType": "text/plain",
-                    "text": "Resource content for: " + uri
+                    "mimeType": info["mimeType"],
+                    "text": text
                 }
             ]
         }
 
     def _handle_list_resource_templates(self):
         """Handle resources/templates/list request."""
-        return {"resourceTemplates": []}
+        templates_list = []
+        for template_name, template_info in self.resource_templates.items():
+            templates_list.append({
+                "uriTemplate": template_info["uriTemplate"],
+                "name": template_info["name"],
+                "description": template_info["description"],
+                "mimeType": template_info["mimeType"]
+            })
+        return {"resourceTemplates": templates_list}
 
     def _handle_list_prompts(self):
         """Handle prompts/list request."""
-        prompts_list = []
+        templates = self.prompt_registry.templates()
+        prompts_list = [template.describe() for template in templates.values()]
         for prompt_name, prompt_info in self.prompts.items():
+            if prompt_name in templates:
+                continue
             prompts_list.append({
                 "name": prompt_info["name"],
                 "description": prompt_info["description"],
@@ -247,6 +479,14 @@ class StandardMCPServer(object):
         name = params.get("name")
         arguments = params.get("arguments", {})
 
+        rendered = self.prompt_registry.render(name, arguments)
+        if rendered is not None:
+            template, messages = rendered
+            return {
+                "description": template.description,
+                "messages": messages
+            }
+
         if name not in self.prompts:
             raise Exception("Prompt not found: " + name)
 
@@ -258,6 +498,13 @@ class StandardMCPServer(object):
             "messages": result.get("messages", [])
         }
 
+    def preload(self):
+        """Load lazily loaded data up front; called in zygote mode before forking."""
+
+    def after_fork(self):
+        """Reset per-process state in a server forked by the zygote."""
+        self.metrics = Metrics()
+
     def run(self):
         """Run the MCP server."""
         self.debug_log("Standard MCP Server starting...")
@@ -274,16 +521,25 @@ class StandardMCPServer(object):
                     continue
 
                 self.debug_log("Received: " + line)
+                received = time.time()
 
                 try:
                     request = json.loads(line)
-                    response = self.handle_request(request)
+                    if isinstance(request, list):
+                        response = self.handle_batch(request)
+                    else:
+                        response = self.handle_request(request)
 
                     if response:
                         response_str = json.dumps(response, ensure_ascii=False)
+                        if not isinstance(response_str, bytes):
+                            # 管道的默认编码是 ascii，需要显式编码
+                            response_str = response_str.encode("utf-8")
                         sys.stdout.write(response_str + "\n")
                         sys.stdout.flush()
                         self.debug_log("Sent: " + response_str)
+                    if self.recorder is not None:
+                        self.recorder.record(request, response, received, time.time())
 
                 except ValueError as e:
                     self.debug_log("JSON parse error: " + str(e))
@@ -312,6 +568,12 @@ class StandardMCPServer(object):
 class WeatherMCPServer(StandardMCPServer):
     def __init__(self):
         super(WeatherMCPServer, self).__init__("weather-server", "1.6.0")
+        self.calculator = SafeCalculator()
+        # 数据集在第一次查询时才加载，见 MCP_FORECAST_DATA
+        self.forecast_engine = ForecastEngine.from_environment()
+        # 警报数据来自本地 feed（MCP_ALERTS_FEED），后台线程增量加载
+        self.alert_store = AlertStore.from_environment()
+        self.alert_store.start()
         self._register_tools()
         self._register_resources()
         self._register_prompts()
@@ -322,7 +584,7 @@ class WeatherMCPServer(StandardMCPServer):
         # 天气预报工具
         self.register_tool(
             "get_forecast",
-            "Get weather forecast for a location.\n\nArgs:\n    latitude: Latitude of the location\n    longitude: Longitude of the location",
+            "Get weather forecast for a location.\n\nArgs:\n    latitude: Latitude of the location\n    longitude: Longitude of the location\n    method: Grid interpolation, nearest or bilinear (default)",
             {
                 "type": "object",
                 "properties": {
@@ -333,12 +595,47 @@ class WeatherMCPServer(StandardMCPServer):
                     "longitude": {
                         "title": "Longitude",
                         "type": "number"
+                    },
+                    "method": {
+                        "title": "Method",
+                        "type": "string",
+                        "enum": list(METHODS)
                     }
                 },
                 "required": ["latitude", "longitude"],
                 "title": "get_forecastArguments"
             },
-            self._get_forecast
+            self._get_forecast,
+            cache_ttl=300
+        )
+
+        # 批量天气预报工具
+        self.register_tool(
+            "get_forecast_batch",
+            "Get weather forecasts for many locations at once.\n\nReturns columnar data: one row per location in each value column.\n\nArgs:\n    latitudes: Latitudes of the locations\n    longitudes: Longitudes of the locations (same length)\n    method: Grid interpolation, nearest or bilinear (default)",
+            {
+                "type": "object",
+                "properties": {
+                    "latitudes": {
+                        "title": "Latitudes",
+                        "type": "array",
+                        "items": {"type": "number"}
+                    },
+                    "longitudes": {
+                        "title": "Longitudes",
+                        "type": "array",
+                        "items": {"type": "number"}
+                    },
+                    "method": {
+                        "title": "Method",
+                        "type": "string",
+                        "enum": list(METHODS)
+                    }
+                },
+                "required": ["latitudes", "longitudes"],
+                "title": "get_forecast_batchArguments"
+            },
+            self._get_forecast_batch
         )
 
         # 天气警报工具
@@ -356,7 +653,8 @@ class WeatherMCPServer(StandardMCPServer):
                 "required": ["state"],
                 "title": "get_alertsArguments"
             },
-            self._get_alerts
+            self._get_alerts,
+            cache_ttl=5
         )
 
         # 时间工具
@@ -388,60 +686,175 @@ class WeatherMCPServer(StandardMCPServer):
                 "required": ["expression"],
                 "title": "calculateArguments"
             },
-            self._calculate
+            self._calculate,
+            cache_ttl=3600
+        )
+
+        # 批量计算工具
+        self.register_tool(
+            "calculate_batch",
+            "Evaluate many arithmetic expressions at once.\n\nArgs:\n    expressions: List of expressions to evaluate\n    expression: One expression using variable names, evaluated over `variables`\n    variables: Mapping of variable name to an array of values (all the same length)",
+            {
+                "type": "object",
+                "properties": {
+                    "expressions": {
+                        "title": "Expressions",
+                        "type": "array",
+                        "items": {"type": "string"}
+                    },
+                    "expression": {
+                        "title": "Expression",
+                        "type": "string"
+                    },
+                    "variables": {
+                        "title": "Variables",
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "array",
+                            "items": {"type": "number"}
+                        }
+                    }
+                },
+                "required": [],
+                "title": "calculate_batchArguments"
+            },
+            self._calculate_batch
         )
 
     def _register_resources(self):
         """Register standard resources."""
         # 可以添加资源，如配置文件、数据文件等
-        pass
+        self.register_resource_template(
+            "forecast",
+            "weather://forecast/{latitude}/{longitude}",
+            "Weather forecast for a location, as returned by get_forecast",
+            "application/json",
+            self._read_forecast
+        )
+        self.register_resource_template(
+            "alerts",
+            "weather://alerts/{state}",
+            "Active weather alerts for a US state, as returned by get_alerts",
+            "application/json",
+            self._read_alerts
+        )
 
     def _register_prompts(self):
         """Register standard prompts."""
-        # 可以添加提示模板
-        pass
-
-    def _get_forecast(self, args):
-        """模拟天气预报数据."""
-        latitude = args.get("latitude", 0)
-        longitude = args.get("longitude", 0)
-
-        # 模拟天气数据
-        forecast_data = """
-Today:
-Temperature: 64°F
-Wind: 2 to 18 mph S
-Forecast: Mostly sunny. High near 64, with temperatures falling to around 62 in the afternoon. South wind 2 to 18 mph, with gusts as high as 30 mph.
-
----
-
-Tonight:
-Temperature: 57°F
-Wind: 12 to 17 mph S
-Forecast: Mostly cloudy. Low around 57, with temperatures rising to around 59 overnight. South wind 12 to 17 mph, with gusts as high as 29 mph.
+        # 提示模板，可被 MCP_PROMPTS_DIR 中的同名文件覆盖
+        self.register_prompt_template(
+            "weather_report",
+            "Summarize the forecast for a place in plain language",
+            [
+                {"name": "location", "description": "City name or 'latitude,longitude'", "required": True}
+            ],
+            [
+                {"role": "user",
+                 "text": "Use the get_forecast tool to get the forecast for {location}, then write a short "
+                         "weather report. Mention temperatures, wind and the chance of rain, and point out "
+                         "anything that needs preparation."}
+            ]
+        )
+        self.register_prompt_template(
+            "alert_briefing",
+            "Brief the active weather alerts for a US state",
+            [
+                {"name": "state", "description": "Two-letter US state code (e.g. CA, NY)", "required": True}
+            ],
+            [
+                {"role": "user",
+                 "text": "Use the get_alerts tool for {state} and brief the active alerts, most severe first. "
+                         "For each alert give the event, the affected area and when it expires. If there are "
+                         "none, say so in one sentence."}
+            ]
+        )
+        self.register_prompt_template(
+            "explain_calculation",
+            "Evaluate an expression and explain the steps",
+            [
+                {"name": "expression", "description": "Arithmetic expression to evaluate", "required": True}
+            ],
+            [
+                {"role": "user",
+                 "text": "Use the calculate tool to evaluate {expression}, then explain step by step how the "
+                         "result follows from operator precedence."}
+            ]
+        )
 
----
+    def preload(self):
+        # 子进程通过写时复制共享已加载的预报网格和警报
+        self.forecast_engine.grid
+        self.alert_store.reload()
+
+    def after_fork(self):
+        super(WeatherMCPServer, self).after_fork()
+        self.alert_store.after_fork()
+
+    def _handle_stats(self):
+        """附加计算缓存、预报数据和警报索引的状态."""
+        stats = super(WeatherMCPServer, self)._handle_stats()
+        stats.update({
+            "calculator": self.calculator.cache_info(),
+            "forecast": {"loaded": self.forecast_engine.loaded},
+            "alerts": self.alert_store.stats()
+        })
+        return stats
+
+    def _table_sizes(self):
+        sizes = super(WeatherMCPServer, self)._table_sizes()
+        sizes.update({
+            "calculator_cache": len(self.calculator._cache),
+            "alerts": len(self.alert_store.alerts),
+            "alert_states": len(self.alert_store.by_state),
+            "alert_expiry_heap": len(self.alert_store.expiry_heap)
+        })
+        return sizes
+
+    def _read_forecast(self, uri, variables):
+        result = self._get_forecast(variables)
+        if "error" in result:
+            raise Exception(result["error"])
+        return result
 
-Saturday:
-Temperature: 78°F
-Wind: 12 to 21 mph SW
-Forecast: Partly sunny, with a high near 78. Southwest wind 12 to 21 mph, with gusts as high as 32 mph.
+    def _read_alerts(self, uri, variables):
+        return self._get_alerts(variables)
 
----
+    def _get_forecast(self, args):
+        """从本地网格数据集查询天气预报."""
+        try:
+            latitude = float(args.get("latitude", 0))
+            longitude = float(args.get("longitude", 0))
+            return self.forecast_engine.forecast(latitude, longitude, args.get("method", BILINEAR))
+        except (ForecastError, TypeError, ValueError) as e:
+            return {"error": str(e)}
 
-Location: {:.4f}, {:.4f}
-""".format(latitude, longitude)
+    # 单次批量预报最多的位置数
+    MAX_FORECAST_LOCATIONS = 10000
 
-        return forecast_data
+    def _get_forecast_batch(self, args):
+        """批量查询天气预报，一次向量化计算所有位置."""
+        latitudes = args.get("latitudes") or []
+        longitudes = args.get("longitudes") or []
+        if len(latitudes) > self.MAX_FORECAST_LOCATIONS:
+            return {"error": "At most " + str(self.MAX_FORECAST_LOCATIONS) + " locations per request"}
+        try:
+            return self.forecast_engine.forecast_batch(latitudes, longitudes, args.get("method", BILINEAR))
+        except (ForecastError, TypeError, ValueError) as e:
+            return {"error": str(e)}
 
     def _get_alerts(self, args):
-        """模拟天气警报数据."""
-        state = args.get("state", "")
-
+        """从本地警报索引查询某个州的天气警报."""
+        state = args.get("state", "").strip().upper()
+        alerts = sorted(self.alert_store.get(state), key=lambda alert: alert["expires_at"] or float("inf"))
+
+        if alerts:
+            message = "{} active weather alert(s) for {}".format(len(alerts), state)
+        else:
+            message = "No active weather alerts for " + state
         return {
             "state": state,
-            "alerts": [],
-            "message": "No active weather alerts for " + state
+            "alerts": alerts,
+            "message": message
         }
 
     def _get_time(self, args):
@@ -467,12 +880,7 @@ Location: {:.4f}, {:.4f}
             if not all(c in allowed_chars for c in expression):
                 return {"error": "Invalid characters in expression"}
 
-            # 检查危险操作
-            dangerous_words = ["import", "exec", "eval", "__", "open", "file"]
-            if any(dangerous in expression for dangerous in dangerous_words):
-                return {"error": "Dangerous operation not allowed"}
-
-            result = eval(expression)
+            result = self.calculator.evaluate(expression)
             return {
                 "expression": expression,
                 "result": result,
@@ -481,6 +889,46 @@ Location: {:.4f}, {:.4f}
         except Exception as e:
             return {"error": str(e)}
 
+    # 单次请求最多计算的表达式或数组元素个数
+    MAX_BATCH_SIZE = 100000
+
+    def _calculate_batch(self, args):
+        """批量计算：多个表达式，或一个表达式对变量数组逐元素计算."""
+        expressions = args.get("expressions") or []
+        expression = args.get("expression")
+        variables = args.get("variables") or {}
+
+        if not expressions and not expression:
+            return {"error": "Provide expressions or expression with variables"}
+        if len(expressions) > self.MAX_BATCH_SIZE or any(
+                len(values) > self.MAX_BATCH_SIZE for values in variables.values()):
+            return {"error": "Batch is larger than " + str(self.MAX_BATCH_SIZE)}
+
+        result = {}
+        if expressions:
+            results = []
+            errors = []
+            for item in expressions:
+                try:
+                    results.append(self.calculator.evaluate(item))
+                    errors.append(None)
+                except (ArithmeticError, ValueError, TypeError, CalculationError) as e:
+                    results.append(None)
+                    errors.append(str(e))
+            result.update({"expressions": expressions, "results": results, "errors": errors})
+
+        if expression:
+            try:
+                values = self.calculator.evaluate_vectorized(expression, variables)
+            except (ArithmeticError, ValueError, TypeError, CalculationError) as e:
+                return {"error": str(e)}
+            result.update({
+                "expression": expression,
+                "variables": sorted(variables.keys()),
+                "values": values
+            })
+
+        return result
 
 if __name__ == "__main__":
     try:
@@ -493,8 +941,12 @@ if __name__ == "__main__":
             pass
 
         server = WeatherMCPServer()
-        server.debug_log("=== Standard MCP Server Ready ===")
-        server.run()
+        if len(sys.argv) > 2 and sys.argv[1] == "--zygote":
+            # zygote 模式：为每个连接 fork 一个已初始化的服务器
+            mcp_zygote.serve(server, sys.argv[2])
+        else:
+            server.debug_log("=== Standard MCP Server Ready ===")
+            server.run()
     except Exception as e:
         # 确保错误被记录
         try:
@@ -0,0 +1,189 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，共享缓存不可用
+    fcntl = None
+
+MAGIC = b"MCPSHMC1"
+# 文件头：魔数、槽位数、槽位大小
+FILE_HEADER = struct.Struct("<8sII")
+FILE_HEADER_SIZE = 64
+# 槽位头：序号、键、过期时间、值长度、CRC32
+SLOT_HEADER = struct.Struct("<I16sdII")
+SEQ = struct.Struct("<I")
+DATA_OFFSET = 40
+
+
+def cache_key(tool_name, arguments):
+    """16-byte key of a tool call; the same in every process."""
+    payload = json.dumps([tool_name, arguments], sort_keys=True)
+    if not isinstance(payload, bytes):
+        payload = payload.encode("utf-8")
+    return hashlib.sha1(payload).digest()[:16]
+
+
+def _crc(value):
+    # Python 2 的 crc32 可能为负数
+    return zlib.crc32(value) & 0xffffffff
+
+
+class SharedCache(object):
+    """Tool results shared between processes through a memory-mapped file.
+
+    The file holds a fixed number of fixed-size slots; a key may live in one
+    of two slots picked by its hash. Writers take a short fcntl lock on the
+    slot and bump its sequence number before and after writing (a seqlock).
+    Readers take no lock; an odd or changed sequence number or a CRC
+    mismatch counts as a miss.
+    """
+
+    def __init__(self, path, slots=2048, slot_size=8192):
+        self.path = path
+        self.lock = threading.Lock()
+        # fcntl 锁属于进程，同一进程内的线程还要用线程锁互斥
+        self.write_lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "too_large": 0}
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, FILE_HEADER_SIZE, 0, os.SEEK_SET)
+            try:
+                header = os.read(fd, FILE_HEADER.size)
+                if len(header) == FILE_HEADER.size and header.startswith(MAGIC):
+                    # 文件已由其他进程创建，使用它的布局
+                    _, slots, slot_size = FILE_HEADER.unpack(header)
+                else:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, FILE_HEADER_SIZE + slots * slot_size)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, FILE_HEADER.pack(MAGIC, slots, slot_size))
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, FILE_HEADER_SIZE, 0, os.SEEK_SET)
+            self.map = mmap.mmap(fd, FILE_HEADER_SIZE + slots * slot_size)
+        except Exception:
+            os.close(fd)
+            raise
+        self.fd = fd
+        self.slots = slots
+        self.slot_size = slot_size
+
+    @staticmethod
+    def supported():
+        return fcntl is not None
+
+    @classmethod
+    def from_environment(cls):
+        """The cache at MCP_SHARED_CACHE, or None when it is not configured."""
+        path = os.environ.get("MCP_SHARED_CACHE")
+        if not path or not cls.supported():
+            return None
+        return cls(path)
+
+    @property
+    def max_value_size(self):
+        return self.slot_size - DATA_OFFSET
+
+    def get(self, tool_name, arguments, now=None):
+        """The cached result dict, or None."""
+        key = cache_key(tool_name, arguments)
+        now = time.time() if now is None else now
+        for index in self._candidates(key):
+            value = self._read(index, key, now)
+            if value is not None:
+                self._count("hits")
+                return json.loads(value.decode("utf-8"))
+        self._count("misses")
+        return None
+
+    def set(self, tool_name, arguments, result, ttl, now=None):
+        """Store a result for ttl seconds; returns False if it does not fit."""
+        value = json.dumps(result, ensure_ascii=False)
+        if not isinstance(value, bytes):
+            value = value.encode("utf-8")
+        if len(value) > self.max_value_size:
+            self._count("too_large")
+            return False
+        key = cache_key(tool_name, arguments)
+        now = time.time() if now is None else now
+        self._write(self._victim(key, now), key, now + ttl, value)
+        self._count("writes")
+        return True
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats.update({"path": self.path, "slots": self.slots, "slot_size": self.slot_size})
+        return stats
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _candidates(self, key):
+        h = struct.unpack("<Q", key[:8])[0]
+        first = h % self.slots
+        second = (h // self.slots) % self.slots
+        return (first,) if first == second else (first, second)
+
+    def _offset(self, index):
+        return FILE_HEADER_SIZE + index * self.slot_size
+
+    def _read(self, index, key, now):
+        offset = self._offset(index)
+        seq = SEQ.unpack(self.map[offset:offset + SEQ.size])[0]
+        if seq & 1:
+            # 正在写入
+            return None
+        _, slot_key, expires, length, crc = SLOT_HEADER.unpack(self.map[offset:offset + SLOT_HEADER.size])
+        if slot_key != key or expires <= now or length > self.max_value_size:
+            return None
+        value = self.map[offset + DATA_OFFSET:offset + DATA_OFFSET + length]
+        if SEQ.unpack(self.map[offset:offset + SEQ.size])[0] != seq or _crc(value) != crc:
+            return None
+        return value
+
+    def _victim(self, key, now):
+        """Slot for a new entry: the one holding key, else an expired one, else the oldest."""
+        best = None
+        for index in self._candidates(key):
+            offset = self._offset(index)
+            _, slot_key, expires, _, _ = SLOT_HEADER.unpack(self.map[offset:offset + SLOT_HEADER.size])
+            if slot_key == key or expires <= now:
+                return index
+            if best is None or expires < best[1]:
+                best = (index, expires)
+        return best[0]
+
+    def _write(self, index, key, expires, value):
+        offset = self._offset(index)
+        with self.write_lock:
+            self._write_locked(offset, key, expires, value)
+
+    def _write_locked(self, offset, key, expires, value):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, self.slot_size, offset, os.SEEK_SET)
+        try:
+            # 奇数序号表示写入中，读者看到后视为未命中；写入者中途退出时序号
+            # 会停在奇数，这里先规整为奇数，写完后总能回到偶数
+            seq = SEQ.unpack(self.map[offset:offset + SEQ.size])[0] | 1
+            self.map[offset:offset + SEQ.size] = SEQ.pack(seq)
+            self.map[offset + SEQ.size:offset + SLOT_HEADER.size] = SLOT_HEADER.pack(
+                0, key, expires, len(value), _crc(value))[SEQ.size:]
+            self.map[offset + DATA_OFFSET:offset + DATA_OFFSET + len(value)] = value
+            self.map[offset:offset + SEQ.size] = SEQ.pack((seq + 1) & 0xffffffff)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, self.slot_size, offset, os.SEEK_SET)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class Trace(object):
+    """Spans of one sampled request, stored as Chrome trace events.
+
+    Events use wall-clock microseconds, so spans recorded by the web
+    process and by the MCP server process line up on one timeline.
+    """
+
+    def __init__(self, trace_id=None, process_name=None):
+        self.id = trace_id or uuid.uuid4().hex
+        self.events = []
+        self.lock = threading.Lock()
+        if process_name:
+            self.events.append({
+                "name": "process_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "args": {"name": process_name}
+            })
+
+    def add(self, name, start, end, **args):
+        """Record a finished span from start to end (epoch seconds)."""
+        args["trace_id"] = self.id
+        event = {
+            "name": name,
+            "cat": "mcp",
+            "ph": "X",
+            "ts": int(start * 1000000),
+            "dur": max(0, int((end - start) * 1000000)),
+            "pid": os.getpid(),
+            "tid": threading.current_thread().ident,
+            "args": args
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def extend(self, events):
+        """Merge events recorded elsewhere, e.g. returned by the server."""
+        with self.lock:
+            self.events.extend(events)
+
+    @contextmanager
+    def span(self, name, **args):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time(), **args)
+
+    def meta(self):
+        """The JSON-RPC _meta entry that carries this trace to the server."""
+        return {"traceId": self.id}
+
+
+def current():
+    """The trace active in this thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def activate(trace):
+    """Make trace the current trace of this thread; None is allowed."""
+    previous = current()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name, **args):
+    """Time a block in the current trace; a no-op when nothing is sampled."""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **args):
+        yield
+
+
+class Tracer(object):
+    """Samples requests and appends their spans to a trace-event file.
+
+    The file uses the JSON array format without the closing bracket, which
+    chrome://tracing and Perfetto accept, so events can simply be appended.
+    """
+
+    def __init__(self, sample_rate=0.0, path="mcp_trace.json", process_name=None):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.process_name = process_name
+        self.lock = threading.Lock()
+
+    def start(self, force=False):
+        """A new Trace if this request is sampled, otherwise None."""
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        return Trace(process_name=self.process_name)
+
+    def finish(self, trace):
+        """Append the events of a sampled trace to the file."""
+        if trace is None:
+            return
+        with trace.lock:
+            lines = "".join(json.dumps(event) + ",\n" for event in trace.events)
+        with self.lock:
+            try:
+                with open(self.path, "a") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() == 0:
+                        f.write("[\n")
+                    f.write(lines)
+            except (IOError, OSError) as e:
+                print("Failed to write trace: " + str(e))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import re
+
+try:
+    from urllib import unquote
+except ImportError:
+    from urllib.parse import unquote
+
+
+class UriTemplateError(Exception):
+    """Raised for URI templates using syntax the router does not support."""
+    pass
+
+
+# {var} 为简单展开，{+var} 为保留展开（值中可以有 /）
+_EXPRESSION = re.compile(r"\{([^{}]*)\}")
+_VARNAME = re.compile(r"^[A-Za-z0-9_]+$")
+_PATTERNS = {
+    "": "([^/?#]+)",
+    "+": "(.+?)",
+}
+
+
+class UriTemplate(object):
+    """An RFC 6570 URI template limited to level 2 single-variable expressions.
+
+    {name} matches one path segment and {+name} matches any text, slashes
+    included. Matched values are percent-decoded.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.variables = []
+        pieces = []
+        position = 0
+        for match in _EXPRESSION.finditer(template):
+            pieces.append(re.escape(template[position:match.start()]))
+            expression = match.group(1)
+            operator = "+" if expression.startswith("+") else ""
+            name = expression[len(operator):]
+            if not _VARNAME.match(name):
+                raise UriTemplateError("Unsupported expression {" + expression + "} in " + template)
+            if name in self.variables:
+                raise UriTemplateError("Variable " + name + " used twice in " + template)
+            self.variables.append(name)
+            pieces.append(_PATTERNS[operator])
+            position = match.end()
+        if "{" in template[position:] or "}" in template[position:]:
+            raise UriTemplateError("Unbalanced braces in " + template)
+        pieces.append(re.escape(template[position:]))
+
+        first = _EXPRESSION.search(template)
+        # 第一个变量之前的部分是固定前缀，路由时由前缀树匹配，正则只匹配其余部分
+        self.prefix = template[:first.start()] if first else template
+        self.regex = re.compile("".join(pieces[1:]) + r"\Z")
+        # 固定字符越多越具体，同一前缀下优先尝试
+        self.literal_length = len(_EXPRESSION.sub("", template))
+
+    def match_rest(self, rest):
+        """Variables of a URI whose prefix already matched, or None."""
+        match = self.regex.match(rest)
+        if match is None:
+            return None
+        return dict(zip(self.variables, [unquote(value) for value in match.groups()]))
+
+    def match(self, uri):
+        if not uri.startswith(self.prefix):
+            return None
+        return self.match_rest(uri[len(self.prefix):])
+
+
+class _Node(object):
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children = {}
+        # (UriTemplate, value)，固定字符多的在前，相同时按注册顺序
+        self.routes = []
+
+
+class UriTemplateRouter(object):
+    """Resolves URIs against many templates without trying each in turn.
+
+    Templates are stored in a character trie keyed by their literal prefix;
+    each node holds the regexes of the templates whose prefix ends there.
+    resolve() walks the URI down the trie once and only tries the templates
+    along that path, longest prefix first; templates sharing a prefix are
+    tried most literal characters first, then in registration order.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, template, value):
+        """Route URIs matching template (a string) to value; replaces an earlier route for it."""
+        compiled = UriTemplate(template)
+        node = self.root
+        for char in compiled.prefix:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+        for index, (existing, _) in enumerate(node.routes):
+            if existing.template == template:
+                node.routes[index] = (compiled, value)
+                return compiled
+        index = len(node.routes)
+        while index and node.routes[index - 1][0].literal_length < compiled.literal_length:
+            index -= 1
+        node.routes.insert(index, (compiled, value))
+        self.count += 1
+        return compiled
+
+    def resolve(self, uri):
+        """(value, variables) of the most specific matching template, or None."""
+        # 沿前缀树走到底，记录途经的有模板的节点
+        node = self.root
+        candidates = [(0, node)] if node.routes else []
+        depth = 0
+        for char in uri:
+            node = node.children.get(char)
+            if node is None:
+                break
+            depth += 1
+            if node.routes:
+                candidates.append((depth, node))
+
+        for depth, node in reversed(candidates):
+            rest = uri[depth:]
+            for compiled, value in node.routes:
+                variables = compiled.match_rest(rest)
+                if variables is not None:
+                    return value, variables
+        return None
@@ -4,16 +4,58 @@ import json
 import os
 import sys
 import re
-from .mcp_client import SimpleMCPClient
+import threading
+import time
+from django.conf import settings
+from . import mcp_trace
+from .mcp_client import MCPClientPool
+from .mcp_memory import MemoryInspector
+from .mcp_shmcache import SharedCache
+from .supervisor import Supervisor
 
 # 设置默认编码为 UTF-8
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
+# 启动 MCP 服务器的解释器，可通过 settings.MCP_SERVER_PYTHON 覆盖
+DEFAULT_SERVER_PYTHON = sys.executable
+
+# 工具结果共享缓存的默认配置，可通过 settings.MCP_SHARED_CACHE 覆盖
+DEFAULT_SHARED_CACHE = {
+    'ENABLED': True,
+    # 共享内存文件，Django 进程和所有服务器进程映射同一个文件
+    'PATH': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mcp_tool_cache.bin'),
+    # 槽位数和每个槽位的字节数，由第一个创建文件的进程决定
+    'SLOTS': 2048,
+    'SLOT_SIZE': 8192,
+}
+
 
 class MCPChatBot:
     def __init__(self):
         self.client = None
+        self.supervisor = None
+        self.connect_lock = threading.Lock()
+        # 服务器进程数，None 时使用 MCP_SERVER_POOL_SIZE；在第一次连接时读取
+        self.pool_size = None
+        # 工具结果共享缓存，第一次使用时打开；不可用时为 False
+        self.tool_cache = None
+        self.cache_lock = threading.Lock()
+        # 本进程（Django）的内存报告
+        self.memory = MemoryInspector()
+        # 最近一次 server_stats() 的结果和时间，由后台线程刷新
+        self.stats_snapshot = ([], 0)
+        self.stats_lock = threading.Lock()
+        self.stats_refreshing = False
+
+    def ensure_connected(self):
+        """确保已连接，多个线程同时调用时只建立一次连接."""
+        if self.client and self.client.is_connected:
+            return True
+        with self.connect_lock:
+            if self.client and self.client.is_connected:
+                return True
+            return self.connect()
 
     def connect(self):
         """连接到 MCP 服务器."""
@@ -21,25 +63,42 @@ class MCPChatBot:
             # 获取服务器脚本路径
             server_path = os.path.join(os.path.dirname(__file__), 'mcp_server.py')
 
-            # 创建客户端
-            self.client = SimpleMCPClient('D:\\2025_06\\DjangoMCP\\venv\\Scripts\\python.exe', [server_path])
-
-            if self.client.connect():
-                return True
-            return False
+            # 关闭失效的旧连接，避免遗留服务器进程
+            if self.supervisor:
+                self.supervisor.stop()
+            if self.client:
+                self.client.close(0)
+
+            # 服务器进程（以及 zygote 派生的子进程）通过环境变量找到共享缓存
+            tool_cache = self._tool_cache()
+            if tool_cache:
+                os.environ['MCP_SHARED_CACHE'] = tool_cache.path
+
+            # 创建客户端，池中每个连接对应一个服务器进程
+            self.client = MCPClientPool(
+                getattr(settings, 'MCP_SERVER_PYTHON', DEFAULT_SERVER_PYTHON),
+                [server_path],
+                self.pool_size or getattr(settings, 'MCP_SERVER_POOL_SIZE', 1),
+                getattr(settings, 'MCP_SERVER_ZYGOTE', False))
+
+            connected = self.client.connect()
+            # 即使部分进程没有启动成功，监控线程也会按退避时间重试
+            self.supervisor = Supervisor.for_server(self.client, server_path)
+            self.supervisor.start()
+            return connected
         except Exception as e:
             print("MCP connection failed: " + str(e))
             return False
 
     def get_response(self, user_message):
         """获取聊天响应."""
-        if not self.client or not self.client.is_connected:
-            if not self.connect():
-                return self._fallback_response(user_message)
+        if not self.ensure_connected():
+            return self._fallback_response(user_message)
 
         try:
             # 列出可用工具
-            tools_response = self.client.list_tools()
+            with mcp_trace.span("list_tools"):
+                tools_response = self.client.list_tools()
             available_tools = []
 
             if tools_response and "result" in tools_response:
@@ -47,16 +106,13 @@ class MCPChatBot:
                 available_tools = [tool["name"] for tool in tools]
 
             # 根据用户消息选择合适的工具
-            tool_name, arguments = self._analyze_message(user_message, available_tools)
+            with mcp_trace.span("analyze_message"):
+                tool_name, arguments = self._analyze_message(user_message, available_tools)
 
             if tool_name:
-                # 调用工具
-                tool_response = self.client.call_tool(tool_name, arguments)
-                if tool_response and "result" in tool_response:
-                    content = tool_response["result"].get("content", [])
-                    is_error = tool_response["result"].get("isError", False)
-                    if content and len(content) > 0:
-                        return self._format_tool_response(tool_name, content[0].get("text", ""), is_error)
+                response = self._call_and_format(tool_name, arguments)
+                if response is not None:
+                    return response
 
             return self._fallback_response(user_message)
 
@@ -66,6 +122,207 @@ class MCPChatBot:
             traceback.print_exc()
             return self._fallback_response(user_message)
 
+    def server_stats(self, timeout=2):
+        """每个已连接服务器进程的 server/stats 结果，不会为此建立新连接."""
+        if not self.client:
+            return []
+        stats = []
+        for index, client in enumerate(self.client.connected_clients()):
+            try:
+                response = client.send_request("server/stats", timeout=timeout)
+            except Exception as e:
+                print("Failed to fetch server stats: " + str(e))
+                continue
+            if response and "result" in response:
+                stats.append((index, response["result"]))
+        return stats
+
+    def cached_server_stats(self, max_age=10.0):
+        """最近一次 server_stats() 的结果，不会阻塞调用方.
+
+        结果超过 max_age 秒时在后台线程中刷新，本次仍返回旧结果（第一次为空列表）。
+        """
+        stats, fetched_at = self.stats_snapshot
+        if time.time() - fetched_at >= max_age:
+            with self.stats_lock:
+                if not self.stats_refreshing:
+                    self.stats_refreshing = True
+                    thread = threading.Thread(target=self._refresh_server_stats, name='mcp-server-stats')
+                    thread.daemon = True
+                    thread.start()
+        return stats
+
+    def _refresh_server_stats(self):
+        try:
+            self.stats_snapshot = (self.server_stats(), time.time())
+        finally:
+            with self.stats_lock:
+                self.stats_refreshing = False
+
+    def memory_report(self, limit=10, diff=False, timeout=5):
+        """本进程和每个已连接服务器进程的内存报告，不会为此建立新连接."""
+        clients = self.client.connected_clients() if self.client else []
+        tables = dict(("client_{}_{}".format(index, name), size)
+                      for index, client in enumerate(clients)
+                      for name, size in client.table_sizes().items())
+        report = {'web': self.memory.report(tables, limit, diff), 'servers': []}
+        for client in clients:
+            try:
+                response = client.send_request("server/memory", {"action": "report", "limit": limit, "diff": diff},
+                                               timeout=timeout)
+            except Exception as e:
+                print("Failed to fetch server memory report: " + str(e))
+                continue
+            if response and "result" in response:
+                report['servers'].append(response["result"])
+        return report
+
+    def route_message(self, user_message):
+        """解析消息对应的工具调用，不访问 MCP 服务器."""
+        with mcp_trace.span("analyze_message"):
+            return self._analyze_message(user_message, [])
+
+    def answer(self, user_message, tool_name, arguments, info=None):
+        """按已解析的工具调用生成响应.
+
+        未匹配到工具时返回静态的备用响应；MCP 调用失败时返回 None，
+        由调用方决定如何降级（例如不写入缓存）。info 为 dict 时，
+        info['cache_hit'] 表示结果是否来自共享缓存。
+        """
+        if not tool_name:
+            return self._fallback_response(user_message)
+
+        # 其他进程算过的结果直接返回，不必连接服务器
+        response = self._cached_response(tool_name, arguments)
+        if info is not None:
+            info['cache_hit'] = response is not None
+        if response is not None:
+            return response
+
+        with mcp_trace.span("ensure_connected"):
+            if not self.ensure_connected():
+                return None
+
+        try:
+            return self._call_and_format(tool_name, arguments)
+        except Exception as e:
+            print("MCP tool call failed: " + str(e))
+            return None
+
+    def answer_batch(self, tool_calls, info=None):
+        """批量执行 (工具名, 参数) 调用，按顺序返回格式化响应.
+
+        相同的工具调用只执行一次，共享缓存中已有的不再发给服务器；调用失败的位置为 None。
+        info 为 dict 时，info['cache_hits'] 按顺序列出每个结果是否来自共享缓存。
+        """
+        unique_calls = []
+        positions = {}
+        order = []
+        for tool_name, arguments in tool_calls:
+            key = json.dumps([tool_name, arguments], sort_keys=True)
+            if key not in positions:
+                positions[key] = len(unique_calls)
+                unique_calls.append((tool_name, arguments))
+            order.append(positions[key])
+
+        responses = [self._cached_response(tool_name, arguments) for tool_name, arguments in unique_calls]
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if info is not None:
+            info['cache_hits'] = [responses[i] is not None for i in order]
+        if missing and self.ensure_connected():
+            try:
+                tool_responses = self.client.call_tools_batch([unique_calls[i] for i in missing])
+            except Exception as e:
+                print("MCP batch call failed: " + str(e))
+                tool_responses = []
+            for i, tool_response in zip(missing, tool_responses):
+                responses[i] = self._format_result(unique_calls[i][0], tool_response)
+
+        return [responses[i] for i in order]
+
+    def iter_response(self, user_message, tool_name, arguments, info=None):
+        """逐步生成响应事件 (事件名, 数据)，供流式接口使用.
+
+        依次产生 progress 事件和若干 chunk 事件（按段落切分的 Markdown），
+        最后是 done 事件，其 ok 字段表示结果是否来自工具调用。info 的用法同 answer()。
+        """
+        response = self._cached_response(tool_name, arguments) if tool_name else None
+        if info is not None:
+            info['cache_hit'] = response is not None
+        if response is None and tool_name:
+            if not self.client or not self.client.is_connected:
+                yield 'progress', {'stage': 'connecting'}
+                self.ensure_connected()
+
+            if self.client and self.client.is_connected:
+                yield 'progress', {'stage': 'calling', 'tool': tool_name}
+                try:
+                    response = self._call_and_format(tool_name, arguments)
+                except Exception as e:
+                    print("MCP tool call failed: " + str(e))
+                    yield 'progress', {'stage': 'failed', 'tool': tool_name}
+
+        ok = response is not None or not tool_name
+        if response is None:
+            response = self._fallback_response(user_message)
+
+        for chunk in self.split_markdown(response):
+            yield 'chunk', {'text': chunk}
+        yield 'done', {'ok': ok}
+
+    def split_markdown(self, text):
+        """按段落切分 Markdown，保留段落之间的空行."""
+        parts = text.split('\n\n')
+        chunks = [part + '\n\n' for part in parts[:-1]]
+        if parts[-1]:
+            chunks.append(parts[-1])
+        return chunks
+
+    def _call_and_format(self, tool_name, arguments):
+        """调用工具并格式化结果，没有可用内容时返回 None."""
+        tool_response = self.client.call_tool(tool_name, arguments)
+        with mcp_trace.span("format_tool_response", tool=tool_name):
+            return self._format_result(tool_name, tool_response)
+
+    def _tool_cache(self):
+        """打开工具结果共享缓存，未启用或平台不支持时返回 None."""
+        if self.tool_cache is None:
+            with self.cache_lock:
+                if self.tool_cache is None:
+                    self.tool_cache = self._open_tool_cache()
+        return self.tool_cache or None
+
+    def _open_tool_cache(self):
+        config = dict(DEFAULT_SHARED_CACHE)
+        config.update(getattr(settings, 'MCP_SHARED_CACHE', {}))
+        if not config['ENABLED'] or not SharedCache.supported():
+            return False
+        try:
+            return SharedCache(config['PATH'], config['SLOTS'], config['SLOT_SIZE'])
+        except (IOError, OSError) as e:
+            print("Failed to open shared tool cache: " + str(e))
+            return False
+
+    def _cached_response(self, tool_name, arguments):
+        """共享缓存中已有的工具结果（任一进程写入），格式化后返回；没有时返回 None."""
+        tool_cache = self._tool_cache()
+        if not tool_cache:
+            return None
+        with mcp_trace.span("shared_cache", tool=tool_name):
+            result = tool_cache.get(tool_name, arguments)
+        if result is None:
+            return None
+        return self._format_result(tool_name, {"result": result})
+
+    def _format_result(self, tool_name, tool_response):
+        """格式化 tools/call 的 JSON-RPC 响应，没有可用内容时返回 None."""
+        if tool_response and "result" in tool_response:
+            content = tool_response["result"].get("content", [])
+            is_error = tool_response["result"].get("isError", False)
+            if content and len(content) > 0:
+                return self._format_tool_response(tool_name, content[0].get("text", ""), is_error)
+        return None
+
     def _analyze_message(self, message, available_tools):
         """分析用户消息，确定需要调用的工具."""
         message_lower = message.lower()
@@ -198,13 +455,38 @@ class MCPChatBot:
 您还有什么需要帮助的吗？""".format(local_time, utc_time, formatted)
 
             elif tool_name == 'get_forecast':
-                # 天气预报是纯文本格式
+                try:
+                    response_data = json.loads(response_text)
+                except ValueError:
+                    # 旧版服务器返回纯文本
+                    response_data = None
+
+                if response_data is None:
+                    forecast_text = response_text
+                    source = u"模拟天气服务"
+                elif 'error' in response_data:
+                    return u"## ❌ 天气预报\n\n{}".format(response_data['error'])
+                else:
+                    forecast_text = u"\n\n---\n\n".join([
+                        u"""{}:
+Temperature: {}°{}
+Wind: {} mph {}
+Forecast: {}, {}% chance of precipitation.""".format(
+                            period['name'], period['temperature'], period['temperature_unit'],
+                            period['wind_speed'], period['wind_direction'],
+                            period['short_forecast'], period['precipitation_probability'])
+                        for period in response_data.get('periods', [])
+                    ])
+                    forecast_text += u"\n\n---\n\nLocation: {:.4f}, {:.4f}".format(
+                        response_data.get('latitude', 0), response_data.get('longitude', 0))
+                    source = u"本地网格数据（{}）".format(response_data.get('source', ''))
+
                 return u"""## 🌤️ 天气预报
 
 {}
 
-*数据来源：模拟天气服务*
-*需要其他地区的天气吗？请提供城市名称或经纬度坐标。*""".format(response_text)
+*数据来源：{}*
+*需要其他地区的天气吗？请提供城市名称或经纬度坐标。*""".format(forecast_text, source)
 
             elif tool_name == 'get_alerts':
                 try:
@@ -214,7 +496,13 @@ class MCPChatBot:
                     alerts = response_data.get('alerts', [])
 
                     if alerts:
-                        alert_text = "\n".join([u"- {}".format(alert) for alert in alerts])
+                        alert_text = "\n".join([
+                            u"- **{}** ({})：{}，有效期至 {}".format(
+                                alert.get('event', ''), alert.get('severity', ''),
+                                alert.get('headline', ''), alert.get('expires') or u"未知")
+                            if isinstance(alert, dict) else u"- {}".format(alert)
+                            for alert in alerts
+                        ])
                         return u"""## ⚠️ 天气警报 - {}
 
 {}
@@ -276,8 +564,17 @@ class MCPChatBot:
             "您可以尝试上面的示例用法。" if len(message) > 0 else ""
         )
 
+    def rolling_restart(self):
+        """逐个替换服务器进程（先启动新进程，再排空旧进程），返回替换的数量."""
+        if not self.supervisor:
+            return 0
+        return self.supervisor.rolling_restart()
+
     def close(self):
-        """关闭连接."""
+        """关闭连接，进行中的请求先完成."""
+        if self.supervisor:
+            self.supervisor.stop()
+            self.supervisor = None
         if self.client:
             self.client.close()
             self.client = None
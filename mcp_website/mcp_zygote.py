@@ -0,0 +1,77 @@
+#!/usr/bin/env python2.7
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import signal
+import socket
+import threading
+
+
+def _exit_on_eof():
+    """Exit when the parent closes our stdin, i.e. when the web process goes away."""
+    # 直接读文件描述符：线程持有 sys.stdin 的锁时 fork，子进程读 stdin 会死锁
+    while os.read(0, 4096):
+        pass
+    os._exit(0)
+
+
+def serve(server, path):
+    """Fork a ready-to-serve copy of server for every connection on a unix socket.
+
+    The server's data is loaded once here; forked children share it
+    copy-on-write. A child writes its pid as the first line, then speaks
+    JSON-RPC over the connection exactly as over stdin/stdout.
+
+    The socket is created with mode 0600, and "ready" is written to stdout
+    once it is listening, which is what the parent waits for.
+    """
+    server.preload()
+    # 子进程退出后由内核回收，不留僵尸进程
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # 只有本用户可以连接：绑定时的 umask 决定套接字文件的权限
+    umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(umask)
+    listener.listen(64)
+
+    watcher = threading.Thread(target=_exit_on_eof, name="zygote-stdin")
+    watcher.daemon = True
+    watcher.start()
+    server.debug_log("Zygote listening on " + path)
+    # 开始监听后才通知父进程，此前套接字文件可能已存在但还不能连接
+    os.write(1, b"ready\n")
+
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except socket.error as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        pid = os.fork()
+        if pid == 0:
+            try:
+                listener.close()
+                _serve_child(server, conn)
+            finally:
+                os._exit(0)
+        conn.close()
+        server.debug_log("Forked server " + str(pid))
+
+
+def _serve_child(server, conn):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    # 连接同时作为 stdin 和 stdout，server.run() 无需改动
+    os.dup2(conn.fileno(), 0)
+    os.dup2(conn.fileno(), 1)
+    conn.close()
+    os.write(1, str(os.getpid()) + "\n")
+    server.after_fork()
+    server.run()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import time
+from collections import OrderedDict
+
+from .mcp_client import SimpleMCPClient
+from .mcp_server import WeatherMCPServer
+from .mcp_utils import MCPChatBot
+
+# 名称 -> setup 函数，setup 返回一次迭代要执行的函数
+CASES = OrderedDict()
+
+# 每次迭代处理的一组典型消息
+SAMPLE_MESSAGES = [
+    '北京天气怎么样',
+    '39.9042,116.4074 的天气预报',
+    '查询加州的天气警报',
+    'CA alerts',
+    '现在几点了？',
+    '帮我计算 (10+5)*2',
+    '什么是 MCP 协议？',
+    '你好',
+]
+
+
+def case(name):
+    """注册一个基准测试用例."""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+@case('bot.analyze_message')
+def analyze_message():
+    bot = MCPChatBot()
+
+    def run():
+        for message in SAMPLE_MESSAGES:
+            bot._analyze_message(message, [])
+    return run
+
+
+@case('bot.extract_coordinates')
+def extract_coordinates():
+    bot = MCPChatBot()
+    messages = ['39.9042,116.4074 的天气预报', '上海天气', '火星天气']
+
+    def run():
+        for message in messages:
+            bot._extract_coordinates(message)
+    return run
+
+
+@case('bot.format_tool_response')
+def format_tool_response():
+    bot = MCPChatBot()
+    server = WeatherMCPServer()
+    responses = [
+        (name, server._handle_call_tool({'name': name, 'arguments': arguments})['content'][0]['text'])
+        for name, arguments in [
+            ('get_forecast', {'latitude': 39.9042, 'longitude': 116.4074}),
+            ('get_alerts', {'state': 'CA'}),
+            ('get_time', {}),
+            ('calculate', {'expression': '(10+5)*2'}),
+        ]
+    ]
+
+    def run():
+        for name, text in responses:
+            bot._format_tool_response(name, text)
+    return run
+
+
+@case('server.handle_request.dispatch')
+def handle_request_dispatch():
+    server = WeatherMCPServer()
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'prompts/list'},
+        {'jsonrpc': '2.0', 'id': 3, 'method': 'resources/list'},
+        {'jsonrpc': '2.0', 'id': 4, 'method': 'no/such/method'},
+    ]
+
+    def run():
+        for request in requests:
+            server.handle_request(request)
+    return run
+
+
+@case('server.call_tool.encode')
+def call_tool_encode():
+    server = WeatherMCPServer()
+    params = {'name': 'get_forecast', 'arguments': {'latitude': 39.9042, 'longitude': 116.4074}}
+    # 预报数据在第一次调用时加载，不计入测量
+    server._handle_call_tool(params)
+
+    def run():
+        server._handle_call_tool(params)
+    return run
+
+
+@case('server.read_resource.route')
+def read_resource_route():
+    server = WeatherMCPServer()
+    # 大量同前缀的模板，确认解析不随模板数量线性变慢
+    for i in range(1000):
+        server.template_router.add('weather://station/{}/{{id}}/obs'.format(i), None)
+    uris = ['weather://forecast/39.9042/116.4074', 'weather://alerts/CA', 'weather://station/999/x1/obs']
+
+    def run():
+        for uri in uris:
+            server.template_router.resolve(uri)
+    return run
+
+
+@case('server.get_prompt.cached')
+def get_prompt_cached():
+    server = WeatherMCPServer()
+    params = {'name': 'weather_report', 'arguments': {'location': '北京'}}
+
+    def run():
+        server._handle_get_prompt(params)
+    return run
+
+
+@case('client.encode_decode')
+def client_encode_decode():
+    client = SimpleMCPClient('python', [])
+    request = {
+        'jsonrpc': '2.0',
+        'id': 42,
+        'method': 'tools/call',
+        'params': {'name': 'get_forecast', 'arguments': {'latitude': 39.9042, 'longitude': 116.4074}}
+    }
+    server = WeatherMCPServer()
+    line = json.dumps({'jsonrpc': '2.0', 'id': 42, 'result': server._handle_call_tool(request['params'])},
+                      ensure_ascii=False)
+
+    def run():
+        client._encode(request)
+        client._decode(line)
+    return run
+
+
+def measure(func, repeat=5, min_time=0.05):
+    """返回每次迭代的最短和中位耗时（微秒）.
+
+    先把循环次数加倍直到一轮至少耗时 min_time 秒，再测 repeat 轮；
+    最短值受干扰最小，用于和基线比较。
+    """
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            func()
+        if time.time() - start >= min_time:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        for _ in range(number):
+            func()
+        timings.append((time.time() - start) / number * 1000000)
+    timings.sort()
+    return {
+        'best_us': round(timings[0], 3),
+        'median_us': round(timings[len(timings) // 2], 3),
+        'iterations': number,
+    }
+
+
+def compare(results, baseline, threshold):
+    """和基线比较，返回 {用例: 变化百分比} 以及超过 threshold 的用例."""
+    changes = {}
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = (result['best_us'] - baseline[name]['best_us']) / baseline[name]['best_us'] * 100
+        changes[name] = round(change, 1)
+        if change > threshold:
+            regressions.append(name)
+    return changes, regressions
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import cProfile
+import os
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# 默认配置，可通过 settings.MCP_PROFILE 覆盖
+DEFAULT_CONFIG = {
+    # 关闭时中间件不会被加载，没有任何开销
+    'ENABLED': False,
+    # 被随机抽样分析的请求比例
+    'SAMPLE_RATE': 0.0,
+    # 管理员（is_staff）带上该请求头时总是分析
+    'HEADER': 'HTTP_X_MCP_PROFILE',
+    # 只分析这些路径前缀下的请求
+    'PATH_PREFIXES': ('/mcp_website/chat/',),
+    # .pstats 文件的输出目录
+    'DIR': 'profiles',
+}
+
+
+class ChatProfilerMiddleware(object):
+    """用 cProfile 分析抽样的聊天请求，结果写成 .pstats 文件.
+
+    生成的文件可以用 python -m pstats 或 snakeviz 查看，文件名会放在响应头
+    X-MCP-Profile 中。流式响应只包含生成响应对象之前的部分。
+    """
+
+    def __init__(self, get_response, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_PROFILE', {}))
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        response = profile.runcall(self.get_response, request)
+        response['X-MCP-Profile'] = self.dump(profile)
+        return response
+
+    def should_profile(self, request):
+        if not request.path.startswith(tuple(self.config['PATH_PREFIXES'])):
+            return False
+        if request.META.get(self.config['HEADER']):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def dump(self, profile):
+        """写入 .pstats 文件，返回文件名."""
+        directory = self.config['DIR']
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filename = 'chat-{}-{}.pstats'.format(time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+        profile.dump_stats(os.path.join(directory, filename))
+        return filename
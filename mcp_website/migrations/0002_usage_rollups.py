@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 03:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mcp_website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnmatchedMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=200, unique=True)),
+                ('count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('kind', models.CharField(choices=[('tool', 'Tool'), ('intent', 'Intent')], max_length=16)),
+                ('name', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0)),
+                ('latency_count', models.PositiveIntegerField(default=0)),
+                ('latency_sum_ms', models.FloatField(default=0)),
+                ('latency_histogram', models.TextField(default='[]')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='usagerollup',
+            unique_together=set([('bucket_start', 'kind', 'name')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='usagerollup',
+            index_together=set([('kind', 'bucket_start')]),
+        ),
+    ]
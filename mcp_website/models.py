@@ -2,5 +2,97 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
 
-# Create your models here.
+
+@python_2_unicode_compatible
+class Conversation(models.Model):
+    """一组聊天消息，key 由客户端通过 conversation_id 传回."""
+    key = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField()
+    last_message_at = models.DateTimeField(db_index=True)
+    message_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.key
+
+
+@python_2_unicode_compatible
+class Message(models.Model):
+    """一条用户消息或助手回复."""
+    USER = 'user'
+    ASSISTANT = 'assistant'
+    ROLES = ((USER, 'User'), (ASSISTANT, 'Assistant'))
+
+    conversation = models.ForeignKey(Conversation, related_name='messages', on_delete=models.CASCADE)
+    role = models.CharField(max_length=16, choices=ROLES)
+    content = models.TextField()
+    created_at = models.DateTimeField(db_index=True)
+    # 助手回复：路由到的工具（未匹配时为空）、缓存状态和整个请求的耗时
+    tool = models.CharField(max_length=64, blank=True)
+    cache_status = models.CharField(max_length=16, blank=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created_at', 'id')
+
+    def __str__(self):
+        return '{}: {}'.format(self.role, self.content[:50])
+
+
+@python_2_unicode_compatible
+class ToolCall(models.Model):
+    """助手回复中的一次工具调用；命中缓存时 duration_ms 为空."""
+    message = models.ForeignKey(Message, related_name='tool_calls', on_delete=models.CASCADE)
+    tool = models.CharField(max_length=64, db_index=True)
+    arguments = models.TextField(blank=True)
+    started_at = models.DateTimeField()
+    duration_ms = models.FloatField(null=True, blank=True)
+    cache_hit = models.BooleanField(default=False)
+    ok = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.tool
+
+
+@python_2_unicode_compatible
+class UsageRollup(models.Model):
+    """一个时间桶内某个工具或意图的计数和延迟直方图，随聊天记录增量更新.
+
+    kind 为 tool 时统计实际的工具调用（延迟为工具耗时，命中缓存的调用不计入
+    延迟）；为 intent 时统计每条消息的路由结果（未匹配记为 unmatched，延迟为
+    整个请求的耗时）。
+    """
+    TOOL = 'tool'
+    INTENT = 'intent'
+    KINDS = ((TOOL, 'Tool'), (INTENT, 'Intent'))
+
+    bucket_start = models.DateTimeField()
+    kind = models.CharField(max_length=16, choices=KINDS)
+    name = models.CharField(max_length=64)
+    count = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    latency_count = models.PositiveIntegerField(default=0)
+    latency_sum_ms = models.FloatField(default=0)
+    # mcp_metrics.LATENCY_BUCKETS 各桶的计数（JSON 数组，最后一项为溢出）
+    latency_histogram = models.TextField(default='[]')
+
+    class Meta:
+        unique_together = ('bucket_start', 'kind', 'name')
+        index_together = ('kind', 'bucket_start')
+
+    def __str__(self):
+        return '{} {} @ {}'.format(self.kind, self.name, self.bucket_start)
+
+
+@python_2_unicode_compatible
+class UnmatchedMessage(models.Model):
+    """没有路由到任何工具的消息（规范化后）及其出现次数."""
+    text = models.CharField(max_length=200, unique=True)
+    count = models.PositiveIntegerField(default=0, db_index=True)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return self.text
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class RenderedPage(object):
+    """一个渲染好的页面，包含预压缩的各个编码版本."""
+
+    def __init__(self, body, last_modified, static_version=''):
+        self.last_modified = last_modified
+        self.static_version = static_version
+        # 静态文件版本也计入 ETag，重新 collectstatic 后旧的 ETag 不再匹配
+        digest = hashlib.sha1(static_version.encode('ascii') + body).hexdigest()
+        # 每种编码的字节不同，强 ETag 也必须不同
+        self.encodings = {
+            None: (body, '"{}"'.format(digest)),
+            'gzip': (compress_string(body), '"{}-gzip"'.format(digest)),
+        }
+        if brotli is not None:
+            self.encodings['br'] = (brotli.compress(body), '"{}-br"'.format(digest))
+
+    def choose_encoding(self, request):
+        """按 Accept-Encoding 选择编码，优先 br，其次 gzip."""
+        accepted = [value.split(';')[0].strip()
+                    for value in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')]
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.encodings:
+                return encoding
+        return None
+
+    def response(self, request, content_type, max_age):
+        """生成响应，条件请求命中时返回 304."""
+        encoding = self.choose_encoding(request)
+        body, etag = self.encodings[encoding]
+
+        response = HttpResponse(body, content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        patch_cache_control(response, public=True, max_age=max_age, must_revalidate=True)
+        # 处理 If-None-Match / If-Modified-Since 条件请求
+        return get_conditional_response(request, etag=etag, last_modified=self.last_modified, response=response)
+
+
+class PageCache(object):
+    """进程内的整页缓存，模板文件或静态文件清单修改后自动重新渲染.
+
+    页面引用的静态文件地址带有 ManifestStaticFilesStorage 的内容哈希，
+    因此清单的版本是缓存键的一部分，也计入 ETag 和 Last-Modified。
+    """
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self.pages = {}
+        self.lock = threading.Lock()
+        self.manifest_mtime = None
+        self.static_version = ''
+
+    def get(self, key, context):
+        """返回 key（例如语言代码）对应的 RenderedPage."""
+        static_version, static_mtime = self._static_version()
+        page = self.pages.get((key, static_version))
+        if page is not None and (not settings.DEBUG or page.last_modified >= self._template_mtime()):
+            return page
+
+        with self.lock:
+            template = get_template(self.template_name)
+            # 不传 request，保证缓存的页面不包含任何与用户相关的内容
+            body = template.render(context).encode('utf-8')
+            page = RenderedPage(body, max(self._template_mtime(template), static_mtime), static_version)
+            # 旧版本清单渲染的页面不会再用到
+            self.pages = dict((cached_key, cached) for cached_key, cached in self.pages.items()
+                              if cached.static_version == static_version)
+            self.pages[(key, static_version)] = page
+        return page
+
+    def _static_version(self):
+        """静态文件清单的 (版本, mtime)，没有清单时为 ('', 0).
+
+        清单在 collectstatic 后改变时重新加载，新渲染的页面引用新的哈希文件名。
+        """
+        manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+        if manifest_name is None:
+            return '', 0
+        try:
+            path = staticfiles_storage.path(manifest_name)
+            mtime = os.path.getmtime(path)
+        except (OSError, NotImplementedError, ImproperlyConfigured):
+            return '', 0
+
+        with self.lock:
+            if mtime != self.manifest_mtime:
+                with open(path, 'rb') as f:
+                    self.static_version = hashlib.sha1(f.read()).hexdigest()[:12]
+                if self.manifest_mtime is not None:
+                    staticfiles_storage.hashed_files = staticfiles_storage.load_manifest()
+                self.manifest_mtime = mtime
+            return self.static_version, int(mtime)
+
+    def _template_mtime(self, template=None):
+        template = template or get_template(self.template_name)
+        return int(os.path.getmtime(template.origin.name))
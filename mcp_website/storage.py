@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+# 可选依赖：安装后 collectstatic 会压缩项目自己的 CSS/JS
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+class MinifiedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """带内容哈希文件名的静态文件存储，collectstatic 时压缩未压缩过的 CSS/JS."""
+
+    def _minifier(self, name):
+        if '.min.' in name or name.startswith('vendor/'):
+            return None
+        if name.endswith('.css') and rcssmin is not None:
+            return rcssmin.cssmin
+        if name.endswith('.js') and rjsmin is not None:
+            return rjsmin.jsmin
+        return None
+
+    def _save(self, name, content):
+        minify = self._minifier(name)
+        if minify is not None:
+            content.seek(0)
+            source = content.read().decode('utf-8')
+            content = ContentFile(minify(source).encode('utf-8'))
+        return super(MinifiedManifestStaticFilesStorage, self)._save(name, content)
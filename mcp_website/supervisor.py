@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import glob
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .mcp_client import client_metrics
+
+# 默认配置，可通过 settings.MCP_SUPERVISOR 覆盖
+DEFAULT_CONFIG = {
+    'ENABLED': True,
+    # 健康检查间隔（秒）
+    'INTERVAL': 5.0,
+    # ping 超时（秒）
+    'PING_TIMEOUT': 2.0,
+    # 连续多少次 ping 失败后重启无响应的进程
+    'MAX_FAILURES': 2,
+    # 有请求在处理中、且这么多秒内有过输出的进程只是忙，ping 失败不计数；
+    # 应不短于最长的请求超时（批量调用为 30 秒）
+    'BUSY_TIMEOUT': 30.0,
+    # 同一进程反复重启时的退避时间（秒），每次翻倍
+    'BACKOFF_INITIAL': 1.0,
+    'BACKOFF_MAX': 60.0,
+    # 替换进程时等待旧进程完成进行中请求的时间（秒），不短于最长的请求超时
+    'DRAIN_TIMEOUT': 30.0,
+    # 服务器代码（mcp_*.py）修改后滚动重启，只适合开发环境
+    'WATCH_CODE': False,
+}
+
+
+class Supervisor(object):
+    """后台线程定期检查连接池中的每个服务器进程.
+
+    已退出的进程立即重启，连续 MAX_FAILURES 次 ping 不通的空闲进程视为卡死后重启。
+    服务器按顺序处理请求，忙碌时 ping 排在进行中的请求后面，所以有请求在处理中
+    且 BUSY_TIMEOUT 秒内有过输出的进程不算失败。同一位置反复重启时按指数退避。
+    重启和滚动重启都先启动新进程再排空旧进程。
+    """
+
+    def __init__(self, pool, watch_files=None, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config if config is not None else getattr(settings, 'MCP_SUPERVISOR', {}))
+        self.pool = pool
+        self.watch_files = watch_files or []
+        self.code_mtime = self._code_mtime()
+        # 同一时间只做一次重启，健康检查和滚动重启不会同时替换同一个进程
+        self.restart_lock = threading.Lock()
+        self.failures = {}
+        # 位置 -> (下次允许重启的时间, 下次的退避时间, 上次重启时间)
+        self.backoff = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def for_server(cls, pool, server_path):
+        """监视服务器脚本所在目录中的 mcp_*.py."""
+        return cls(pool, glob.glob(os.path.join(os.path.dirname(server_path), 'mcp_*.py')))
+
+    @property
+    def enabled(self):
+        return self.config['ENABLED']
+
+    def start(self):
+        if not self.enabled or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name='mcp-supervisor')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def check(self):
+        """检查一遍所有进程，必要时重启；代码有修改时滚动重启."""
+        if self.config['WATCH_CODE'] and self.watch_files:
+            mtime = self._code_mtime()
+            if mtime != self.code_mtime:
+                self.code_mtime = mtime
+                print("MCP server code changed, rolling restart")
+                self.rolling_restart()
+
+        for index, client in enumerate(list(self.pool.clients)):
+            process = client.server_process
+            if process is None or process.poll() is not None:
+                reason = 'dead'
+            elif client.ping(self.config['PING_TIMEOUT']):
+                self.failures[index] = 0
+                self._forget_backoff(index)
+                continue
+            elif self._busy(client):
+                continue
+            else:
+                self.failures[index] = self.failures.get(index, 0) + 1
+                if self.failures[index] < self.config['MAX_FAILURES']:
+                    continue
+                reason = 'unresponsive'
+            self._restart(index, client, reason)
+
+    def rolling_restart(self):
+        """依次替换每个服务器进程，返回成功替换的数量."""
+        with self.restart_lock:
+            replaced = self.pool.rolling_restart(self.config['DRAIN_TIMEOUT'])
+        client_metrics.inc('mcp_supervisor_restarts_total', {'reason': 'rolling'}, replaced)
+        return replaced
+
+    def _busy(self, client):
+        """进程有请求在处理中，并且最近还有输出."""
+        return client.in_flight() > 0 and time.time() - client.last_activity < self.config['BUSY_TIMEOUT']
+
+    def _restart(self, index, client, reason):
+        now = time.time()
+        next_attempt, delay, _ = self.backoff.get(index, (0, self.config['BACKOFF_INITIAL'], None))
+        if now < next_attempt:
+            return
+        print("Restarting MCP server {} ({})".format(index, reason))
+        with self.restart_lock:
+            ok = self.pool.replace(index, self.config['DRAIN_TIMEOUT'], client)
+        client_metrics.inc('mcp_supervisor_restarts_total', {'reason': reason if ok else 'failed'})
+        self.failures[index] = 0
+        self.backoff[index] = (now + delay, min(delay * 2, self.config['BACKOFF_MAX']), now)
+
+    def _forget_backoff(self, index):
+        """进程稳定运行超过 BACKOFF_MAX 后，退避时间重新从 BACKOFF_INITIAL 开始."""
+        if index in self.backoff and time.time() - self.backoff[index][2] > self.config['BACKOFF_MAX']:
+            del self.backoff[index]
+
+    def _code_mtime(self):
+        mtimes = []
+        for path in self.watch_files:
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                pass
+        return max(mtimes) if mtimes else None
+
+    def _run(self):
+        while not self.stop_event.wait(self.config['INTERVAL']):
+            try:
+                self.check()
+            except Exception as e:
+                print("MCP supervisor check failed: " + str(e))
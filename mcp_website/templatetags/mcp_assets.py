@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+from ..assets import VENDOR_ASSETS
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_asset(name):
+    """第三方库的 static 地址（带内容哈希）."""
+    return staticfiles_storage.url(VENDOR_ASSETS[name])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..admission import AdmissionController, AdmissionRejected
+from .utils import wait_for
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def make(self, **config):
+        options = {'MAX_CONCURRENT': 1, 'MAX_QUEUE': 1, 'QUEUE_TIMEOUT': 1.0}
+        options.update(config)
+        return AdmissionController(options)
+
+    def wait_in_queue(self, admission):
+        """在后台线程中排队，返回 (线程, 结果列表)；被接纳后立即释放."""
+        outcome = []
+
+        def run():
+            try:
+                with admission.admit():
+                    outcome.append('admitted')
+            except AdmissionRejected as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.assertTrue(wait_for(lambda: admission.waiting or outcome))
+        return thread, outcome
+
+    def test_queue_full_is_rejected(self):
+        admission = self.make()
+        admission.acquire()
+        self.addCleanup(admission.release)
+        self.wait_in_queue(admission)
+
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.acquire()
+        self.assertEqual(str(raised.exception), 'Chat queue is full')
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(admission.stats()['rejected_queue_full'], 1)
+
+    def test_queue_timeout_is_rejected(self):
+        admission = self.make(QUEUE_TIMEOUT=0.05)
+        admission.acquire()
+        self.addCleanup(admission.release)
+
+        started = time.time()
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.acquire()
+        self.assertEqual(str(raised.exception), 'Timed out waiting in chat queue')
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(admission.stats()['rejected_timeout'], 1)
+        self.assertEqual(admission.stats()['queue_depth'], 0)
+
+    def test_release_admits_queued_request(self):
+        admission = self.make()
+        admission.acquire()
+        thread, outcome = self.wait_in_queue(admission)
+
+        admission.release()
+        thread.join(2)
+        self.assertEqual(outcome, ['admitted'])
+        self.assertEqual(admission.stats()['active'], 0)
+
+    def test_timed_out_waiter_passes_wakeup_on(self):
+        admission = self.make(MAX_QUEUE=2, QUEUE_TIMEOUT=0.5)
+        admission.acquire()
+        first, first_outcome = self.wait_in_queue(admission)
+        time.sleep(0.3)
+        second, second_outcome = self.wait_in_queue(admission)
+        self.assertTrue(wait_for(lambda: admission.waiting == 2))
+
+        # 第一个等待者超时后，释放的名额仍然交给第二个等待者
+        first.join(2)
+        self.assertIsInstance(first_outcome[0], AdmissionRejected)
+        admission.release()
+        second.join(2)
+        self.assertEqual(second_outcome, ['admitted'])
+
+    def test_call_releases_on_error(self):
+        admission = self.make()
+
+        def fail():
+            raise ValueError('boom')
+        with self.assertRaises(ValueError):
+            admission.call(fail)
+        self.assertEqual(admission.call(lambda x: x * 2, 21), 42)
+        self.assertEqual(admission.stats()['active'], 0)
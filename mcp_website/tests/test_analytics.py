@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import time
+
+from django.apps import apps
+from django.db.models.query import QuerySet
+from django.test import SimpleTestCase, TestCase
+
+from ..analytics import UNMATCHED, _Delta, bucket_start, dashboard, histogram_quantile, update_rollups
+from ..history import chat_history, to_datetime
+from ..mcp_metrics import LATENCY_BUCKETS
+from ..models import UnmatchedMessage, UsageRollup
+from .utils import patch_attr
+
+NOW = 1717243200.0
+
+
+def exchange(tool='calculate', message='1+1', latency=0.01, tool_duration=0.002, cache_status='miss', ok=True,
+             started_at=NOW, cache_hit=False):
+    return {
+        'conversation': 'c1',
+        'user_message': message,
+        'response': '',
+        'tool': tool,
+        'arguments': {},
+        'cache_status': cache_status,
+        'started_at': started_at,
+        'latency': latency,
+        'tool_started_at': started_at,
+        'tool_duration': tool_duration,
+        'ok': ok,
+        'cache_hit': cache_hit,
+    }
+
+
+class UpdateRollupsTests(TestCase):
+    def rollup(self, kind, name):
+        return UsageRollup.objects.get(kind=kind, name=name)
+
+    def test_batches_accumulate_into_existing_rows(self):
+        update_rollups([exchange(), exchange(ok=False)])
+        update_rollups([exchange(cache_status='hit', tool_duration=None, cache_hit=True)])
+        # 共享工具缓存命中：聊天缓存未命中，查找共享缓存也有耗时
+        update_rollups([exchange(cache_hit=True)])
+
+        tool = self.rollup(UsageRollup.TOOL, 'calculate')
+        self.assertEqual((tool.count, tool.errors, tool.cache_hits, tool.latency_count), (4, 1, 2, 2))
+        self.assertEqual(sum(json.loads(tool.latency_histogram)), 2)
+        intent = self.rollup(UsageRollup.INTENT, 'calculate')
+        self.assertEqual((intent.count, intent.cache_hits, intent.latency_count), (4, 1, 4))
+        self.assertAlmostEqual(intent.latency_sum_ms, 40.0)
+        self.assertEqual(UsageRollup.objects.count(), 2)
+
+    def test_concurrent_histogram_update_is_not_lost(self):
+        update_rollups([exchange()])
+        merge = _Delta.merge
+
+        def racing_merge(delta, histogram):
+            # 另一个进程在读出直方图之后、写回之前累加了同一行
+            if not racing:
+                racing.append(True)
+                update_rollups([exchange(latency=5)])
+            return merge(delta, histogram)
+
+        racing = []
+        patch_attr(self, _Delta, 'merge', racing_merge)
+        update_rollups([exchange(latency=0.2)])
+
+        intent = self.rollup(UsageRollup.INTENT, 'calculate')
+        self.assertEqual((intent.count, intent.latency_count), (3, 3))
+        self.assertEqual(sum(json.loads(intent.latency_histogram)), 3)
+        self.assertAlmostEqual(intent.latency_sum_ms, 5210.0)
+
+    def test_row_created_concurrently_is_updated(self):
+        update = QuerySet.update
+        racing = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is UsageRollup and not racing:
+                # 本进程 UPDATE 时行还不存在，随后另一个进程创建了它
+                racing.append(True)
+                UsageRollup.objects.create(bucket_start=to_datetime(bucket_start(NOW)), kind=UsageRollup.INTENT,
+                                           name='calculate', count=1)
+                return 0
+            return update(queryset, **kwargs)
+
+        patch_attr(self, QuerySet, 'update', racing_update)
+        update_rollups([exchange(latency=None, tool_duration=None, cache_hit=True)])
+
+        self.assertEqual(racing, [True])
+        self.assertEqual(self.rollup(UsageRollup.INTENT, 'calculate').count, 2)
+        self.assertEqual(self.rollup(UsageRollup.TOOL, 'calculate').count, 1)
+
+    def test_unmatched_messages_are_counted_normalized(self):
+        update_rollups([exchange(tool='', message='Hello  World', tool_duration=None)])
+        update_rollups([exchange(tool='', message='hello world ', tool_duration=None, started_at=NOW + 60)])
+
+        message = UnmatchedMessage.objects.get()
+        self.assertEqual((message.text, message.count), ('hello world', 2))
+        self.assertGreater(message.last_seen, message.first_seen)
+        self.assertEqual(self.rollup(UsageRollup.INTENT, UNMATCHED).count, 2)
+
+    def test_dashboard_reads_the_rollups(self):
+        update_rollups([exchange(started_at=time.time()), exchange(tool='get_time', started_at=time.time()),
+                        exchange(tool='', message='hi', tool_duration=None, started_at=time.time())])
+        data = dashboard(hours=1)
+        self.assertEqual(sorted(item['name'] for item in data['tools']), ['calculate', 'get_time'])
+        self.assertEqual(sum(bucket['count'] for bucket in data['timeline']), 3)
+        self.assertEqual(data['top_unmatched'][0]['text'], 'hi')
+
+
+class RollupListenerTests(SimpleTestCase):
+    def test_registered_once_by_the_app_config(self):
+        config = apps.get_app_config('mcp_website')
+        config.ready()
+        config.ready()
+        self.assertEqual(chat_history.listeners.count(update_rollups), 1)
+
+
+class HistogramQuantileTests(SimpleTestCase):
+    def test_interpolates_within_a_bucket(self):
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        counts[1] = 10
+        p50 = histogram_quantile(counts, 50)
+        self.assertEqual(p50, round((LATENCY_BUCKETS[0] + LATENCY_BUCKETS[1]) / 2 * 1000, 3))
+        self.assertIsNone(histogram_quantile([0] * len(counts), 50))
+        counts[-1] = 100
+        self.assertEqual(histogram_quantile(counts, 99), LATENCY_BUCKETS[-1] * 1000)
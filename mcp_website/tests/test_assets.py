@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import re
+
+from django.contrib.staticfiles import finders
+from django.core.urlresolvers import reverse
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ..assets import VENDOR_ASSETS
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class VendorAssetTests(SimpleTestCase):
+    def test_every_asset_is_vendored_with_a_license(self):
+        for name, path in VENDOR_ASSETS.items():
+            found = finders.find(path)
+            self.assertIsNotNone(found, name)
+            library_dir = os.path.join(found[:-len(path)], *path.split('/')[:2])
+            self.assertTrue(any(entry.startswith('LICENSE') for entry in os.listdir(library_dir)), name)
+
+    def test_tag_returns_local_url(self):
+        rendered = Template("{% load mcp_assets %}{% vendor_asset 'marked' %}").render(Context())
+        self.assertEqual(rendered, '/static/vendor/marked/marked.min.js')
+
+    def test_index_page_loads_nothing_from_other_hosts(self):
+        content = self.client.get(reverse('index')).content.decode('utf-8')
+        urls = re.findall(r'<(?:script|link)[^>]+(?:src|href)="([^"]+)"', content)
+        self.assertTrue(urls)
+        self.assertEqual([url for url in urls if not url.startswith('/static/')], [])
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase
+
+from .. import views
+from ..admission import AdmissionController
+from ..chat_cache import chat_cache
+from ..history import chat_history
+from ..mcp_client import MCPClientPool, SimpleMCPClient
+from .utils import FakeBot, patch_attr
+
+CALCULATION = json.dumps({'expression': '1+1', 'result': 2, 'formatted': '2'})
+
+
+class ChatBatchViewTests(SimpleTestCase):
+    def setUp(self):
+        self.bot = FakeBot({'calculate': CALCULATION})
+        self.admission = AdmissionController({'MAX_CONCURRENT': 1, 'MAX_QUEUE': 0, 'QUEUE_TIMEOUT': 0})
+        patch_attr(self, views, 'mcp_bot', self.bot)
+        patch_attr(self, views, 'admission', self.admission)
+        patch_attr(self, chat_history, 'config', dict(chat_history.config, ENABLED=False))
+        chat_cache.cache.clear()
+        self.addCleanup(chat_cache.cache.clear)
+
+    def post(self, messages):
+        response = self.client.post(reverse('chat_batch'), json.dumps({'messages': messages}),
+                                    content_type='application/json')
+        return response.status_code, response.json()
+
+    def test_partial_failure_falls_back_per_message(self):
+        status, data = self.post(['1+1', 'CA警报', '1+1'])
+        self.assertEqual(status, 200)
+        results = data['results']
+        self.assertEqual(len(results), 3)
+        self.assertIn('计算结果', results[0]['response'])
+        self.assertEqual(results[0], results[2])
+        # get_alerts 调用失败：返回备用响应且不写入缓存
+        self.assertNotIn('计算结果', results[1]['response'])
+        self.assertEqual(chat_cache.get('CA警报', 'get_alerts', {'state': 'CA'}), (None, chat_cache.MISS))
+        self.assertEqual(chat_cache.get('1+1', 'calculate', {'expression': '1+1'})[1], chat_cache.HIT)
+
+        # 重复的消息只调用一次工具
+        self.assertEqual(sorted(self.bot.calls),
+                         [('calculate', {'expression': '1+1'}), ('get_alerts', {'state': 'CA'})])
+        self.assertEqual(self.admission.stats()['admitted'], 1)
+
+    def test_cached_batch_skips_admission(self):
+        chat_cache.set('1+1', 'calculate', {'expression': '1+1'}, 'cached')
+        # 占满准入名额，需要准入的请求会被拒绝
+        self.admission.acquire()
+        self.addCleanup(self.admission.release)
+
+        status, data = self.post(['1+1', 'hello'])
+        self.assertEqual(status, 200)
+        self.assertEqual(data['results'][0], {'response': 'cached', 'cache': chat_cache.HIT})
+        self.assertEqual(self.bot.calls, [])
+        self.assertEqual(self.admission.stats()['rejected_queue_full'], 0)
+
+    def test_busy_batch_is_rejected(self):
+        self.admission.acquire()
+        self.addCleanup(self.admission.release)
+
+        status, data = self.post(['1+1'])
+        self.assertEqual(status, 429)
+        self.assertEqual(self.bot.calls, [])
+
+    def test_invalid_messages(self):
+        self.assertEqual(self.post([])[0], 400)
+        self.assertEqual(self.post(['ok', ''])[0], 400)
+
+
+class BatchTimeoutClient(SimpleMCPClient):
+    """send_batch 只回答前 answered 个请求."""
+
+    def __init__(self, answered):
+        SimpleMCPClient.__init__(self, 'python', [])
+        self.answered = answered
+        self.is_connected = True
+        self.timeouts = []
+
+    def send_batch(self, requests, timeout=30):
+        self.timeouts.append(timeout)
+        return [{'jsonrpc': '2.0', 'id': i, 'result': {'content': []}} if i < self.answered else None
+                for i in range(len(requests))]
+
+
+class FailingClient(object):
+    is_connected = True
+
+    def call_tools_batch(self, calls, timeout=30, item_timeout=0.5):
+        raise Exception('server died')
+
+
+class CallToolsBatchTests(SimpleTestCase):
+    def test_timeout_scales_with_batch_size(self):
+        client = BatchTimeoutClient(4)
+        client.call_tools_batch([('calculate', {})] * 4, timeout=10, item_timeout=0.5)
+        self.assertEqual(client.timeouts, [12.0])
+
+    def test_unanswered_calls_get_timeout_errors(self):
+        responses = BatchTimeoutClient(1).call_tools_batch([('calculate', {})] * 3)
+        self.assertIn('result', responses[0])
+        self.assertEqual([response['error']['message'] for response in responses[1:]],
+                         ['Request timed out'] * 2)
+
+    def test_failed_server_only_fails_its_share(self):
+        pool = MCPClientPool('python', [], size=2)
+        pool.clients = [BatchTimeoutClient(10), FailingClient()]
+        responses = pool.call_tools_batch([('calculate', {'expression': str(i)}) for i in range(4)])
+        self.assertEqual(len(responses), 4)
+        self.assertTrue(all('result' in response for response in responses[:2]))
+        self.assertTrue(all('server died' in response['error']['message'] for response in responses[2:]))
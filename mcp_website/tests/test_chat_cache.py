@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..chat_cache import ChatResponseCache
+from .utils import wait_for
+
+
+class ChatResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.chat_cache = ChatResponseCache({
+            'ALIAS': 'default',
+            'TTLS': {'calculate': 60, 'get_time': 0},
+            'FALLBACK_TTL': 0,
+            'STALE_TTL': 60,
+            'KEY_PREFIX': 'test-chat',
+        })
+        self.chat_cache.cache.clear()
+        self.addCleanup(self.chat_cache.cache.clear)
+
+    def make_stale(self, message, tool_name, arguments, response):
+        key = self.chat_cache.make_key(message, tool_name, arguments)
+        self.chat_cache.cache.set(key, {'response': response, 'fresh_until': time.time() - 1}, 60)
+
+    def test_miss_then_hit(self):
+        calls = []
+
+        def render():
+            calls.append(1)
+            return 'result'
+
+        self.assertEqual(self.chat_cache.get_or_render('1+1', 'calculate', {'expression': '1+1'}, render),
+                         ('result', ChatResponseCache.MISS))
+        self.assertEqual(self.chat_cache.get_or_render('1+1', 'calculate', {'expression': '1+1'}, render),
+                         ('result', ChatResponseCache.HIT))
+        self.assertEqual(len(calls), 1)
+
+    def test_key_ignores_whitespace_differences(self):
+        self.assertEqual(self.chat_cache.make_key('  1 +\t1 ', 'calculate', {'expression': '1+1'}),
+                         self.chat_cache.make_key('1 + 1', 'calculate', {'expression': '1+1'}))
+        self.assertNotEqual(self.chat_cache.make_key('1+1', 'calculate', {'expression': '1+1'}),
+                            self.chat_cache.make_key('1+1', 'calculate', {'expression': '1+2'}))
+
+    def test_uncached_tool_bypasses(self):
+        self.assertEqual(self.chat_cache.get_or_render('time', 'get_time', {}, lambda: 'now'),
+                         ('now', ChatResponseCache.BYPASS))
+        self.assertEqual(self.chat_cache.get('time', 'get_time', {}), (None, ChatResponseCache.BYPASS))
+
+    def test_failed_render_is_not_cached(self):
+        self.assertEqual(self.chat_cache.get_or_render('1+1', 'calculate', {}, lambda: None),
+                         (None, ChatResponseCache.MISS))
+        self.assertEqual(self.chat_cache.get('1+1', 'calculate', {}), (None, ChatResponseCache.MISS))
+
+    def test_stale_entry_is_served_and_revalidated(self):
+        self.make_stale('1+1', 'calculate', {}, 'old')
+        rendered = threading.Event()
+
+        def render():
+            rendered.set()
+            return 'new'
+
+        self.assertEqual(self.chat_cache.get_or_render('1+1', 'calculate', {}, render),
+                         ('old', ChatResponseCache.STALE))
+        self.assertTrue(rendered.wait(2))
+        self.assertTrue(wait_for(lambda: self.chat_cache.get('1+1', 'calculate', {}) ==
+                                 ('new', ChatResponseCache.HIT)))
+
+    def test_only_one_revalidation_per_key(self):
+        self.make_stale('1+1', 'calculate', {}, 'old')
+        release = threading.Event()
+        calls = []
+
+        def render():
+            calls.append(1)
+            release.wait(2)
+            return 'new'
+
+        for _ in range(3):
+            self.assertEqual(self.chat_cache.get_or_render('1+1', 'calculate', {}, render)[1],
+                             ChatResponseCache.STALE)
+        release.set()
+        self.assertTrue(wait_for(lambda: self.chat_cache.get('1+1', 'calculate', {})[0] == 'new'))
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_revalidation_keeps_stale_entry(self):
+        self.make_stale('1+1', 'calculate', {}, 'old')
+        done = threading.Event()
+
+        def render():
+            done.set()
+            return None
+
+        self.chat_cache.get_or_render('1+1', 'calculate', {}, render)
+        self.assertTrue(done.wait(2))
+        lock_key = self.chat_cache.make_key('1+1', 'calculate', {}) + ':refresh'
+        self.assertTrue(wait_for(lambda: self.chat_cache.cache.get(lock_key) is None))
+        self.assertEqual(self.chat_cache.get('1+1', 'calculate', {}), ('old', ChatResponseCache.STALE))
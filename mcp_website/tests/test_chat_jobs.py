@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase
+
+from .. import views
+from ..chat_jobs import ChatJob, ChatJobPool, JobQueueFull
+from .utils import patch_attr
+
+
+def make_pool(**config):
+    options = {'ALIAS': 'default', 'KEY_PREFIX': 'test-chat-job', 'WORKERS': 1, 'MAX_QUEUE': 1,
+               'RESULT_TTL': 60, 'MAX_WAIT': 1, 'POLL_INTERVAL': 0.01}
+    options.update(config)
+    return ChatJobPool(options)
+
+
+def wait_until_running(pool, job_id, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pool.get(job_id).status != ChatJob.PENDING:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class ChatJobPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = make_pool()
+        self.pool.cache.clear()
+        self.addCleanup(self.pool.cache.clear)
+
+    def test_result_is_visible_to_other_pools(self):
+        job = self.pool.submit(lambda a, b: a + b, 1, 2)
+        self.assertEqual(self.pool.wait(job.id, 1).to_dict(), {'job_id': job.id, 'status': ChatJob.DONE, 'result': 3})
+
+        # 另一个进程的池只共享缓存
+        other = make_pool()
+        self.assertEqual(other.get(job.id).result, 3)
+        self.assertEqual(other.wait(job.id, 1).status, ChatJob.DONE)
+
+    def test_failed_job_reports_error(self):
+        def fail():
+            raise ValueError('boom')
+        job = self.pool.submit(fail)
+        self.assertEqual(self.pool.wait(job.id, 1).to_dict(), {'job_id': job.id, 'status': ChatJob.FAILED,
+                                                                'error': 'boom'})
+
+    def test_wait_is_capped(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        job = self.pool.submit(release.wait, 5)
+
+        started = time.time()
+        self.assertFalse(make_pool(MAX_WAIT=0.1).wait(job.id, 30).finished)
+        self.assertLess(time.time() - started, 1)
+
+        release.set()
+        self.assertTrue(self.pool.wait(job.id, 1).finished)
+
+    def test_full_queue_is_rejected(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        running = self.pool.submit(release.wait, 5)
+        self.assertTrue(wait_until_running(self.pool, running.id))
+        self.pool.submit(release.wait, 5)
+
+        with self.assertRaises(JobQueueFull):
+            self.pool.submit(release.wait, 5)
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.pool.get('missing'))
+        self.assertIsNone(self.pool.wait('missing', 1))
+
+
+class ChatJobViewTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = make_pool()
+        self.pool.cache.clear()
+        self.addCleanup(self.pool.cache.clear)
+        patch_attr(self, views, 'chat_jobs', self.pool)
+
+    def test_pending_job_asks_client_to_retry(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        job = self.pool.submit(release.wait, 5)
+
+        response = self.client.get(reverse('chat_job', args=[job.id]), {'wait': '0.05'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()['status'], (ChatJob.PENDING, ChatJob.RUNNING))
+        self.assertEqual(response['Retry-After'], '1')
+
+        release.set()
+        response = self.client.get(reverse('chat_job', args=[job.id]), {'wait': '1'})
+        self.assertEqual(response.json()['status'], ChatJob.DONE)
+        self.assertFalse(response.has_header('Retry-After'))
+
+    def test_unknown_job_is_404(self):
+        response = self.client.get(reverse('chat_job', args=['0' * 32]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_wait_is_400(self):
+        response = self.client.get(reverse('chat_job', args=['0' * 32]), {'wait': 'soon'})
+        self.assertEqual(response.status_code, 400)
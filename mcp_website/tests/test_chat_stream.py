@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import time
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase
+
+from .. import views
+from ..chat_cache import chat_cache
+from ..history import chat_history
+from .utils import FakeBot, parse_sse, patch_attr, wait_for
+
+
+class ChatStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.bot = FakeBot({'calculate': json.dumps({'expression': '1+1', 'result': 2, 'formatted': '2'})})
+        patch_attr(self, views, 'mcp_bot', self.bot)
+        patch_attr(self, chat_history, 'config', dict(chat_history.config, ENABLED=False))
+        chat_cache.cache.clear()
+        self.addCleanup(chat_cache.cache.clear)
+
+    def stream(self, message):
+        response = self.client.get(reverse('chat_stream'), {'message': message})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        return parse_sse(b''.join(response.streaming_content))
+
+    def test_miss_streams_tool_result_and_caches_it(self):
+        events = self.stream('1+1')
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'routing')
+        self.assertEqual(events[0][1]['tool'], 'calculate')
+        self.assertIn('chunk', names)
+        self.assertEqual(events[-1], ('done', {'ok': True, 'cache': chat_cache.MISS}))
+        self.assertEqual(self.bot.calls, [('calculate', {'expression': '1+1'})])
+
+        text = ''.join(data['text'] for name, data in events if name == 'chunk')
+        self.assertEqual(chat_cache.get('1+1', 'calculate', {'expression': '1+1'}), (text, chat_cache.HIT))
+
+    def test_hit_is_streamed_without_calling_the_tool(self):
+        chat_cache.set('1+1', 'calculate', {'expression': '1+1'}, 'cached\n\nanswer')
+        events = self.stream('1+1')
+        self.assertEqual([data['text'] for name, data in events if name == 'chunk'], ['cached\n\n', 'answer'])
+        self.assertEqual(events[-1], ('done', {'ok': True, 'cache': chat_cache.HIT}))
+        self.assertEqual(self.bot.calls, [])
+
+    def test_stale_hit_is_streamed_and_revalidated(self):
+        key = chat_cache.make_key('1+1', 'calculate', {'expression': '1+1'})
+        chat_cache.cache.set(key, {'response': 'old', 'fresh_until': time.time() - 1}, 60)
+
+        events = self.stream('1+1')
+        self.assertEqual([data['text'] for name, data in events if name == 'chunk'], ['old'])
+        self.assertEqual(events[-1], ('done', {'ok': True, 'cache': chat_cache.STALE}))
+
+        self.assertTrue(wait_for(lambda: chat_cache.get('1+1', 'calculate', {'expression': '1+1'})[1]
+                                 == chat_cache.HIT))
+        self.assertEqual(self.bot.calls, [('calculate', {'expression': '1+1'})])
+        self.assertNotEqual(chat_cache.get('1+1', 'calculate', {'expression': '1+1'})[0], 'old')
+
+    def test_failed_tool_call_is_not_cached(self):
+        self.bot.results = {}
+        events = self.stream('1+1')
+        self.assertEqual(events[-1], ('done', {'ok': False, 'cache': chat_cache.MISS}))
+        self.assertEqual(chat_cache.get('1+1', 'calculate', {'expression': '1+1'}), (None, chat_cache.MISS))
+
+    def test_missing_message_is_rejected(self):
+        response = self.client.get(reverse('chat_stream'))
+        self.assertEqual(response.status_code, 400)
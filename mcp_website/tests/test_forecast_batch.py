@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import SimpleTestCase
+
+from .utils import QuietWeatherServer, ToolCallFailed, patch_environ
+
+
+class ForecastBatchToolTests(SimpleTestCase):
+    def setUp(self):
+        patch_environ(self, MCP_FORECAST_DATA=None, MCP_ALERTS_FEED=None, MCP_SHARED_CACHE=None)
+        self.server = QuietWeatherServer()
+        self.server.forecast_engine.synthetic_resolution = 10.0
+
+    def test_columns_match_single_forecasts(self):
+        batch = self.server.call_tool('get_forecast_batch', {'latitudes': [40.0, -33.9, 95.0],
+                                                             'longitudes': [116.0, 151.2, 0.0]})
+        self.assertEqual(batch['count'], 3)
+        self.assertEqual(batch['valid'], [True, True, False])
+        self.assertEqual(len(batch['periods']), self.server.forecast_engine.max_periods)
+
+        for i, (latitude, longitude) in enumerate([(40.0, 116.0), (-33.9, 151.2)]):
+            single = self.server.call_tool('get_forecast', {'latitude': latitude, 'longitude': longitude})
+            periods = single['periods']
+            self.assertEqual(batch['temperature'][i], [period['temperature'] for period in periods])
+            self.assertEqual(batch['wind_direction'][i], [period['wind_direction'] for period in periods])
+        for column in ('temperature', 'wind_speed', 'wind_direction', 'precipitation_probability', 'cloud_cover'):
+            self.assertIsNone(batch[column][2])
+
+    def test_nearest_method(self):
+        batch = self.server.call_tool('get_forecast_batch', {'latitudes': [40.0], 'longitudes': [120.0],
+                                                             'method': 'nearest'})
+        self.assertEqual(batch['method'], 'nearest')
+        self.assertEqual(batch['valid'], [True])
+
+    def test_invalid_requests(self):
+        with self.assertRaises(ToolCallFailed):
+            self.server.call_tool('get_forecast_batch', {'latitudes': [1.0, 2.0], 'longitudes': [1.0]})
+        with self.assertRaises(ToolCallFailed):
+            self.server.call_tool('get_forecast_batch', {'latitudes': [1.0], 'longitudes': [1.0],
+                                                         'method': 'cubic'})
+        too_many = [0.0] * (self.server.MAX_FORECAST_LOCATIONS + 1)
+        with self.assertRaises(ToolCallFailed):
+            self.server.call_tool('get_forecast_batch', {'latitudes': too_many, 'longitudes': too_many})
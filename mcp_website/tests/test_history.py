@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import atexit
+import sys
+import time
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.utils.six import StringIO
+
+from ..history import ChatHistory
+from ..models import Conversation, Message, ToolCall
+from .utils import patch_attr
+
+
+def exchange(conversation='c1', message='1+1', tool='calculate', latency=0.01, tool_duration=0.002, **extra):
+    values = {
+        'conversation': conversation,
+        'user_message': message,
+        'response': '2',
+        'tool': tool,
+        'arguments': {'expression': message},
+        'cache_status': 'miss',
+        'started_at': time.time(),
+        'latency': latency,
+        'tool_started_at': time.time(),
+        'tool_duration': tool_duration,
+        'ok': True,
+        'cache_hit': False,
+    }
+    values.update(extra)
+    return values
+
+
+class HistoryWriteTests(TestCase):
+    def setUp(self):
+        self.history = ChatHistory({'ENABLED': True})
+        # 写入失败时打印的 traceback 不进入测试输出
+        patch_attr(self, sys, 'stderr', StringIO())
+        patch_attr(self, sys, 'stdout', StringIO())
+
+    def test_batch_is_written_in_one_go(self):
+        self.history._write([exchange(), exchange(message='2+2', cache_hit=True), exchange('c2', tool='')])
+
+        self.assertEqual(Conversation.objects.get(key='c1').message_count, 4)
+        self.assertEqual(Message.objects.count(), 6)
+        self.assertEqual(list(ToolCall.objects.order_by('id').values_list('cache_hit', flat=True)), [False, True])
+        stats = self.history.stats()
+        self.assertEqual((stats['written'], stats['batches'], stats['errors']), (3, 1, 0))
+
+    def test_bad_exchange_only_drops_itself(self):
+        self.history._write([exchange(), exchange(latency='slow'), exchange('c2')])
+
+        self.assertEqual(sorted(Conversation.objects.values_list('key', flat=True)), ['c1', 'c2'])
+        self.assertEqual(Message.objects.count(), 4)
+        stats = self.history.stats()
+        self.assertEqual((stats['written'], stats['dropped'], stats['errors']), (2, 1, 1))
+
+    def test_conversation_created_concurrently_is_retried_with_get_or_create(self):
+        def create(**kwargs):
+            # 另一个进程抢先创建了同一对话
+            raise IntegrityError('UNIQUE constraint failed: mcp_website_conversation.key')
+
+        Conversation.objects.create = create
+        self.addCleanup(delattr, Conversation.objects, 'create')
+
+        self.history._write([exchange(), exchange('c2')])
+
+        self.assertEqual(Conversation.objects.count(), 2)
+        stats = self.history.stats()
+        self.assertEqual((stats['written'], stats['dropped'], stats['errors']), (2, 0, 0))
+
+    def test_failing_listener_does_not_affect_history_or_other_listeners(self):
+        seen = []
+
+        def broken(batch):
+            Conversation.objects.filter(key='c1').update(message_count=100)
+            raise ValueError('listener bug')
+
+        self.history.listeners = [broken, seen.append]
+        self.history._write([exchange()])
+
+        self.assertEqual(Conversation.objects.get(key='c1').message_count, 2)
+        self.assertEqual(len(seen), 1)
+        stats = self.history.stats()
+        self.assertEqual((stats['written'], stats['errors']), (1, 1))
+
+
+class RecordingHistory(ChatHistory):
+    """不访问数据库，记录每次写入的批."""
+
+    def __init__(self, config):
+        ChatHistory.__init__(self, config)
+        self.batches = []
+
+    def _write(self, batch):
+        self.batches.append([item['user_message'] for item in batch])
+
+
+class HistoryQueueTests(SimpleTestCase):
+    def test_stop_writes_what_is_queued(self):
+        history = RecordingHistory({'ENABLED': True, 'FLUSH_INTERVAL': 30})
+        for message in ('a', 'b', 'c'):
+            history.record('c1', message, 'ok')
+
+        started = time.time()
+        self.assertTrue(history.stop())
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(sum(history.batches, []), ['a', 'b', 'c'])
+        self.assertIsNone(history.writer)
+        self.assertTrue(history.stop())
+
+        # stop 之后的记录会重新启动写入线程
+        history.record('c1', 'd', 'ok')
+        self.assertTrue(history.stop())
+        self.assertEqual(history.batches[-1], ['d'])
+
+    def test_exit_handler_is_registered_once(self):
+        registered = []
+        patch_attr(self, atexit, 'register', registered.append)
+        history = RecordingHistory({'ENABLED': True})
+        for message in ('a', 'b'):
+            history.record('c1', message, 'ok')
+            self.assertTrue(history.stop())
+        self.assertEqual(registered, [history.stop])
+
+    def test_full_queue_drops_new_records(self):
+        history = RecordingHistory({'ENABLED': True, 'MAX_QUEUE': 1})
+        history.writer = object()
+        history.record('c1', 'a', 'ok')
+        history.record('c1', 'b', 'ok')
+        stats = history.stats()
+        self.assertEqual((stats['recorded'], stats['dropped'], stats['queue_depth']), (1, 1, 1))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+
+from ..history import chat_history
+from ..loadtest import DEFAULT_MIX, LoadRunner, parse_mix, percentile, summarize
+from ..management.commands.loadtest import Command
+from ..mcp_utils import mcp_bot
+from .utils import patch_attr
+
+
+class StatisticsTests(SimpleTestCase):
+    def test_percentile_uses_the_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_in_milliseconds(self):
+        summary = summarize([0.003, 0.001, 0.002])
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual((summary['min'], summary['p50'], summary['max']), (1.0, 2.0, 3.0))
+        self.assertEqual(summary['mean'], 2.0)
+        self.assertEqual(summarize([]), {'count': 0})
+
+
+class ParseMixTests(SimpleTestCase):
+    def test_sources(self):
+        self.assertEqual(parse_mix(None), DEFAULT_MIX)
+        self.assertEqual(parse_mix('{"b": 1, "a": 2}'), [('a', 2), ('b', 1)])
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'mix.json')
+        with open(path, 'wb') as f:
+            f.write(json.dumps({'天气': 1}, ensure_ascii=False).encode('utf-8'))
+        self.assertEqual(parse_mix(path), [('天气', 1)])
+
+    def test_weights_must_be_positive(self):
+        for value in ('{}', '{"a": 0}', '{"a": 1, "b": -1}'):
+            with self.assertRaises(ValueError):
+                parse_mix(value)
+
+
+class LoadRunnerTests(SimpleTestCase):
+    def test_counts_outcomes_and_errors(self):
+        def send(message):
+            if message == 'boom':
+                raise IOError()
+            return ('200 hit', True) if message == 'ok' else ('429', False)
+
+        result = LoadRunner(send, [('ok', 1), ('busy', 1), ('boom', 1)], concurrency=2, duration=0.05,
+                            seed=1).run()
+        outcomes = result['outcomes']
+        self.assertEqual(sum(outcomes.values()), result['requests'])
+        self.assertEqual(result['errors'], outcomes.get('429', 0) + outcomes.get('error: IOError', 0))
+        self.assertEqual(set(outcomes), {'200 hit', '429', 'error: IOError'})
+        self.assertEqual(set(result['messages']), {'ok', 'busy', 'boom'})
+        self.assertEqual(result['latency_ms']['count'], result['requests'])
+
+    def test_warmup_requests_are_not_counted(self):
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            return 'ok', True
+
+        result = LoadRunner(send, [('a', 1)], concurrency=1, duration=0.02, warmup=0.05).run()
+        self.assertLess(result['requests'], len(sent))
+
+
+class LoadtestCommandTests(SimpleTestCase):
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest', mix='{"a": 0}')
+        with self.assertRaises(CommandError):
+            call_command('loadtest', concurrency=0)
+        with self.assertRaises(CommandError):
+            call_command('loadtest', transport='http')
+
+    def test_run_uses_its_own_pool_size_and_skips_history(self):
+        seen = []
+        pool_size = getattr(settings, 'MCP_SERVER_POOL_SIZE', 1)
+        patch_attr(self, chat_history, 'config', dict(chat_history.config, ENABLED=True))
+
+        def setup(command, options, size):
+            def send(message):
+                seen.append((size, mcp_bot.pool_size, chat_history.enabled))
+                return 'ok', True
+            return send, lambda: None
+
+        patch_attr(self, Command, '_setup_client', setup)
+        call_command('loadtest', pool_size=pool_size + 3, duration=0.05, warmup=0, concurrency=1, stdout=StringIO())
+
+        self.assertEqual(seen[0], (pool_size + 3, pool_size + 3, False))
+        self.assertEqual(getattr(settings, 'MCP_SERVER_POOL_SIZE', 1), pool_size)
+        self.assertIsNone(mcp_bot.pool_size)
+        self.assertTrue(chat_history.enabled)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..mcp_alerts import AlertStore, parse_timestamp
+
+NOW = parse_timestamp('2024-06-01T12:00:00Z')
+
+
+def feature(alert_id, states=None, ugc=None, expires='2024-06-02T00:00:00Z', **properties):
+    properties.update({'id': alert_id, 'event': 'Heat Advisory', 'expires': expires})
+    if states is not None:
+        properties['states'] = states
+    if ugc is not None:
+        properties['geocode'] = {'UGC': ugc}
+    return json.dumps({'type': 'Feature', 'properties': properties}) + '\n'
+
+
+class ParseTimestampTests(SimpleTestCase):
+    def test_formats(self):
+        self.assertEqual(parse_timestamp('2024-06-01T12:00:00Z'), NOW)
+        self.assertEqual(parse_timestamp('2024-06-01T05:00:00-07:00'), NOW)
+        self.assertEqual(parse_timestamp('2024-06-01T17:30:00+0530'), NOW)
+        self.assertEqual(parse_timestamp('2024-06-01T12:00:00.250Z'), NOW)
+        self.assertEqual(parse_timestamp(NOW), NOW)
+        self.assertIsNone(parse_timestamp(None))
+        with self.assertRaises(ValueError):
+            parse_timestamp('yesterday')
+
+
+class AlertStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'alerts.jsonl')
+        self.store = AlertStore(self.path)
+
+    def write(self, text, mode='a'):
+        with open(self.path, mode) as f:
+            f.write(text)
+
+    def ids(self, state):
+        return sorted(alert['id'] for alert in self.store.get(state, NOW))
+
+    def test_indexes_alerts_by_state(self):
+        self.write(feature('a', ugc=['CAZ006', 'NVZ001']) + feature('b', states=['ca']) + feature('c', ugc=['TXZ100']))
+        self.assertEqual(self.ids('CA'), ['a', 'b'])
+        self.assertEqual(self.ids('nv'), ['a'])
+        self.assertEqual(self.ids('TX'), ['c'])
+        self.assertEqual(self.ids('NY'), [])
+
+    def test_appended_lines_are_applied_incrementally(self):
+        self.write(feature('a', states=['CA']))
+        self.assertEqual(self.ids('CA'), ['a'])
+
+        # 同一 id 的新记录替换旧记录，Cancel 删除
+        self.write(feature('a', states=['NV']) + feature('b', states=['CA']))
+        self.store.reload()
+        self.assertEqual(self.ids('CA'), ['b'])
+        self.assertEqual(self.ids('NV'), ['a'])
+
+        self.write(feature('b', states=['CA'], messageType='Cancel'))
+        self.store.reload()
+        self.assertEqual(self.ids('CA'), [])
+
+        stats = self.store.stats()
+        self.assertEqual(stats['lines_applied'], 4)
+        self.assertEqual(stats['full_reloads'], 1)
+
+    def test_partial_last_line_waits_for_the_rest(self):
+        line = feature('a', states=['CA'])
+        self.write(line[:20])
+        self.assertEqual(self.ids('CA'), [])
+        self.write(line[20:])
+        self.store.reload()
+        self.assertEqual(self.ids('CA'), ['a'])
+        self.assertEqual(self.store.stats()['bad_lines'], 0)
+
+    def test_rewritten_feed_is_reloaded_from_the_start(self):
+        self.write(feature('a', states=['CA']) + feature('b', states=['CA']))
+        self.assertEqual(self.ids('CA'), ['a', 'b'])
+
+        self.write(feature('c', states=['CA']), mode='w')
+        self.store.reload()
+        self.assertEqual(self.ids('CA'), ['c'])
+        self.assertEqual(self.store.stats()['full_reloads'], 2)
+
+    def test_expired_alerts_are_evicted(self):
+        self.write(feature('a', states=['CA'], expires='2024-06-01T11:00:00Z') +
+                   feature('b', states=['CA'], expires=None) +
+                   feature('c', states=['CA']))
+        self.assertEqual(self.ids('CA'), ['b', 'c'])
+        self.assertEqual(self.store.stats()['evicted'], 1)
+
+    def test_bad_lines_are_counted_and_skipped(self):
+        self.write('not json\n' + json.dumps({'properties': {}}) + '\n' + feature('a', states=['CA']))
+        self.assertEqual(self.ids('CA'), ['a'])
+        self.assertEqual(self.store.stats()['bad_lines'], 2)
+
+    def test_missing_feed_has_no_alerts(self):
+        self.assertEqual(self.ids('CA'), [])
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import SimpleTestCase
+
+from .. import mcp_calc
+from ..mcp_calc import CalculationError, SafeCalculator
+from .utils import patch_attr
+
+
+class SafeCalculatorTests(SimpleTestCase):
+    def setUp(self):
+        self.calculator = SafeCalculator(max_bits=256, max_steps=20, max_length=100, cache_size=2)
+
+    def test_arithmetic(self):
+        self.assertEqual(self.calculator.evaluate('2 + 3 * 4'), 14)
+        self.assertEqual(self.calculator.evaluate('(2 + 3) * 4'), 20)
+        self.assertEqual(self.calculator.evaluate('-2 ** 2'), -4)
+        self.assertEqual(self.calculator.evaluate('7 // 2'), 3)
+        self.assertEqual(self.calculator.evaluate('7 % 4'), 3)
+        self.assertEqual(self.calculator.evaluate('1, 2 * 3'), (1, 6))
+
+    def test_division_is_true_division(self):
+        self.assertEqual(self.calculator.evaluate('7 / 2'), 3.5)
+        self.assertEqual(self.calculator.evaluate('x / y', {'x': 7, 'y': 2}), 3.5)
+
+    def test_vectorized_division_matches_scalar(self):
+        columns = {'x': [7, 1, 6], 'y': [2, 0, 3]}
+        self.assertEqual(self.calculator.evaluate_vectorized('x / y', columns), [3.5, None, 2.0])
+        patch_attr(self, mcp_calc, 'numpy', None)
+        self.assertEqual(self.calculator.evaluate_vectorized('x / y', columns), [3.5, None, 2.0])
+
+    def test_non_finite_results_are_rejected(self):
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('1e308 * 10')
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('1, 1e400')
+        self.assertEqual(self.calculator.evaluate_vectorized('x * 1e308', {'x': [1, 10]}), [1e308, None])
+        patch_attr(self, mcp_calc, 'numpy', None)
+        self.assertEqual(self.calculator.evaluate_vectorized('x * 1e308', {'x': [1, 10]}), [1e308, None])
+
+    def test_disallowed_nodes_are_rejected(self):
+        for expression in ('__import__("os")', 'x.real', '[1, 2]', '1 if 1 else 2', 'not 1', '1 < 2',
+                           'lambda: 1', '"text"', '1 << 2', '(1, (2, 3))'):
+            with self.assertRaises(CalculationError, msg=expression):
+                self.calculator.evaluate(expression, {'x': 1})
+
+    def test_unknown_names_and_bad_syntax(self):
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('y + 1', {'x': 1})
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('1 +')
+
+    def test_limits(self):
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('9 ** 9 ** 9')
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('2 ** 200 * 2 ** 200')
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('+'.join(['1'] * 20))
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate('1' * 101)
+
+    def test_vectorized_tuple_is_rejected(self):
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate_vectorized('x, x', {'x': [1, 2]})
+        patch_attr(self, mcp_calc, 'numpy', None)
+        with self.assertRaises(CalculationError):
+            self.calculator.evaluate_vectorized('x, x', {'x': [1, 2]})
+
+    def test_compiled_expressions_are_cached(self):
+        self.calculator.evaluate('1 + 1')
+        self.calculator.evaluate('1 + 1')
+        self.calculator.evaluate('2 + 2')
+        self.calculator.evaluate('3 + 3')
+        self.assertEqual(self.calculator.cache_info(), {'size': 2, 'max_size': 2, 'hits': 1, 'misses': 3})
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..mcp_forecast import BILINEAR, NEAREST, ForecastEngine, ForecastError, generate_synthetic
+
+WEEK = 7 * 24 * 3600
+
+
+class ForecastEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = ForecastEngine(synthetic_resolution=10.0, max_periods=4)
+
+    def test_forecast_periods(self):
+        forecast = self.engine.forecast(40.0, 116.0)
+        periods = forecast['periods']
+        self.assertEqual(forecast['source'], 'synthetic')
+        self.assertEqual([period['number'] for period in periods], [1, 2, 3, 4])
+        self.assertEqual([period['is_daytime'] for period in periods[1:3]],
+                         [not periods[0]['is_daytime'], periods[0]['is_daytime']])
+        for period in periods:
+            self.assertGreater(period['end_time'], datetime.datetime.now().isoformat())
+            self.assertEqual(period['temperature_unit'], 'F')
+            self.assertTrue(0 <= period['precipitation_probability'] <= 100)
+
+    def test_nearest_matches_bilinear_on_grid_points(self):
+        bilinear = self.engine.forecast(40.0, 120.0, BILINEAR)['periods']
+        nearest = self.engine.forecast(40.0, 120.0, NEAREST)['periods']
+        self.assertEqual([p['temperature'] for p in bilinear], [p['temperature'] for p in nearest])
+
+    def test_batch_marks_points_outside_the_grid(self):
+        batch = self.engine.forecast_batch([40.0, 95.0], [116.0, 0.0])
+        self.assertEqual(batch['valid'], [True, False])
+        self.assertEqual(len(batch['temperature'][0]), 4)
+        self.assertIsNone(batch['temperature'][1])
+        self.assertEqual(batch['temperature'][0], [p['temperature'] for p in
+                                                   self.engine.forecast(40.0, 116.0)['periods']])
+
+    def test_outside_point_is_an_error(self):
+        with self.assertRaises(ForecastError):
+            self.engine.forecast(95.0, 0.0)
+
+    def test_synthetic_grid_from_an_earlier_day_is_regenerated(self):
+        self.engine._grid = generate_synthetic(resolution=10.0, start_time=time.time() - WEEK - 3600)
+        forecast = self.engine.forecast(40.0, 116.0)
+        self.assertEqual(len(forecast['periods']), 4)
+        self.assertEqual(datetime.date.fromtimestamp(self.engine.grid.start_time), datetime.date.today())
+
+    def test_expired_dataset_on_disk_is_reported(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        generate_synthetic(directory, resolution=10.0, start_time=time.time() - WEEK - 3600)
+
+        engine = ForecastEngine(directory)
+        with self.assertRaises(ForecastError):
+            engine.forecast(40.0, 116.0)
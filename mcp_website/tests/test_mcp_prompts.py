@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..mcp_prompts import PromptError, PromptRegistry, PromptTemplate
+from .utils import QuietWeatherServer
+
+ARGUMENTS = [{'name': 'location', 'required': True}, {'name': 'style'}]
+MESSAGES = [{'role': 'user', 'text': '{location} 的天气，{{风格}}：{style}'}]
+
+
+def texts(messages):
+    return [message['content']['text'] for message in messages]
+
+
+class PromptTemplateTests(SimpleTestCase):
+    def setUp(self):
+        self.template = PromptTemplate('report', 'Weather report', ARGUMENTS, MESSAGES)
+
+    def test_render(self):
+        values = self.template.values({'location': '北京', 'style': 3})
+        self.assertEqual(values, ('北京', '3'))
+        self.assertEqual(self.template.render(values),
+                         [{'role': 'user', 'content': {'type': 'text', 'text': '北京 的天气，{风格}：3'}}])
+        self.assertEqual(texts(self.template.render(self.template.values({'location': '上海'}))),
+                         ['上海 的天气，{风格}：'])
+
+    def test_invalid_arguments(self):
+        for arguments in ({}, {'location': ''}, {'location': 'x', 'unknown': 1}, {'location': ['x']}):
+            with self.assertRaises(PromptError, msg=repr(arguments)):
+                self.template.values(arguments)
+
+    def test_invalid_templates(self):
+        for messages in ([{'text': '{undeclared}'}], [{'text': '{location!r}'}], [{'text': '{location:>10}'}],
+                         [{'text': '{location'}], [{'role': 'system', 'text': 'x'}], []):
+            with self.assertRaises(PromptError, msg=repr(messages)):
+                PromptTemplate('report', '', ARGUMENTS, messages)
+        with self.assertRaises(PromptError):
+            PromptTemplate('bad name', '', [], [{'text': 'x'}])
+        with self.assertRaises(PromptError):
+            PromptTemplate('report', '', [{'name': 'a'}, {'name': 'a'}], [{'text': 'x'}])
+
+
+class PromptRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = PromptRegistry(self.directory, reload_interval=0, cache_size=2)
+        self.registry.add(PromptTemplate('report', '', ARGUMENTS, MESSAGES))
+
+    def write(self, filename, data, mtime):
+        path = os.path.join(self.directory, filename)
+        with open(path, 'wb') as f:
+            f.write(data if isinstance(data, bytes) else json.dumps(data).encode('utf-8'))
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def render(self, name, **arguments):
+        return texts(self.registry.render(name, arguments)[1])
+
+    def test_rendered_messages_are_cached(self):
+        self.render('report', location='北京')
+        self.render('report', location='北京')
+        self.render('report', location='上海')
+        self.render('report', location='广州')
+        self.render('report', location='北京')
+        stats = self.registry.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['cache_size']), (1, 4, 2))
+        self.assertIsNone(self.registry.render('missing', {}))
+
+    def test_files_override_builtin_templates_and_reload_on_change(self):
+        self.assertEqual(self.render('report', location='北京'), ['北京 的天气，{风格}：'])
+        path = self.write('report.json', {'arguments': ARGUMENTS, 'messages': [{'text': '新：{location}'}]}, 1000)
+        self.assertEqual(self.render('report', location='北京'), ['新：北京'])
+
+        self.write('report.json', {'arguments': ARGUMENTS, 'messages': [{'text': '改：{location}'}]}, 2000)
+        self.assertEqual(self.render('report', location='北京'), ['改：北京'])
+
+        os.remove(path)
+        self.assertEqual(self.render('report', location='北京'), ['北京 的天气，{风格}：'])
+        self.assertEqual(self.registry.stats()['reloads'], 3)
+
+    def test_broken_file_keeps_the_previous_version(self):
+        self.write('daily.json', {'messages': [{'text': '今日'}]}, 1000)
+        self.assertEqual(self.render('daily'), ['今日'])
+        self.write('daily.json', b'{not json', 2000)
+        self.assertEqual(self.render('daily'), ['今日'])
+        self.write('bad.json', {'messages': [{'text': '{x}'}]}, 1000)
+        self.assertNotIn('bad', self.registry.templates())
+        self.assertEqual(self.registry.stats()['load_errors'], 2)
+
+    def test_reload_interval(self):
+        registry = PromptRegistry(self.directory, reload_interval=60)
+        registry.maybe_reload(now=1000)
+        self.write('daily.json', {'messages': [{'text': '今日'}]}, 1000)
+        # get() 会按当前时间检查，这里直接看已加载的模板
+        registry.maybe_reload(now=1030)
+        self.assertNotIn('daily', registry.loaded)
+        registry.maybe_reload(now=1061)
+        self.assertIn('daily', registry.loaded)
+
+
+class ServerPromptTests(SimpleTestCase):
+    def setUp(self):
+        self.server = QuietWeatherServer()
+
+    def request(self, method, params=None):
+        return self.server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}})
+
+    def test_list_and_get(self):
+        names = [prompt['name'] for prompt in self.request('prompts/list')['result']['prompts']]
+        self.assertIn('weather_report', names)
+        self.assertEqual(len(names), len(set(names)))
+
+        result = self.request('prompts/get', {'name': 'weather_report', 'arguments': {'location': '北京'}})['result']
+        self.assertIn('北京', result['messages'][0]['content']['text'])
+        self.assertIn('error', self.request('prompts/get', {'name': 'weather_report', 'arguments': {}}))
+        self.assertIn('error', self.request('prompts/get', {'name': 'missing'}))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from django.test import SimpleTestCase
+
+from .. import views
+from ..chat_cache import chat_cache
+from ..history import chat_history
+from ..mcp_shmcache import SEQ, SharedCache, cache_key
+from .utils import FakeBot, QuietWeatherServer, patch_attr, patch_environ
+
+ARGS = {'latitude': 39.9, 'longitude': 116.4}
+
+
+def result(text):
+    return {'content': [{'type': 'text', 'text': text}], 'isError': False}
+
+
+@unittest.skipUnless(SharedCache.supported(), "the shared cache needs fcntl")
+class SharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.bin')
+        self.cache = self.open(slots=8, slot_size=512)
+
+    def open(self, **kwargs):
+        cache = SharedCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def slot_offset(self, tool_name, arguments):
+        index = self.cache._candidates(cache_key(tool_name, arguments))[0]
+        return self.cache._offset(index)
+
+    def test_round_trip_and_expiry(self):
+        self.assertTrue(self.cache.set('get_forecast', ARGS, result('晴'), ttl=60, now=1000))
+        self.assertEqual(self.cache.get('get_forecast', ARGS, now=1059), result('晴'))
+        self.assertIsNone(self.cache.get('get_forecast', ARGS, now=1060))
+        self.assertIsNone(self.cache.get('get_forecast', {'latitude': 0, 'longitude': 0}, now=1000))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['writes']), (1, 2, 1))
+
+    def test_other_handles_share_the_file_and_its_layout(self):
+        self.cache.set('get_forecast', ARGS, result('晴'), ttl=60)
+        other = self.open(slots=1024, slot_size=4096)
+        self.assertEqual((other.slots, other.slot_size), (8, 512))
+        self.assertEqual(other.get('get_forecast', ARGS), result('晴'))
+
+    def test_values_larger_than_a_slot_are_not_stored(self):
+        self.assertFalse(self.cache.set('get_forecast', ARGS, result('x' * 600), ttl=60))
+        self.assertEqual(self.cache.stats()['too_large'], 1)
+
+    def test_slot_being_written_is_a_miss(self):
+        self.cache.set('get_forecast', ARGS, result('晴'), ttl=60)
+        offset = self.slot_offset('get_forecast', ARGS)
+        seq = SEQ.unpack(self.cache.map[offset:offset + SEQ.size])[0]
+        self.assertEqual(seq % 2, 0)
+        # 写入者把序号改为奇数后、改回偶数前，读者不使用该槽位
+        self.cache.map[offset:offset + SEQ.size] = SEQ.pack(seq + 1)
+        self.assertIsNone(self.cache.get('get_forecast', ARGS))
+        self.cache.map[offset:offset + SEQ.size] = SEQ.pack(seq + 2)
+        self.assertEqual(self.cache.get('get_forecast', ARGS), result('晴'))
+
+    def test_writer_killed_mid_write_does_not_poison_the_slot(self):
+        self.cache.set('get_forecast', ARGS, result('晴'), ttl=60)
+        offset = self.slot_offset('get_forecast', ARGS)
+        seq = SEQ.unpack(self.cache.map[offset:offset + SEQ.size])[0]
+        # 写入者在改回偶数前被杀死
+        self.cache.map[offset:offset + SEQ.size] = SEQ.pack(seq + 1)
+        self.assertIsNone(self.cache.get('get_forecast', ARGS))
+        for text in ('雨', '雪'):
+            self.assertTrue(self.cache.set('get_forecast', ARGS, result(text), ttl=60))
+            self.assertEqual(self.cache.get('get_forecast', ARGS), result(text))
+        self.assertEqual(SEQ.unpack(self.cache.map[offset:offset + SEQ.size])[0] % 2, 0)
+
+    def test_corrupted_value_is_a_miss(self):
+        self.cache.set('get_forecast', ARGS, result('晴'), ttl=60)
+        offset = self.slot_offset('get_forecast', ARGS) + 45
+        self.cache.map[offset:offset + 1] = b'#' if self.cache.map[offset:offset + 1] != b'#' else b'$'
+        self.assertIsNone(self.cache.get('get_forecast', ARGS))
+
+    def test_full_candidates_evict_the_entry_expiring_first(self):
+        keys = (cache_key('calculate', {'expression': str(i)}) for i in range(100))
+        key = next(key for key in keys if len(self.cache._candidates(key)) == 2)
+        first, second = self.cache._candidates(key)
+        # 两个候选槽位都被其他键占用
+        self.cache._write(first, b'k' * 16, 2000, b'{}')
+        self.cache._write(second, b'j' * 16, 1500, b'{}')
+        self.assertEqual(self.cache._victim(key, now=1000), second)
+        # 已过期的槽位优先
+        self.cache._write(first, b'k' * 16, 900, b'{}')
+        self.assertEqual(self.cache._victim(key, now=1000), first)
+
+    def test_readers_never_see_torn_writes(self):
+        values = [result('a' * 300), result('b' * 300)]
+        self.cache.set('get_forecast', ARGS, values[0], ttl=60)
+        pid = os.fork()
+        if pid == 0:
+            # 子进程不断交替写入两个值
+            try:
+                writer = SharedCache(self.path)
+                deadline = time.time() + 0.3
+                count = 0
+                while time.time() < deadline:
+                    writer.set('get_forecast', ARGS, values[count % 2], ttl=60)
+                    count += 1
+            finally:
+                os._exit(0)
+
+        seen = set()
+        deadline = time.time() + 0.3
+        while time.time() < deadline:
+            value = self.cache.get('get_forecast', ARGS)
+            if value is not None:
+                self.assertIn(value, values)
+                seen.add(value['content'][0]['text'][0])
+        os.waitpid(pid, 0)
+        self.assertTrue(seen)
+
+
+@unittest.skipUnless(SharedCache.supported(), "the shared cache needs fcntl")
+class ServerSharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patch_environ(self, MCP_SHARED_CACHE=os.path.join(directory, 'cache.bin'))
+        self.server = QuietWeatherServer()
+        self.addCleanup(self.server.tool_cache.close)
+
+    def hits(self, tool):
+        return self.server.metrics.counters.get(('mcp_server_tool_cache_hits_total', (('tool', tool),)), 0)
+
+    def test_cached_tools_are_answered_from_the_shared_cache(self):
+        first = self.server.call_tool('get_forecast', {'latitude': 40.0, 'longitude': 116.0})
+        other = QuietWeatherServer()
+        self.addCleanup(other.tool_cache.close)
+        self.assertEqual(other.call_tool('get_forecast', {'latitude': 40.0, 'longitude': 116.0}), first)
+        self.assertEqual(other.metrics.counters.get(('mcp_server_tool_cache_hits_total',
+                                                     (('tool', 'get_forecast'),))), 1)
+
+    def test_tools_without_ttl_bypass_the_cache(self):
+        self.server.call_tool('get_time', {})
+        self.server.call_tool('get_time', {})
+        self.assertEqual(self.hits('get_time'), 0)
+        self.assertEqual(self.server.tool_cache.stats()['writes'], 0)
+
+
+@unittest.skipUnless(SharedCache.supported(), "the shared cache needs fcntl")
+class BotSharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.bot = FakeBot({'calculate': '{"result": 2}', 'get_time': '{"time": "now"}'})
+        self.bot.tool_cache = SharedCache(os.path.join(directory, 'cache.bin'), slots=8, slot_size=512)
+        self.addCleanup(self.bot.tool_cache.close)
+        self.bot.tool_cache.set('calculate', {'expression': '1+1'}, result('{"result": 2}'), ttl=60)
+
+    def test_answers_report_shared_cache_hits(self):
+        info = {}
+        self.assertIsNotNone(self.bot.answer('1+1', 'calculate', {'expression': '1+1'}, info))
+        self.assertEqual((info, self.bot.calls), ({'cache_hit': True}, []))
+        self.bot.answer('time', 'get_time', {}, info)
+        self.assertEqual(info, {'cache_hit': False})
+
+        self.bot.answer_batch([('get_time', {}), ('calculate', {'expression': '1+1'}), ('get_time', {})], info)
+        self.assertEqual(info['cache_hits'], [False, True, False])
+
+    def test_history_gets_the_flag_even_though_the_tool_took_time(self):
+        records = []
+        patch_attr(self, views, 'mcp_bot', self.bot)
+        patch_attr(self, chat_history, 'record', lambda *args: records.append(args))
+        chat_cache.cache.clear()
+        self.addCleanup(chat_cache.cache.clear)
+
+        views._render_chat('1+1', 'c1')
+        # tool_duration 不为 None，但结果来自共享缓存
+        self.assertIsNotNone(records[0][9])
+        self.assertTrue(records[0][11])
+        views._render_chat('1+1', 'c1')
+        self.assertEqual((records[1][5], records[1][11]), (chat_cache.HIT, True))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from .. import mcp_trace
+from ..mcp_trace import Trace, Tracer
+from .utils import QuietWeatherServer
+
+
+class TraceTests(SimpleTestCase):
+    def test_span_records_a_complete_event(self):
+        trace = Trace('abc', 'django')
+        with trace.span('work', tool='calculate'):
+            pass
+        metadata, event = trace.events
+        self.assertEqual(metadata['ph'], 'M')
+        self.assertEqual(metadata['args'], {'name': 'django'})
+        self.assertEqual(event['name'], 'work')
+        self.assertEqual(event['ph'], 'X')
+        self.assertGreaterEqual(event['dur'], 0)
+        self.assertEqual(event['args'], {'tool': 'calculate', 'trace_id': 'abc'})
+        self.assertEqual(trace.meta(), {'traceId': 'abc'})
+
+    def test_span_is_recorded_when_the_block_raises(self):
+        trace = Trace()
+        with self.assertRaises(ValueError):
+            with trace.span('broken'):
+                raise ValueError()
+        self.assertEqual([event['name'] for event in trace.events], ['broken'])
+
+    def test_module_span_uses_the_active_trace(self):
+        trace = Trace()
+        with mcp_trace.span('outside'):
+            pass
+        with mcp_trace.activate(trace):
+            self.assertIs(mcp_trace.current(), trace)
+            with mcp_trace.activate(None):
+                with mcp_trace.span('unsampled'):
+                    pass
+            with mcp_trace.span('inside'):
+                pass
+        self.assertIsNone(mcp_trace.current())
+        self.assertEqual([event['name'] for event in trace.events], ['inside'])
+
+
+class TracerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'trace.json')
+
+    def test_sampling(self):
+        self.assertIsNone(Tracer(0.0, self.path).start())
+        self.assertIsNotNone(Tracer(0.0, self.path).start(force=True))
+        self.assertIsNotNone(Tracer(1.0, self.path).start())
+
+    def test_finish_appends_to_an_open_json_array(self):
+        tracer = Tracer(1.0, self.path, 'django')
+        for name in ('first', 'second'):
+            trace = tracer.start()
+            with trace.span(name):
+                pass
+            tracer.finish(trace)
+        tracer.finish(None)
+
+        with open(self.path) as f:
+            text = f.read()
+        self.assertTrue(text.startswith('[\n'))
+        # 文件没有结尾的 ]，补上后应是合法 JSON
+        events = json.loads(text.rstrip(',\n') + ']')
+        self.assertEqual([event['name'] for event in events if event['ph'] == 'X'], ['first', 'second'])
+
+
+class ServerTraceTests(SimpleTestCase):
+    def setUp(self):
+        self.server = QuietWeatherServer()
+
+    def call(self, params):
+        return self.server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': params})
+
+    def test_server_returns_its_spans_for_traced_calls(self):
+        response = self.call({'name': 'calculate', 'arguments': {'expression': '1+1'},
+                              '_meta': {'traceId': 'abc'}})
+        meta = response['result']['_meta']
+        self.assertEqual(meta['traceId'], 'abc')
+        names = [event['name'] for event in meta['trace']]
+        self.assertIn('server.call_tool', names)
+        self.assertIn('tool.handler', names)
+        for event in meta['trace']:
+            if event['ph'] == 'X':
+                self.assertEqual(event['args']['trace_id'], 'abc')
+
+    def test_untraced_calls_have_no_meta(self):
+        response = self.call({'name': 'calculate', 'arguments': {'expression': '1+1'}})
+        self.assertNotIn('_meta', response['result'])
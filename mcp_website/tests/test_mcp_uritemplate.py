@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.test import SimpleTestCase
+
+from ..mcp_uritemplate import UriTemplate, UriTemplateError, UriTemplateRouter
+from .utils import QuietWeatherServer
+
+
+class UriTemplateTests(SimpleTestCase):
+    def test_simple_and_reserved_expansion(self):
+        template = UriTemplate('weather://forecast/{lat}/{lon}')
+        self.assertEqual(template.prefix, 'weather://forecast/')
+        self.assertEqual(template.match('weather://forecast/39.9/116.4'), {'lat': '39.9', 'lon': '116.4'})
+        self.assertIsNone(template.match('weather://forecast/39.9/116.4/extra'))
+        self.assertIsNone(template.match('weather://alerts/CA'))
+        self.assertEqual(UriTemplate('file:///{+path}').match('file:///a/b%20c.txt'), {'path': 'a/b c.txt'})
+
+    def test_unsupported_templates(self):
+        for template in ('x://{a,b}', 'x://{?q}', 'x://{a}/{a}', 'x://{a', 'x://a}'):
+            with self.assertRaises(UriTemplateError, msg=template):
+                UriTemplate(template)
+
+
+class UriTemplateRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = UriTemplateRouter()
+
+    def test_most_literal_template_wins(self):
+        self.router.add('weather://station/{id}', 'station')
+        self.router.add('weather://station/{id}/obs', 'observations')
+        self.router.add('weather://station/latest', 'latest')
+        self.router.add('weather://{+path}', 'fallback')
+
+        self.assertEqual(self.router.resolve('weather://station/latest'), ('latest', {}))
+        self.assertEqual(self.router.resolve('weather://station/x1/obs'), ('observations', {'id': 'x1'}))
+        self.assertEqual(self.router.resolve('weather://station/x1'), ('station', {'id': 'x1'}))
+        # 长前缀下没有匹配时回退到较短的前缀
+        self.assertEqual(self.router.resolve('weather://station/x1/raw'), ('fallback', {'path': 'station/x1/raw'}))
+        self.assertIsNone(self.router.resolve('other://station/x1'))
+
+    def test_same_literal_length_keeps_registration_order(self):
+        self.router.add('x://{a}/y', 'first')
+        self.router.add('x://{+a}/y', 'second')
+        self.assertEqual(self.router.resolve('x://q/y'), ('first', {'a': 'q'}))
+        self.assertEqual(self.router.resolve('x://q/r/y'), ('second', {'a': 'q/r'}))
+
+    def test_adding_a_template_again_replaces_its_route(self):
+        self.router.add('x://{a}', 'old')
+        self.router.add('x://{a}', 'new')
+        self.assertEqual(len(self.router), 1)
+        self.assertEqual(self.router.resolve('x://1'), ('new', {'a': '1'}))
+
+    def test_many_templates_with_a_shared_prefix(self):
+        for i in range(500):
+            self.router.add('weather://station/{}/{{id}}/obs'.format(i), i)
+        self.assertEqual(len(self.router), 500)
+        self.assertEqual(self.router.resolve('weather://station/499/x/obs'), (499, {'id': 'x'}))
+        self.assertIsNone(self.router.resolve('weather://station/500/x/obs'))
+
+
+class ServerReadResourceTests(SimpleTestCase):
+    def setUp(self):
+        self.server = QuietWeatherServer()
+
+    def read(self, uri):
+        return self.server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': 'resources/read',
+                                           'params': {'uri': uri}})
+
+    def test_template_variables_reach_the_handler(self):
+        content = self.read('weather://forecast/40.0/116.0')['result']['contents'][0]
+        self.assertEqual(content['uri'], 'weather://forecast/40.0/116.0')
+        self.assertTrue(json.loads(content['text']))
+
+    def test_unknown_uri(self):
+        self.assertIn('error', self.read('weather://nothing/here'))
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+
+from django.test import SimpleTestCase
+
+from ..mcp_client import SimpleMCPClient, client_metrics
+from ..mcp_memory import MemoryInspector, _growth
+from .utils import QuietWeatherServer, patch_attr, wait_for
+
+LATE = ('mcp_client_late_responses_total', ())
+EMPTY = {'responses': 0, 'response_events': 0}
+
+
+class Grown(object):
+    pass
+
+
+class PipeProcess(object):
+    """服务器进程的替身：测试通过 reply() 写入 stdout 的响应行."""
+
+    def __init__(self):
+        read_fd, self.write_fd = os.pipe()
+        self.stdin = io.BytesIO()
+        self.stdout = os.fdopen(read_fd, 'rb')
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def reply(self, message):
+        os.write(self.write_fd, json.dumps(message).encode('utf-8') + b'\n')
+
+    def exit(self):
+        self.returncode = 0
+        os.close(self.write_fd)
+
+
+class LateResponseTests(SimpleTestCase):
+    def setUp(self):
+        # 客户端的调试输出不进入测试输出
+        patch_attr(self, sys, 'stdout', io.BytesIO())
+        self.process = PipeProcess()
+        self.addCleanup(self.process.exit)
+        self.client = SimpleMCPClient('python', [])
+        self.client.server_process = self.process
+        self.client.reader_thread = threading.Thread(target=self.client._read_responses)
+        self.client.reader_thread.daemon = True
+        self.client.reader_thread.start()
+
+    def test_replies_after_a_timeout_are_dropped(self):
+        late = client_metrics.counters.get(LATE, 0)
+        with self.assertRaises(Exception):
+            self.client.send_request('tools/list', timeout=0.05)
+        self.assertEqual(self.client.table_sizes(), EMPTY)
+
+        self.process.reply({'jsonrpc': '2.0', 'id': 0, 'result': {}})
+        self.assertTrue(wait_for(lambda: client_metrics.counters.get(LATE, 0) == late + 1))
+        self.assertEqual(self.client.table_sizes(), EMPTY)
+
+    def test_replies_in_time_are_returned(self):
+        responses = []
+        sender = threading.Thread(target=lambda: responses.append(self.client.send_request('tools/list', timeout=2)))
+        sender.start()
+        self.assertTrue(wait_for(lambda: self.client.table_sizes()['response_events'] == 1))
+        self.process.reply({'jsonrpc': '2.0', 'id': 0, 'result': {'tools': []}})
+        sender.join()
+
+        self.assertEqual(responses, [{'jsonrpc': '2.0', 'id': 0, 'result': {'tools': []}}])
+        self.assertEqual(self.client.table_sizes(), EMPTY)
+
+    def test_debug_log_leaves_out_payloads(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = lambda record: records.append(record.getMessage())
+        logger = logging.getLogger(SimpleMCPClient.__module__)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        patch_attr(self, logger, 'level', logging.DEBUG)
+
+        sender = threading.Thread(target=self.client.send_request, args=('tools/call', {'name': 'secret-argument'}))
+        sender.start()
+        self.assertTrue(wait_for(lambda: self.client.table_sizes()['response_events'] == 1))
+        self.process.reply({'jsonrpc': '2.0', 'id': 0, 'result': {'content': 'x' * 1000}})
+        sender.join()
+
+        self.assertIn('Sending request 0: tools/call', records)
+        self.assertTrue(wait_for(lambda: 'Received 1 response(s)' in records))
+        self.assertFalse([record for record in records if 'secret' in record or 'xxx' in record])
+
+
+class ServerMemoryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = QuietWeatherServer()
+        self.addCleanup(self.server.memory.stop_sampling)
+
+    def memory(self, action, **params):
+        params['action'] = action
+        response = self.server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': 'server/memory',
+                                               'params': params})
+        return response.get('result', response.get('error'))
+
+    def test_report_lists_table_sizes(self):
+        report = self.memory('report')
+        self.assertGreater(report['gc_objects'], 0)
+        self.assertEqual(report['tables']['tools'], len(self.server.tools))
+        self.assertIn('calculator_cache', report['tables'])
+        self.assertIn('alerts', report['tables'])
+        self.assertNotIn('top', report)
+
+    def test_diff_report_shows_what_grew(self):
+        self.assertTrue(self.memory('start')['tracing'])
+        self.addCleanup(self.memory, 'stop')
+        grown = [Grown() for _ in range(5000)]
+        top = self.memory('report', diff=True, limit=3)['top']
+        self.assertEqual(len(top), 3)
+        if not self.server.memory.available:
+            # Python 2 没有 tracemalloc，按类型统计对象数
+            self.assertEqual(top[0]['site'], Grown.__module__ + '.Grown')
+            self.assertGreaterEqual(top[0]['count_diff'], len(grown))
+        self.memory('stop')
+        self.assertNotIn('top', self.memory('report'))
+
+    def test_periodic_samples(self):
+        self.assertTrue(self.memory('sample_start', interval=0.01)['sampling'])
+        self.assertFalse(self.memory('sample_start')['sampling'])
+        self.assertTrue(wait_for(lambda: len(self.memory('history')['samples']) >= 2))
+        self.memory('sample_stop')
+
+        samples = self.memory('history')['samples']
+        self.assertEqual(samples[0]['tables']['tools'], len(self.server.tools))
+        self.assertNotIn('rates', samples[0])
+        self.assertIn('tables.tools', samples[1]['rates'])
+        self.assertLessEqual(len(samples), self.server.memory.samples.maxlen)
+
+    def test_unknown_action(self):
+        self.assertIn('error', self.server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': 'server/memory',
+                                                          'params': {'action': 'bogus'}}))
+
+
+class GrowthTests(SimpleTestCase):
+    def test_rates_are_per_second_deltas(self):
+        previous = {'time': 100, 'gc_objects': 1000, 'max_rss_kb': 2048, 'tables': {'cache': 10, 'alerts': 3}}
+        sample = {'time': 104, 'gc_objects': 1200, 'max_rss_kb': 2048, 'current_bytes': 10,
+                  'tables': {'cache': 4, 'alerts': 3, 'new': 1}}
+        self.assertEqual(_growth(previous, sample), {
+            'gc_objects': 50.0, 'max_rss_kb': 0.0, 'tables.cache': -1.5, 'tables.alerts': 0.0})
+        self.assertEqual(_growth(previous, dict(sample, time=100)), {})
+
+    def test_sampler_logs_each_interval(self):
+        inspector = MemoryInspector()
+        lines = []
+        sizes = itertools.count(0, 10)
+        inspector.start_sampling(0.01, lambda: {'cache': next(sizes)}, lines.append)
+        self.assertTrue(wait_for(lambda: len(lines) >= 2))
+        inspector.stop_sampling()
+
+        samples = inspector.history()
+        self.assertEqual(len(lines), len(samples) - 1)
+        self.assertIn('tables.cache +', lines[0])
+        rate = samples[1]['rates']['tables.cache']
+        self.assertAlmostEqual(rate, 10 / (samples[1]['time'] - samples[0]['time']))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import views
+from .utils import FakeBot, patch_attr, wait_for
+
+
+class SlowStatsBot(FakeBot):
+    """server_stats() 等到 release 被设置才返回."""
+
+    def __init__(self):
+        FakeBot.__init__(self, {})
+        self.release = threading.Event()
+        self.stats_calls = 0
+
+    def server_stats(self, timeout=2):
+        self.stats_calls += 1
+        self.release.wait(2)
+        return [(0, {'metrics': {'gauges': [{'name': 'mcp_server_up', 'labels': {}, 'value': 1}]}})]
+
+
+class Staff(object):
+    is_active = True
+    is_staff = True
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.bot = SlowStatsBot()
+        self.addCleanup(self.bot.release.set)
+        patch_attr(self, views, 'mcp_bot', self.bot)
+        patch_attr(self, views, 'METRICS_CONFIG', {'ALLOWED_IPS': ['127.0.0.1'], 'TOKEN': 'secret',
+                                                   'SERVER_STATS_MAX_AGE': 60})
+
+    def test_scrape_does_not_wait_for_servers(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'mcp_chat_admission_', response.content)
+        self.assertNotIn(b'mcp_server_up', response.content)
+
+        self.bot.release.set()
+        self.assertTrue(wait_for(lambda: self.bot.stats_snapshot[0]))
+        response = self.client.get(reverse('metrics'))
+        self.assertIn(b'mcp_server_up{process="0"} 1', response.content)
+        # 快照在 SERVER_STATS_MAX_AGE 内不会刷新
+        self.assertEqual(self.bot.stats_calls, 1)
+
+    def test_other_addresses_are_forbidden(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.bot.stats_calls, 0)
+
+    def test_bearer_token(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_users(self):
+        request = RequestFactory().get(reverse('metrics'), REMOTE_ADDR='10.0.0.8')
+        request.user = Staff()
+        self.assertEqual(views.metrics(request).status_code, 200)
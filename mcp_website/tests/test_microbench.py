@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+
+from ..microbench import CASES, compare, measure
+
+CASE = 'bot.extract_coordinates'
+
+
+class MicrobenchTests(SimpleTestCase):
+    def test_measure_doubles_until_min_time(self):
+        calls = []
+        result = measure(lambda: calls.append(None), repeat=3, min_time=0.001)
+        self.assertLessEqual(result['best_us'], result['median_us'])
+        self.assertEqual(result['iterations'] & (result['iterations'] - 1), 0)
+        self.assertGreaterEqual(len(calls), 3 * result['iterations'])
+
+    def test_compare_flags_cases_over_the_threshold(self):
+        results = {'a': {'best_us': 130.0}, 'b': {'best_us': 90.0}, 'new': {'best_us': 1.0}}
+        baseline = {'a': {'best_us': 100.0}, 'b': {'best_us': 100.0}}
+        self.assertEqual(compare(results, baseline, 25), ({'a': 30.0, 'b': -10.0}, ['a']))
+        self.assertEqual(compare(results, baseline, 50), ({'a': 30.0, 'b': -10.0}, []))
+
+    def test_every_case_sets_up(self):
+        cwd = os.getcwd()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # 服务器会在当前目录写调试日志
+        os.chdir(directory)
+        self.addCleanup(os.chdir, cwd)
+        for name, setup in CASES.items():
+            setup()()
+
+
+class MicrobenchCommandTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = os.path.join(directory, 'baseline.json')
+
+    def run_command(self, *args, **options):
+        out = StringIO()
+        call_command('microbench', *args, baseline=self.baseline, repeat=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_list_and_unknown_cases(self):
+        self.assertEqual(self.run_command(list=True).split(), list(CASES))
+        with self.assertRaises(CommandError):
+            self.run_command('no.such.case')
+
+    def test_baseline_round_trip(self):
+        self.run_command(CASE, save_baseline=True)
+        with open(self.baseline) as f:
+            saved = json.load(f)['cases']
+        self.assertEqual(list(saved), [CASE])
+
+        # 基线快得多时判定为回退
+        saved[CASE]['best_us'] /= 1000.0
+        with open(self.baseline, 'w') as f:
+            json.dump({'cases': saved}, f)
+        with self.assertRaises(CommandError):
+            self.run_command(CASE)
+        self.assertIn('vs baseline', self.run_command(CASE, threshold=float('inf')))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..page_cache import PageCache
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class IndexPageTests(SimpleTestCase):
+    def test_conditional_get_returns_304(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_each_encoding_has_its_own_etag(self):
+        plain = self.client.get(reverse('index'))
+        gzipped = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=plain['ETag'],
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+
+
+class StaticManifestTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        template_path = os.path.join(self.directory, 'page.html')
+        with open(template_path, 'w') as f:
+            f.write('{% load static %}<link href="{% static "app.css" %}">')
+        os.utime(template_path, (time.time() - 120, time.time() - 120))
+        self.static_root = os.path.join(self.directory, 'static')
+        os.mkdir(self.static_root)
+        self.write_manifest('app.1111.css', time.time() - 60)
+
+        settings_override = override_settings(
+            DEBUG=False,
+            STATIC_ROOT=self.static_root,
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.ManifestStaticFilesStorage',
+            TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [self.directory]}],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_manifest(self, hashed_name, mtime):
+        path = os.path.join(self.static_root, 'staticfiles.json')
+        with open(path, 'w') as f:
+            json.dump({'paths': {'app.css': hashed_name}, 'version': '1.0'}, f)
+        os.utime(path, (mtime, mtime))
+
+    def test_new_manifest_invalidates_page_and_etag(self):
+        cache = PageCache('page.html')
+        first = cache.get('en', {})
+        self.assertIn(b'app.1111.css', first.encodings[None][0])
+        self.assertIs(cache.get('en', {}), first)
+
+        self.write_manifest('app.2222.css', time.time())
+        second = cache.get('en', {})
+        self.assertIn(b'app.2222.css', second.encodings[None][0])
+        self.assertNotEqual(second.static_version, first.static_version)
+        self.assertNotEqual(second.encodings[None][1], first.encodings[None][1])
+        self.assertGreater(second.last_modified, first.last_modified)
+
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=first.encodings[None][1])
+        self.assertEqual(second.response(request, 'text/html', 0).status_code, 200)
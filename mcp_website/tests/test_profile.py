@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from ..mcp_profile import SamplingProfiler
+from ..middleware import ChatProfilerMiddleware
+from .utils import QuietWeatherServer, wait_for
+
+
+class Staff(object):
+    is_staff = True
+
+
+class ChatProfilerMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.factory = RequestFactory()
+
+    def middleware(self, **config):
+        config.setdefault('ENABLED', True)
+        config.setdefault('DIR', self.directory)
+        return ChatProfilerMiddleware(lambda request: HttpResponse('ok'), config)
+
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ChatProfilerMiddleware(lambda request: None, {'ENABLED': False})
+
+    def test_staff_header_writes_a_profile(self):
+        request = self.factory.get('/mcp_website/chat/', HTTP_X_MCP_PROFILE='1')
+        request.user = Staff()
+        response = self.middleware()(request)
+
+        filename = response['X-MCP-Profile']
+        stats = pstats.Stats(os.path.join(self.directory, filename))
+        self.assertGreater(stats.total_calls, 0)
+
+    def test_other_requests_are_not_profiled(self):
+        middleware = self.middleware()
+        # 非管理员的请求头被忽略
+        request = self.factory.get('/mcp_website/chat/', HTTP_X_MCP_PROFILE='1')
+        self.assertFalse(response_profiled(middleware(request)))
+        # 路径不在 PATH_PREFIXES 下
+        request = self.factory.get('/mcp_website/', HTTP_X_MCP_PROFILE='1')
+        request.user = Staff()
+        self.assertFalse(response_profiled(middleware(request)))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sample_rate(self):
+        middleware = self.middleware(SAMPLE_RATE=1.0)
+        self.assertTrue(response_profiled(middleware(self.factory.get('/mcp_website/chat/'))))
+
+
+def response_profiled(response):
+    return response.has_header('X-MCP-Profile')
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class SamplingProfilerTests(SimpleTestCase):
+    def test_samples_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=spin, args=(stop,))
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(stop.set)
+
+        profiler = SamplingProfiler()
+        self.assertTrue(profiler.start(interval=0.001))
+        self.assertFalse(profiler.start())
+        self.assertTrue(wait_for(lambda: profiler.samples >= 5))
+        results = profiler.stop()
+
+        self.assertFalse(profiler.running)
+        self.assertGreaterEqual(results['samples'], 5)
+        lines = results['collapsed'].split('\n')
+        self.assertTrue(any('spin (test_profile.py' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+
+    def test_stops_by_itself_after_max_seconds(self):
+        profiler = SamplingProfiler()
+        profiler.start(interval=0.001, max_seconds=0.05)
+        self.assertTrue(wait_for(lambda: not profiler.running))
+        self.assertIsNotNone(profiler.results()['duration'])
+
+    def test_server_profile_actions(self):
+        server = QuietWeatherServer()
+        self.addCleanup(server.profiler.stop)
+
+        def profile(action):
+            return server.handle_request({'jsonrpc': '2.0', 'id': 1, 'method': 'server/profile',
+                                          'params': {'action': action, 'interval': 0.001}})
+
+        self.assertTrue(profile('start')['result']['started'])
+        self.assertTrue(profile('status')['result']['running'])
+        self.assertIn('collapsed', profile('stop')['result'])
+        self.assertIn('error', profile('bogus'))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+
+from ..mcp_replay import EXACT, STATUS, Recorder, Replayer, compare, load_capture
+from .utils import QuietWeatherServer, patch_environ
+
+CALCULATE = {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+             'params': {'name': 'calculate', 'arguments': {'expression': '1+1'}}}
+GET_TIME = {'jsonrpc': '2.0', 'id': 2, 'method': 'tools/call', 'params': {'name': 'get_time', 'arguments': {}}}
+
+
+def ok(text):
+    return {'jsonrpc': '2.0', 'id': 1, 'result': {'content': [{'type': 'text', 'text': text}], 'isError': False}}
+
+
+ERROR = {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32603, 'message': 'failed'}}
+
+
+class CompareTests(SimpleTestCase):
+    def test_status_check(self):
+        self.assertIsNone(compare(CALCULATE, ok('2'), ok('3')))
+        self.assertIsNotNone(compare(CALCULATE, ok('2'), ERROR))
+        self.assertIsNotNone(compare(CALCULATE, None, ok('2')))
+        self.assertIsNone(compare({'method': 'notifications/initialized'}, None, None))
+
+    def test_exact_check_ignores_meta_and_volatile_tools(self):
+        self.assertIsNotNone(compare(CALCULATE, ok('2'), ok('3'), EXACT))
+        traced = ok('2')
+        traced['result']['_meta'] = {'traceId': 'abc'}
+        self.assertIsNone(compare(CALCULATE, ok('2'), traced, EXACT))
+        self.assertIsNone(compare(GET_TIME, ok('12:00'), ok('12:01'), EXACT))
+
+    def test_batches_are_matched_by_id(self):
+        batch = [CALCULATE, GET_TIME]
+        expected = [ok('2'), dict(ok('12:00'), id=2)]
+        self.assertIsNone(compare(batch, expected, [ok('2'), dict(ok('12:01'), id=2)], EXACT))
+        self.assertIn('id 1', compare(batch, expected, [ok('3'), dict(ok('12:00'), id=2)], EXACT))
+        self.assertIsNotNone(compare(batch, expected, [ok('2')]))
+        self.assertIsNotNone(compare(batch, expected, ok('2')))
+
+
+class CaptureTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'capture.jsonl')
+
+    def record(self, *pairs):
+        recorder = Recorder(self.path)
+        now = time.time()
+        for index, (request, response) in enumerate(pairs):
+            recorder.record(request, response, now + index * 0.01, now + index * 0.01 + 0.001)
+        recorder.close()
+        return recorder
+
+    def test_recorder_from_environment(self):
+        patch_environ(self, MCP_RECORD_FILE=None)
+        self.assertIsNone(Recorder.from_environment())
+        patch_environ(self, MCP_RECORD_FILE=self.path)
+        recorder = Recorder.from_environment()
+        recorder.close()
+        self.assertEqual(recorder.path, self.path)
+
+    def test_load_skips_a_truncated_last_line(self):
+        recorder = self.record((CALCULATE, ok('2')), ({'method': 'notifications/initialized'}, None))
+        with open(self.path, 'ab') as f:
+            f.write(b'{"t": 1, "req"')
+        records = load_capture(self.path)
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual([record['req'] for record in records], [CALCULATE, {'method': 'notifications/initialized'}])
+        self.assertIsNone(records[1]['resp'])
+        self.assertAlmostEqual(records[0]['d'], 0.001)
+
+    def capture_server_run(self, requests):
+        server = QuietWeatherServer()
+        pairs = []
+        for request in requests:
+            response = server.handle_batch(request) if isinstance(request, list) else server.handle_request(request)
+            pairs.append((request, json.loads(json.dumps(response, ensure_ascii=False))))
+        self.record(*pairs)
+        return load_capture(self.path)
+
+    def test_replay_matches_a_recorded_run(self):
+        records = self.capture_server_run([CALCULATE, GET_TIME, [CALCULATE, GET_TIME]])
+        report = Replayer(QuietWeatherServer(), records, check=EXACT).run()
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual(report['mismatch_count'], 0)
+        self.assertEqual(len(report['latencies']), 3)
+
+    def test_replay_reports_mismatches(self):
+        records = self.capture_server_run([CALCULATE])
+        records[0]['resp'] = ERROR
+        report = Replayer(QuietWeatherServer(), records * 3, check=STATUS, max_mismatches=2).run()
+        self.assertEqual(report['mismatch_count'], 3)
+        self.assertEqual(len(report['mismatches']), 2)
+
+    def test_pacing_keeps_the_recorded_gaps(self):
+        records = self.capture_server_run([CALCULATE, CALCULATE])
+        records[1]['t'] = records[0]['t'] + 0.1
+        report = Replayer(QuietWeatherServer(), records, pacing=True, speed=2.0).run()
+        self.assertGreaterEqual(report['elapsed_seconds'], 0.05)
+
+    def test_command(self):
+        self.capture_server_run([CALCULATE, GET_TIME])
+        out = StringIO()
+        call_command('replay', self.path, check=EXACT, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['mismatch_count'], 0)
+        self.assertEqual(report['latency_ms']['count'], 2)
+
+        with open(self.path, 'wb'):
+            pass
+        with self.assertRaises(CommandError):
+            call_command('replay', self.path, stdout=StringIO())
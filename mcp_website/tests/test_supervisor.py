@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..mcp_client import MCPClientPool
+from ..supervisor import Supervisor
+
+
+class StubProcess(object):
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+class StubClient(object):
+    """服务器客户端的替身，ping 结果和进行中的请求数由测试设置."""
+
+    def __init__(self, responsive=True):
+        self.server_process = StubProcess()
+        self.responsive = responsive
+        self.pending = 0
+        self.last_activity = time.time()
+        self.is_connected = False
+        self.closed_with = None
+
+    def connect(self):
+        self.is_connected = True
+        return True
+
+    def ping(self, timeout):
+        return self.responsive
+
+    def in_flight(self):
+        return self.pending
+
+    def close(self, timeout=10):
+        self.is_connected = False
+        self.closed_with = timeout
+
+
+class SupervisorTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = MCPClientPool('python', [], 2)
+        self.pool.clients = [StubClient(), StubClient()]
+        for client in self.pool.clients:
+            client.connect()
+        self.pool._new_client = StubClient
+        self.supervisor = Supervisor(self.pool, config={'MAX_FAILURES': 2, 'BUSY_TIMEOUT': 30.0,
+                                                        'DRAIN_TIMEOUT': 30.0, 'BACKOFF_INITIAL': 60.0})
+
+    def test_defaults(self):
+        supervisor = Supervisor(self.pool, config={})
+        self.assertFalse(supervisor.config['WATCH_CODE'])
+        self.assertGreaterEqual(supervisor.config['DRAIN_TIMEOUT'], 30)
+
+    def test_dead_server_is_replaced_and_drained(self):
+        old = self.pool.clients[0]
+        old.server_process.returncode = 1
+        self.supervisor.check()
+        self.assertIsNot(self.pool.clients[0], old)
+        self.assertTrue(self.pool.clients[0].is_connected)
+        self.assertEqual(old.closed_with, 30.0)
+
+    def test_idle_unresponsive_server_is_replaced_after_max_failures(self):
+        old = self.pool.clients[0]
+        old.responsive = False
+        self.supervisor.check()
+        self.assertIs(self.pool.clients[0], old)
+        self.supervisor.check()
+        self.assertIsNot(self.pool.clients[0], old)
+
+    def test_busy_server_is_not_counted_as_failing(self):
+        old = self.pool.clients[0]
+        old.responsive = False
+        old.pending = 3
+        for _ in range(5):
+            self.supervisor.check()
+        self.assertIs(self.pool.clients[0], old)
+
+        # 长时间没有任何输出的忙碌进程视为卡死
+        old.last_activity = time.time() - 31
+        self.supervisor.check()
+        self.supervisor.check()
+        self.assertIsNot(self.pool.clients[0], old)
+
+    def test_restarts_of_the_same_slot_back_off(self):
+        self.pool.clients[0].server_process.returncode = 1
+        self.supervisor.check()
+        replacement = self.pool.clients[0]
+        replacement.server_process.returncode = 1
+        self.supervisor.check()
+        self.assertIs(self.pool.clients[0], replacement)
+
+    def test_code_changes_trigger_a_rolling_restart_when_watched(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'mcp_server.py')
+        open(path, 'w').close()
+        supervisor = Supervisor(self.pool, [path], config={'WATCH_CODE': True})
+        old = list(self.pool.clients)
+
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        supervisor.check()
+        self.assertEqual([client is new for client, new in zip(old, self.pool.clients)], [False, False])
+
+
+class PoolReplaceTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = MCPClientPool('python', [], 2)
+        self.pool.clients = [StubClient(), StubClient()]
+        for client in self.pool.clients:
+            client.connect()
+        self.pool._new_client = StubClient
+
+    def test_old_client_is_out_of_rotation_before_it_drains(self):
+        old = self.pool.clients[0]
+        seen = []
+
+        def close(timeout=10):
+            # 排空期间新请求只会分给其他客户端
+            seen.extend(self.pool._next_client() for _ in range(4))
+            StubClient.close(old, timeout)
+
+        old.close = close
+        self.assertTrue(self.pool.replace(0, 30))
+        self.assertNotIn(old, seen)
+        self.assertFalse(old.is_connected)
+
+    def test_replace_skips_a_slot_already_replaced(self):
+        stale = self.pool.clients[0]
+        self.assertTrue(self.pool.replace(0))
+        current = self.pool.clients[0]
+        self.assertFalse(self.pool.replace(0, expected=stale))
+        self.assertIs(self.pool.clients[0], current)
+        self.assertIsNone(current.closed_with)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+
+from django.test import SimpleTestCase
+
+from ..mcp_client import Zygote, ZygoteMCPClient
+from .utils import patch_attr
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mcp_server.py')
+
+# 先创建套接字文件、过一会儿才开始监听的 zygote，监听前还有其他输出
+SLOW_LISTENER = '''
+import os, socket, sys, time
+path = sys.argv[-1]
+sys.stdout.write("loading\\n")
+sys.stdout.flush()
+listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+listener.bind(path)
+time.sleep(0.3)
+listener.listen(1)
+os.write(1, b"ready\\n")
+conn, _ = listener.accept()
+conn.sendall(b"4242\\n")
+sys.stdin.read()
+'''
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@unittest.skipUnless(Zygote.supported(), "zygote mode needs fork() and unix sockets")
+class ZygoteTests(SimpleTestCase):
+    def setUp(self):
+        # 服务器在当前目录写调试日志
+        cwd = os.getcwd()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        os.chdir(directory)
+        self.addCleanup(os.chdir, cwd)
+
+    def start(self, args, start_timeout=30):
+        zygote = Zygote(sys.executable, args, start_timeout)
+        self.addCleanup(zygote.close)
+        return zygote
+
+    def test_ready_waits_until_the_socket_is_listening(self):
+        zygote = self.start(['-c', SLOW_LISTENER])
+        started = time.time()
+        self.assertTrue(zygote.start())
+        self.assertGreaterEqual(time.time() - started, 0.3)
+        process = zygote.spawn()
+        self.assertEqual(process.pid, 4242)
+        process.socket.close()
+
+    def test_zygote_that_never_gets_ready(self):
+        patch_attr(self, sys, 'stdout', io.BytesIO())
+        zygote = self.start(['-c', 'import sys; sys.stdout.write("crashed\\n")'])
+        self.assertFalse(zygote.start())
+        self.assertIsNone(zygote.socket_dir)
+
+        zygote = self.start(['-c', 'import time; time.sleep(5)'], start_timeout=0.2)
+        self.assertFalse(zygote.start())
+
+    def test_socket_is_private_and_removed_on_close(self):
+        zygote = self.start([SERVER])
+        self.assertTrue(zygote.start())
+        self.assertEqual(mode(zygote.socket_dir), 0o700)
+        self.assertEqual(mode(zygote.socket_path), 0o600)
+
+        client = ZygoteMCPClient(zygote)
+        patch_attr(self, sys, 'stdout', io.BytesIO())
+        self.assertTrue(client.connect())
+        self.assertIn('result', client.call_tool('calculate', {'expression': '1+1'}))
+        client.close(0)
+
+        directory = zygote.socket_dir
+        zygote.close()
+        self.assertFalse(os.path.exists(directory))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import time
+
+from ..mcp_server import WeatherMCPServer
+from ..mcp_utils import MCPChatBot
+
+
+def wait_for(predicate, timeout=2.0):
+    """轮询直到 predicate() 为真，返回最后一次的结果."""
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def patch_attr(testcase, target, name, value):
+    """替换 target.name，测试结束时恢复."""
+    original = getattr(target, name)
+    setattr(target, name, value)
+    testcase.addCleanup(setattr, target, name, original)
+
+
+def patch_environ(testcase, **values):
+    """设置环境变量（None 表示删除），测试结束时恢复."""
+    for name, value in values.items():
+        original = os.environ.get(name)
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+        testcase.addCleanup(_restore_environ, name, original)
+
+
+def _restore_environ(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+
+
+def parse_sse(body):
+    """把事件流解析为 [(事件名, 数据), ...]."""
+    events = []
+    for block in body.decode('utf-8').split('\n\n'):
+        if not block.strip():
+            continue
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class FakeClient(object):
+    """已连接的客户端替身，批量调用按 FakeBot.results 返回."""
+
+    is_connected = True
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def call_tools_batch(self, tool_calls):
+        return [self.bot.result_for(tool_name, arguments) for tool_name, arguments in tool_calls]
+
+    def connected_clients(self):
+        return []
+
+    def close(self, timeout=None):
+        pass
+
+
+class FakeBot(MCPChatBot):
+    """不启动 MCP 服务器的 MCPChatBot，工具结果由 results 决定.
+
+    results 是 工具名 -> 文本 的字典；值为 None 的工具调用失败。
+    """
+
+    def __init__(self, results):
+        MCPChatBot.__init__(self)
+        self.results = results
+        self.calls = []
+        self.tool_cache = False
+        self.client = FakeClient(self)
+
+    def ensure_connected(self):
+        return True
+
+    def result_for(self, tool_name, arguments):
+        self.calls.append((tool_name, arguments))
+        text = self.results.get(tool_name)
+        if text is None:
+            return {"error": {"code": -32603, "message": "tool failed"}}
+        return {"result": {"content": [{"type": "text", "text": text}]}}
+
+    def _call_and_format(self, tool_name, arguments):
+        return self._format_result(tool_name, self.result_for(tool_name, arguments))
+
+
+class QuietWeatherServer(WeatherMCPServer):
+    """在测试进程内运行的 WeatherMCPServer，不写 mcp_debug.log."""
+
+    def debug_log(self, message):
+        pass
+
+    def call_tool(self, name, arguments):
+        """tools/call 的结果：成功时为解析后的 JSON，失败时抛出 ToolCallFailed."""
+        response = self.handle_request({"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                                        "params": {"name": name, "arguments": arguments}})
+        result = response["result"]
+        text = result["content"][0]["text"]
+        if result["isError"]:
+            raise ToolCallFailed(text)
+        return json.loads(text)
+
+
+class ToolCallFailed(Exception):
+    pass
@@ -7,4 +7,10 @@ from . import views
 urlpatterns = [
     url(r'^$', views.index, name='index'),
     url(r'^chat/$', views.chat, name='chat_api'),  # 👈 这一行是新增的
+    url(r'^chat/stream/$', views.chat_stream, name='chat_stream'),
+    url(r'^chat/batch/$', views.chat_batch, name='chat_batch'),
+    url(r'^chat/admission/$', views.chat_admission, name='chat_admission'),
+    url(r'^chat/jobs/(?P<job_id>[0-9a-f]{32})/$', views.chat_job, name='chat_job'),
+    url(r'^metrics/$', views.metrics, name='metrics'),
+    url(r'^analytics/$', views.chat_analytics, name='chat_analytics'),
 ]
\ No newline at end of file
@@ -1,91 +1,467 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.core.urlresolvers import reverse
+from django.utils import six
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import get_language
 import json
+import time
+import uuid
+from . import analytics, mcp_trace
+from .admission import AdmissionRejected, admission
+from .chat_cache import chat_cache
+from .chat_jobs import JobQueueFull, chat_jobs
+from .history import chat_history
+from .mcp_client import client_metrics
+from .mcp_metrics import render_prometheus
 from .mcp_utils import mcp_bot
+from .page_cache import PageCache
+
+# 请求追踪配置，可通过 settings.MCP_TRACE 覆盖
+TRACE_CONFIG = {
+    # 被追踪的 /chat/ 请求比例，0 表示关闭
+    'SAMPLE_RATE': 0.0,
+    'FILE': 'mcp_trace.json',
+}
+TRACE_CONFIG.update(getattr(settings, 'MCP_TRACE', {}))
+chat_tracer = mcp_trace.Tracer(TRACE_CONFIG['SAMPLE_RATE'], TRACE_CONFIG['FILE'], 'django')
+
+# /metrics/ 配置，可通过 settings.MCP_METRICS 覆盖
+METRICS_CONFIG = {
+    # 允许抓取的客户端地址
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    # 非空时，带 Authorization: Bearer <TOKEN> 的请求也可以抓取
+    'TOKEN': '',
+    # 服务器进程统计的缓存时间（秒），抓取本身不会访问 MCP 服务器
+    'SERVER_STATS_MAX_AGE': 10.0,
+}
+METRICS_CONFIG.update(getattr(settings, 'MCP_METRICS', {}))
+
+
+# 介绍页的内容是固定的，渲染结果由 index_page_cache 缓存
+INDEX_CONTEXT = {
+    'title': 'Model Context Protocol (MCP) - 全面介绍',
+    'features': [
+        {
+            'title': '标准化协议',
+            'description': 'MCP提供了一个标准化的方式来连接AI助手和各种数据源',
+            'icon': '🔗'
+        },
+        {
+            'title': '工具集成',
+            'description': '轻松集成各种工具和服务，扩展AI助手的能力',
+            'icon': '🛠️'
+        },
+        {
+            'title': '资源访问',
+            'description': '安全地访问和操作各种外部资源和数据',
+            'icon': '📊'
+        },
+        {
+            'title': '模块化设计',
+            'description': '采用模块化架构，便于扩展和维护',
+            'icon': '🧩'
+        }
+    ],
+    'use_cases': [
+        {
+            'title': '数据库查询',
+            'description': '连接到数据库并执行复杂查询，获取实时数据',
+            'example': 'SELECT * FROM users WHERE created_date > \'2023-01-01\''
+        },
+        {
+            'title': '文件系统操作',
+            'description': '读取、写入和管理文件系统中的文件和目录',
+            'example': '读取配置文件，生成报告，批量处理文档'
+        },
+        {
+            'title': 'API集成',
+            'description': '调用REST API、GraphQL接口等外部服务',
+            'example': '获取天气信息，发送邮件，社交媒体集成'
+        },
+        {
+            'title': '监控与日志',
+            'description': '实时监控系统状态，分析日志文件',
+            'example': '服务器性能监控，错误日志分析，告警通知'
+        }
+    ],
+    'architecture': {
+        'client': 'AI助手或应用程序',
+        'protocol': 'MCP协议层',
+        'server': 'MCP服务器',
+        'resources': '外部资源（数据库、API、文件等）'
+    }
+}
+
+index_page_cache = PageCache('mcp_intro/index.html')
 
 
 def index(request):
     """MCP介绍页面主视图"""
-    context = {
-        'title': 'Model Context Protocol (MCP) - 全面介绍',
-        'features': [
-            {
-                'title': '标准化协议',
-                'description': 'MCP提供了一个标准化的方式来连接AI助手和各种数据源',
-                'icon': '🔗'
-            },
-            {
-                'title': '工具集成',
-                'description': '轻松集成各种工具和服务，扩展AI助手的能力',
-                'icon': '🛠️'
-            },
-            {
-                'title': '资源访问',
-                'description': '安全地访问和操作各种外部资源和数据',
-                'icon': '📊'
-            },
-            {
-                'title': '模块化设计',
-                'description': '采用模块化架构，便于扩展和维护',
-                'icon': '🧩'
-            }
-        ],
-        'use_cases': [
-            {
-                'title': '数据库查询',
-                'description': '连接到数据库并执行复杂查询，获取实时数据',
-                'example': 'SELECT * FROM users WHERE created_date > \'2023-01-01\''
-            },
-            {
-                'title': '文件系统操作',
-                'description': '读取、写入和管理文件系统中的文件和目录',
-                'example': '读取配置文件，生成报告，批量处理文档'
-            },
-            {
-                'title': 'API集成',
-                'description': '调用REST API、GraphQL接口等外部服务',
-                'example': '获取天气信息，发送邮件，社交媒体集成'
-            },
-            {
-                'title': '监控与日志',
-                'description': '实时监控系统状态，分析日志文件',
-                'example': '服务器性能监控，错误日志分析，告警通知'
-            }
-        ],
-        'architecture': {
-            'client': 'AI助手或应用程序',
-            'protocol': 'MCP协议层',
-            'server': 'MCP服务器',
-            'resources': '外部资源（数据库、API、文件等）'
-        }
+    page = index_page_cache.get(get_language(), INDEX_CONTEXT)
+    return page.response(request, 'text/html; charset=utf-8',
+                         getattr(settings, 'MCP_INDEX_CACHE_MAX_AGE', 0))
+
+
+def _conversation_id(data):
+    """请求中的 conversation_id，没有时开始新的对话；格式不对时返回 None."""
+    conversation_id = data.get('conversation_id') or uuid.uuid4().hex
+    if not isinstance(conversation_id, six.string_types) or len(conversation_id) > 64:
+        return None
+    return conversation_id
+
+
+def _refresher(user_message, tool_name, arguments):
+    """刷新过期缓存条目的 render 函数，和正常请求一样经过准入控制."""
+    def render():
+        return admission.call(mcp_bot.answer, user_message, tool_name, arguments)
+    return render
+
+
+def _render_chat(user_message, conversation_id):
+    """生成聊天响应，先解析工具调用，命中缓存时不访问 MCP 服务器."""
+    started_at = time.time()
+    tool_name, arguments = mcp_bot.route_message(user_message)
+    tool_call = {}
+
+    def answer():
+        tool_call['started_at'] = time.time()
+        try:
+            return mcp_bot.answer(user_message, tool_name, arguments, tool_call)
+        finally:
+            tool_call['duration'] = time.time() - tool_call['started_at']
+
+    def render():
+        with mcp_trace.span('admission'):
+            return admission.call(answer)
+
+    with mcp_trace.span('chat_cache'):
+        bot_response, cache_status = chat_cache.get_or_render(user_message, tool_name, arguments, render)
+    ok = bot_response is not None
+    if not ok:
+        bot_response = mcp_bot._fallback_response(user_message)
+
+    # 没有调用 answer() 说明回复来自聊天缓存
+    chat_history.record(conversation_id, user_message, bot_response, tool_name, arguments, cache_status,
+                        started_at, time.time() - started_at, tool_call.get('started_at'),
+                        tool_call.get('duration'), ok, tool_call.get('cache_hit', True))
+    return {
+        'response': bot_response,
+        'is_markdown': True,
+        'cache': cache_status,
+        'conversation_id': conversation_id
     }
-    return render(request, 'mcp_intro/index.html', context)
+
+
+def _render_chat_traced(user_message, trace, conversation_id):
+    """在 trace 中生成聊天响应，结束后把 trace 写入文件."""
+    try:
+        with mcp_trace.activate(trace), mcp_trace.span('views.chat'):
+            result = _render_chat(user_message, conversation_id)
+        if trace is not None:
+            result['trace_id'] = trace.id
+        return result
+    finally:
+        chat_tracer.finish(trace)
+
+
+def _too_busy(error):
+    """准入控制拒绝请求时的 429 响应."""
+    response = JsonResponse({'error': str(error), 'retry_after': error.retry_after}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def chat(request):
-    """聊天 API 接口."""
+    """聊天 API 接口，请求中带 async: true 时返回后台任务 id."""
     try:
         data = json.loads(request.body)
         user_message = data.get('message', '')
 
         if not user_message:
             return JsonResponse({'error': 'No message provided'}, status=400)
+        conversation_id = _conversation_id(data)
+        if conversation_id is None:
+            return JsonResponse({'error': 'Invalid conversation_id'}, status=400)
+
+        if data.get('async'):
+            try:
+                job = chat_jobs.submit(_render_chat_traced, user_message, chat_tracer.start(), conversation_id)
+            except JobQueueFull as e:
+                response = JsonResponse({'error': str(e)}, status=503)
+                response['Retry-After'] = '1'
+                return response
+
+            result = job.to_dict()
+            result.update({
+                'success': True,
+                'poll_url': reverse('chat_job', args=[job.id])
+            })
+            return JsonResponse(result, status=202)
 
-        # 获取 MCP 响应
-        bot_response = mcp_bot.get_response(user_message)
+        result = _render_chat_traced(user_message, chat_tracer.start(), conversation_id)
+        result['success'] = True
+        return JsonResponse(result)
+
+    except AdmissionRejected as e:
+        return _too_busy(e)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def chat_batch(request):
+    """批量聊天 API 接口，按请求顺序返回每条消息的响应."""
+    try:
+        data = json.loads(request.body)
+        messages = data.get('messages')
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'error': 'Invalid request body: ' + str(e)}, status=400)
+
+    if not isinstance(messages, list) or not messages:
+        return JsonResponse({'error': 'No messages provided'}, status=400)
+    if not all(isinstance(message, six.string_types) and message for message in messages):
+        return JsonResponse({'error': 'Messages must be non-empty strings'}, status=400)
+    max_messages = getattr(settings, 'MCP_CHAT_BATCH_MAX_MESSAGES', 1000)
+    if len(messages) > max_messages:
+        return JsonResponse({'error': 'Too many messages, limit is {}'.format(max_messages)}, status=400)
+    conversation_id = _conversation_id(data)
+    if conversation_id is None:
+        return JsonResponse({'error': 'Invalid conversation_id'}, status=400)
+
+    try:
+        started_at = time.time()
+        # 相同的消息只处理一次
+        unique_messages = list(OrderedDict.fromkeys(messages))
+        results = {}
+        pending = []
+        routes = {}
+        for message in unique_messages:
+            tool_name, arguments = mcp_bot.route_message(message)
+            routes[message] = (tool_name, arguments)
+            cached_response, cache_status = chat_cache.get(message, tool_name, arguments)
+            if cached_response is not None:
+                if cache_status == chat_cache.STALE:
+                    chat_cache.revalidate(message, tool_name, arguments, _refresher(message, tool_name, arguments))
+                results[message] = {'response': cached_response, 'cache': cache_status}
+            elif not tool_name:
+                response = mcp_bot.answer(message, tool_name, arguments)
+                chat_cache.set(message, tool_name, arguments, response)
+                results[message] = {'response': response, 'cache': cache_status}
+            else:
+                pending.append((message, tool_name, arguments, cache_status))
+
+        # 剩余的工具调用合并为 JSON-RPC 批量请求，全部命中缓存时不占用准入名额
+        batch_started_at = time.time()
+        responses = []
+        batch_info = {}
+        if pending:
+            responses = admission.call(mcp_bot.answer_batch,
+                                       [(tool_name, arguments) for _, tool_name, arguments, _ in pending],
+                                       batch_info)
+        tool_cache_hits = dict(zip([message for message, _, _, _ in pending], batch_info.get('cache_hits', [])))
+        batch_duration = time.time() - batch_started_at
+        failed = set()
+        for (message, tool_name, arguments, cache_status), response in zip(pending, responses):
+            if response is None:
+                response = mcp_bot._fallback_response(message)
+                failed.add(message)
+            else:
+                chat_cache.set(message, tool_name, arguments, response)
+            results[message] = {'response': response, 'cache': cache_status}
+
+        # 批量中的每条消息记为一轮对话，耗时为整个批量请求的耗时
+        latency = time.time() - started_at
+        called = set(message for message, _, _, _ in pending)
+        for message in messages:
+            tool_name, arguments = routes[message]
+            chat_history.record(conversation_id, message, results[message]['response'], tool_name, arguments,
+                                results[message]['cache'], started_at, latency,
+                                batch_started_at if message in called else None,
+                                batch_duration if message in called else None,
+                                message not in failed, tool_cache_hits.get(message, message not in called))
 
         return JsonResponse({
             'success': True,
-            'response': bot_response,
-            'is_markdown': True
+            'is_markdown': True,
+            'conversation_id': conversation_id,
+            'results': [results[message] for message in messages]
         })
 
+    except AdmissionRejected as e:
+        return _too_busy(e)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def chat_job(request, job_id):
+    """查询后台聊天任务，?wait=秒数 时长轮询直到任务结束（最多 MAX_WAIT 秒）.
+
+    任务未结束时带 Retry-After，客户端应稍后再次查询。
+    """
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid wait value'}, status=400)
+
+    job = chat_jobs.wait(job_id, wait) if wait > 0 else chat_jobs.get(job_id)
+    if job is None:
+        return JsonResponse({'error': 'Job not found or expired'}, status=404)
+
+    result = job.to_dict()
+    result['success'] = True
+    response = JsonResponse(result)
+    if not job.finished:
+        response['Retry-After'] = '1'
+    return response
+
+
+def _sse_event(event, data):
+    """编码一条 server-sent event."""
+    return 'event: {}\ndata: {}\n\n'.format(event, json.dumps(data, ensure_ascii=False))
+
+
+def _stream_chat_events(user_message, conversation_id):
+    """流式聊天的事件序列：先发送路由结果，再发送工具进度和 Markdown 片段."""
+    started_at = time.time()
+    tool_name, arguments = mcp_bot.route_message(user_message)
+    yield _sse_event('routing', {'tool': tool_name, 'arguments': arguments, 'conversation_id': conversation_id})
+
+    cached_response, cache_status = chat_cache.get(user_message, tool_name, arguments)
+    if cached_response is not None:
+        if cache_status == chat_cache.STALE:
+            chat_cache.revalidate(user_message, tool_name, arguments,
+                                  _refresher(user_message, tool_name, arguments))
+        for chunk in mcp_bot.split_markdown(cached_response):
+            yield _sse_event('chunk', {'text': chunk})
+        yield _sse_event('done', {'ok': True, 'cache': cache_status})
+        chat_history.record(conversation_id, user_message, cached_response, tool_name, arguments, cache_status,
+                            started_at, time.time() - started_at, cache_hit=True)
+        return
+
+    if not tool_name:
+        for event in _iter_chat_events(user_message, tool_name, arguments, cache_status,
+                                       conversation_id, started_at):
+            yield event
+        return
+
+    try:
+        with admission.admit():
+            for event in _iter_chat_events(user_message, tool_name, arguments, cache_status,
+                                           conversation_id, started_at):
+                yield event
+    except AdmissionRejected as e:
+        yield _sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+
+
+def _iter_chat_events(user_message, tool_name, arguments, cache_status, conversation_id, started_at):
+    """转发 MCPChatBot.iter_response 的事件，结束时写入缓存和聊天记录."""
+    chunks = []
+    info = {}
+    tool_started_at = time.time()
+    for event, data in mcp_bot.iter_response(user_message, tool_name, arguments, info):
+        if event == 'chunk':
+            chunks.append(data['text'])
+        elif event == 'done':
+            if data['ok']:
+                chat_cache.set(user_message, tool_name, arguments, ''.join(chunks))
+            now = time.time()
+            chat_history.record(conversation_id, user_message, ''.join(chunks), tool_name, arguments,
+                                cache_status, started_at, now - started_at, tool_started_at,
+                                now - tool_started_at, data['ok'], info.get('cache_hit', False))
+            data = dict(data, cache=cache_status)
+        yield _sse_event(event, data)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def chat_stream(request):
+    """流式聊天 API 接口（server-sent events）."""
+    try:
+        if request.method == 'POST':
+            data = json.loads(request.body)
+        else:
+            data = request.GET
+        user_message = data.get('message', '')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not user_message:
+        return JsonResponse({'error': 'No message provided'}, status=400)
+    conversation_id = _conversation_id(data)
+    if conversation_id is None:
+        return JsonResponse({'error': 'Invalid conversation_id'}, status=400)
+
+    response = StreamingHttpResponse(_stream_chat_events(user_message, conversation_id),
+                                     content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # 禁止 nginx 等反向代理缓冲事件流
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(["GET"])
+def chat_admission(request):
+    """准入控制的队列深度和计数."""
+    return JsonResponse(admission.stats())
+
+
+def _metrics_allowed(request):
+    """抓取方在地址白名单内、带有正确的 Bearer token，或是已登录的管理员."""
+    token = METRICS_CONFIG['TOKEN']
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        return True
+    if request.META.get('REMOTE_ADDR') in METRICS_CONFIG['ALLOWED_IPS']:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus 文本格式的指标：本进程的客户端、各服务器进程和准入控制.
+
+    服务器进程的统计来自定期刷新的快照，抓取不会与聊天请求争用服务器。
+    """
+    if not _metrics_allowed(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    snapshots = [(client_metrics.snapshot(), None)]
+    for index, stats in mcp_bot.cached_server_stats(METRICS_CONFIG['SERVER_STATS_MAX_AGE']):
+        snapshots.append((stats['metrics'], {'process': index}))
+    snapshots.append(({
+        'gauges': [{'name': 'mcp_chat_admission_' + key, 'labels': {}, 'value': value}
+                   for key, value in admission.stats().items()],
+    }, None))
+    return HttpResponse(render_prometheus(snapshots), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def chat_analytics(request):
+    """聊天用量分析（仅管理员），数据来自增量汇总表；?format=json 返回 JSON."""
+    try:
+        hours = int(request.GET.get('hours', 0)) or None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid hours value'}, status=400)
+    data = analytics.dashboard(hours)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(data)
+    return render(request, 'mcp_intro/analytics.html', {
+        'title': 'Chat analytics',
+        'data': data,
+        'history': chat_history.stats(),
+    })
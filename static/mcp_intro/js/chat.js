@@ -0,0 +1,698 @@
+// 聊天机器人相关变量
+let chatBotOpen = false;
+let conversationHistory = [];
+// 服务器分配的对话 id，后续消息带上它以记录在同一个对话中
+let conversationId = null;
+
+// 在脚本开头配置 marked.js，代码块用 Prism 高亮
+marked.setOptions({
+    highlight: function(code, lang) {
+        const grammar = lang && Prism.languages[lang];
+        if (grammar) {
+            try {
+                return Prism.highlight(code, grammar, lang);
+            } catch (err) {}
+        }
+        return code;
+    },
+    breaks: true,
+    gfm: true
+});
+
+// 显示/隐藏聊天机器人
+function toggleChatBot() {
+    const popup = document.getElementById('chatBotPopup');
+    const badge = document.getElementById('notificationBadge');
+
+    chatBotOpen = !chatBotOpen;
+
+    if (chatBotOpen) {
+        popup.classList.add('show');
+        badge.style.display = 'none';
+        // 聚焦输入框
+        setTimeout(() => {
+            document.getElementById('chatInput').focus();
+        }, 300);
+    } else {
+        popup.classList.remove('show');
+    }
+}
+
+// 发送消息
+function sendMessage(event) {
+    event.preventDefault();
+    const input = document.getElementById('chatInput');
+    const message = input.value.trim();
+
+    if (!message) return;
+
+    addMessage('user', message);
+    input.value = '';
+
+    showTypingIndicator();
+
+    // 优先使用流式接口，浏览器不支持或请求失败时降级到普通接口
+    streamMessage(message).catch(error => {
+        console.warn('Stream failed, falling back:', error);
+        requestMessage(message);
+    });
+}
+
+// 普通请求：等待完整响应
+function requestMessage(message) {
+    fetch('/mcp_website/chat/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            conversation_id: conversationId
+        })
+    })
+    .then(response => {
+        console.log('Response status:', response.status); // 添加调试日志
+        return response.json();
+    })
+    .then(data => {
+        console.log('Response data:', data); // 添加调试日志
+        hideTypingIndicator();
+
+        if (data.success) {
+            conversationId = data.conversation_id || conversationId;
+            // 使用后端返回的响应
+            addMessage('bot', data.response, true);
+        } else {
+            // 降级到静态响应
+            const fallbackResponse = generateStaticResponse(message);
+            addMessage('bot', fallbackResponse, true);
+        }
+    })
+    .catch(error => {
+        console.error('API call failed:', error);
+        hideTypingIndicator();
+        // 降级到静态响应
+        const fallbackResponse = generateStaticResponse(message);
+        addMessage('bot', fallbackResponse, true);
+    });
+}
+
+// 流式请求：解析 server-sent events，边接收 Markdown 片段边渲染
+function streamMessage(message) {
+    if (!window.ReadableStream || !window.TextDecoder) {
+        return Promise.reject(new Error('Streaming not supported'));
+    }
+
+    return fetch('/mcp_website/chat/stream/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            conversation_id: conversationId
+        })
+    })
+    .then(response => {
+        if (!response.ok || !response.body) {
+            throw new Error('Stream status: ' + response.status);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder('utf-8');
+        let buffer = '';
+        let markdown = '';
+        let messageContent = null;
+
+        const handleEvent = (name, data) => {
+            if (name === 'routing') {
+                console.log('Routing:', data); // 添加调试日志
+                conversationId = data.conversation_id || conversationId;
+            } else if (name === 'chunk') {
+                if (!messageContent) {
+                    hideTypingIndicator();
+                    messageContent = addMessage('bot', '', true);
+                }
+                markdown += data.text;
+                renderBotMarkdown(messageContent, markdown);
+                conversationHistory[conversationHistory.length - 1].content = markdown;
+            }
+        };
+
+        const pump = () => reader.read().then(({ done, value }) => {
+            if (done) {
+                if (!messageContent) {
+                    throw new Error('Stream ended without content');
+                }
+                return;
+            }
+
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let name = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        name = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                });
+                handleEvent(name, data ? JSON.parse(data) : {});
+            }
+            return pump();
+        });
+
+        return pump().catch(error => {
+            // 已经显示了部分内容时不再降级，避免重复回答
+            if (messageContent) {
+                console.error('Stream interrupted:', error);
+                return;
+            }
+            throw error;
+        });
+    });
+}
+
+// 快速回复
+function sendQuickReply(message) {
+    document.getElementById('chatInput').value = message;
+
+    // 直接调用修改后的 sendMessage
+    sendMessage({ preventDefault: () => {} });
+
+    // 隐藏快速回复按钮
+    document.querySelector('.quick-replies').style.display = 'none';
+}
+
+// 添加消息到聊天界面
+function addMessage(type, content, isMarkdown = false) {
+    const messagesContainer = document.getElementById('chatMessages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${type}`;
+
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.innerHTML = type === 'bot' ? '<i class="fas fa-robot"></i>' : '<i class="fas fa-user"></i>';
+
+    const messageContent = document.createElement('div');
+    messageContent.className = 'message-content';
+
+    if (isMarkdown && type === 'bot') {
+        renderBotMarkdown(messageContent, content);
+    } else {
+        messageContent.innerHTML = content.replace(/\n/g, '<br>');
+
+        // 为机器人消息添加复制按钮
+        if (type === 'bot') {
+            const copyButton = document.createElement('button');
+            copyButton.className = 'copy-button';
+            copyButton.innerHTML = '<i class="fas fa-copy"></i>复制';
+            copyButton.onclick = () => copyMessage(copyButton);
+            copyButton.title = '复制消息';
+            messageContent.appendChild(copyButton);
+        }
+    }
+
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(messageContent);
+    messagesContainer.appendChild(messageDiv);
+
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    conversationHistory.push({ type: type, content: content });
+    return messageContent;
+}
+
+// 渲染机器人的 Markdown 消息（流式响应会多次调用）
+function renderBotMarkdown(messageContent, content) {
+    // 解析 Markdown
+    const htmlContent = marked.parse(content);
+    messageContent.innerHTML = htmlContent;
+
+    // 添加复制按钮
+    const copyButton = document.createElement('button');
+    copyButton.className = 'copy-button';
+    copyButton.innerHTML = '<i class="fas fa-copy"></i>复制';
+    copyButton.onclick = () => copyMessage(copyButton);
+    copyButton.title = '复制消息';
+    messageContent.appendChild(copyButton);
+
+    // 为代码块添加复制按钮
+    setTimeout(() => {
+        addCodeCopyButtons(messageContent);
+    }, 100);
+
+    const messagesContainer = document.getElementById('chatMessages');
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+// 显示打字指示器
+function showTypingIndicator() {
+    const messagesContainer = document.getElementById('chatMessages');
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'message bot typing';
+    typingDiv.id = 'typingIndicator';
+
+    typingDiv.innerHTML = `
+        <div class="message-avatar">
+            <i class="fas fa-robot"></i>
+        </div>
+        <div class="message-content">
+            <div class="typing-indicator">
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+            </div>
+        </div>
+    `;
+
+    messagesContainer.appendChild(typingDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+// 隐藏打字指示器
+function hideTypingIndicator() {
+    const typingIndicator = document.getElementById('typingIndicator');
+    if (typingIndicator) {
+        typingIndicator.remove();
+    }
+}
+
+function addCodeCopyButtons(container) {
+    const codeBlocks = container.querySelectorAll('pre');
+    codeBlocks.forEach((block) => {
+        // 流式渲染会多次调用，已有按钮的代码块跳过
+        if (block.querySelector('.code-copy-button')) return;
+
+        const copyButton = document.createElement('button');
+        copyButton.className = 'code-copy-button';
+        copyButton.innerHTML = '<i class="fas fa-copy"></i>';
+        copyButton.onclick = () => copyCode(copyButton, block);
+        copyButton.title = '复制代码';
+
+        block.style.position = 'relative';
+        block.appendChild(copyButton);
+    });
+}
+
+function copyMessage(button) {
+    const messageContent = button.parentElement;
+    const copyButton = messageContent.querySelector('.copy-button');
+
+    // 获取文本内容（去除复制按钮）
+    const tempDiv = messageContent.cloneNode(true);
+    const tempCopyButton = tempDiv.querySelector('.copy-button');
+    if (tempCopyButton) {
+        tempCopyButton.remove();
+    }
+
+    const text = tempDiv.innerText || tempDiv.textContent;
+
+    navigator.clipboard.writeText(text).then(() => {
+        const originalText = copyButton.innerHTML;
+        copyButton.innerHTML = '<i class="fas fa-check"></i>已复制';
+        copyButton.classList.add('copied');
+
+        setTimeout(() => {
+            copyButton.innerHTML = originalText;
+            copyButton.classList.remove('copied');
+        }, 2000);
+
+        showToast('消息已复制到剪贴板', 'success');
+    }).catch(err => {
+        console.error('复制失败:', err);
+        showToast('复制失败，请手动选择文本复制', 'error');
+    });
+}
+
+function copyCode(button, codeBlock) {
+    const code = codeBlock.querySelector('code');
+    const text = code ? code.innerText : codeBlock.innerText;
+
+    navigator.clipboard.writeText(text).then(() => {
+        const originalHTML = button.innerHTML;
+        button.innerHTML = '<i class="fas fa-check"></i>';
+        button.classList.add('copied');
+
+        setTimeout(() => {
+            button.innerHTML = originalHTML;
+            button.classList.remove('copied');
+        }, 2000);
+
+        showToast('代码已复制到剪贴板', 'success');
+    }).catch(err => {
+        console.error('复制失败:', err);
+        showToast('复制失败', 'error');
+    });
+}
+
+function showToast(message, type = 'success') {
+    const toast = document.getElementById('toast');
+    toast.textContent = message;
+    toast.className = `toast ${type}`;
+    toast.classList.add('show');
+
+    setTimeout(() => {
+        toast.classList.remove('show');
+    }, 3000);
+}
+
+// 生成MCP相关响应（模拟AI回答）
+function generateStaticResponse(userMessage) {
+    const message = userMessage.toLowerCase();
+
+    // 简单的关键词匹配响应系统
+    if (message.includes('什么是') || message.includes('mcp是') || message.includes('介绍')) {
+        return `🤖 **Model Context Protocol (MCP)** 是一个开放标准，专门为AI应用程序设计，让它们能够安全、可控地访问外部数据源和工具。
+
+**核心价值：**
+• 🔗 **标准化连接**：统一AI与外部系统的通信方式
+• 🛡️ **安全可控**：提供细粒度的权限管理
+• 🚀 **实时数据**：让AI获取最新的动态信息
+• 🧩 **模块化设计**：易于扩展和集成
+
+想了解更多具体方面吗？比如架构设计、应用场景或代码实现？`;
+    }
+
+    if (message.includes('如何') || message.includes('开始') || message.includes('使用')) {
+        return `🚀 **快速开始使用 MCP：**
+
+**第一步：环境准备**
+\`\`\`bash
+pip install mcp-sdk
+\`\`\`
+
+**第二步：创建MCP服务器**
+\`\`\`python
+from mcp import MCPServer
+
+class MyMCPServer(MCPServer):
+def __init__(self):
+super().__init__("my-server", "1.0.0")
+\`\`\`
+
+**第三步：定义工具和资源**
+• 使用 @Tool 装饰器定义功能
+• 使用 @Resource 装饰器定义资源
+
+**第四步：启动和连接**
+• 运行服务器
+• 客户端连接并调用
+
+需要看完整的代码示例吗？或者有特定的集成场景？`;
+    }
+
+    if (message.includes('优势') || message.includes('好处') || message.includes('特点')) {
+        return `✨ **MCP 的主要优势：**
+
+🔒 **安全性**
+• 细粒度权限控制
+• 加密通信
+• 身份验证机制
+
+⚡ **性能**
+• 异步处理
+• 连接池技术
+• 批量操作支持
+
+🔧 **易用性**
+• 标准化API
+• 丰富的SDK
+• 详细文档
+
+🌐 **兼容性**
+• 多语言支持
+• 跨平台部署
+• 向后兼容
+
+🎯 **实用性**
+• 实时数据访问
+• 工具集成
+• 资源管理
+
+相比传统方案，MCP减少了70%的集成复杂度！`;
+    }
+
+    if (message.includes('代码') || message.includes('示例') || message.includes('例子')) {
+        return `💻 **MCP 代码示例：**
+
+**数据库查询工具：**
+\`\`\`python
+@Tool("query_db")
+async def query_database(self, sql: str):
+# 执行数据库查询
+results = execute_sql(sql)
+return {"data": results, "count": len(results)}
+\`\`\`
+
+**文件操作资源：**
+\`\`\`python
+@Resource("config_file")
+async def get_config(self):
+with open("config.json", "r") as f:
+return f.read()
+\`\`\`
+
+**客户端调用：**
+\`\`\`python
+result = await client.call_tool("query_db", {
+"sql": "SELECT * FROM users"
+})
+\`\`\`
+
+需要看特定场景的完整实现吗？比如API集成、文件处理或监控系统？`;
+    }
+
+    if (message.includes('架构') || message.includes('结构') || message.includes('原理')) {
+        return `🏗️ **MCP 系统架构：**
+
+**四层结构：**
+1. **客户端层** (AI应用)
+• 发起请求
+• 处理响应
+• 用户交互
+
+2. **协议层** (MCP Protocol)
+• JSON-RPC 2.0
+• WebSocket/HTTP
+• 消息路由
+
+3. **服务器层** (MCP Server)
+• 请求处理
+• 权限控制
+• 资源管理
+
+4. **资源层** (External Resources)
+• 数据库
+• API接口
+• 文件系统
+
+**通信流程：**
+客户端 → 协议层 → 服务器 → 资源 → 响应返回
+
+这种分层设计确保了系统的可扩展性和安全性！`;
+    }
+
+    if (message.includes('应用') || message.includes('场景') || message.includes('用途')) {
+        return `🎯 **MCP 应用场景：**
+
+**企业级应用：**
+• 📊 **商业智能**：实时数据分析和报表生成
+• 🔍 **知识管理**：企业文档检索和问答
+• 📈 **监控告警**：系统状态监控和异常处理
+
+**开发者工具：**
+• 🛠️ **代码助手**：代码分析和自动化工具
+• 📚 **文档生成**：API文档和技术文档
+• 🧪 **测试自动化**：测试用例生成和执行
+
+**日常办公：**
+• 📧 **邮件处理**：智能邮件分类和回复
+• 📅 **日程管理**：会议安排和提醒
+• 📋 **任务跟踪**：项目进度和任务分配
+
+**数据处理：**
+• 🗄️ **数据库操作**：复杂查询和数据分析
+• 📁 **文件管理**：批量处理和格式转换
+• 🌐 **API集成**：第三方服务调用
+
+您有特定的应用需求吗？`;
+    }
+
+    if (message.includes('安全') || message.includes('权限') || message.includes('保护')) {
+        return `🛡️ **MCP 安全机制：**
+
+**身份认证：**
+• 🔐 API Key 认证
+• 🎫 OAuth 2.0 集成
+• 🔑 JWT Token 验证
+• 📋 多因素认证
+
+**权限控制：**
+• 👤 用户级权限
+• 🔧 功能级权限
+• 📊 数据级权限
+• ⏰ 时间限制
+
+**数据保护：**
+• 🔒 传输加密 (TLS/SSL)
+• 🗃️ 数据脱敏
+• 📝 审计日志
+• 🚫 访问限制
+
+**监控告警：**
+• 📊 实时监控
+• ⚠️ 异常检测
+• 📧 安全告警
+• 🔍 行为分析
+
+**最佳实践：**
+• 最小权限原则
+• 定期权限审查
+• 安全配置检查
+• 应急响应计划
+
+安全是MCP的核心设计理念之一！`;
+    }
+
+    // 默认响应
+    const defaultResponses = [
+        `🤔 这是一个很好的问题！关于 "${userMessage}"，我需要更多上下文来给出准确的答案。
+
+您可以：
+• 🔍 查看页面上的详细介绍
+• 💬 询问更具体的问题
+• 📚 访问官方文档
+• 🛠️ 查看代码示例
+
+或者您可以问我：
+• MCP的基本概念
+• 技术实现细节
+• 应用场景案例
+• 安全机制说明`,
+
+        `💡 感谢您的提问！我理解您想了解 "${userMessage}" 相关的信息。
+
+**我可以帮您：**
+• 📖 解释MCP的核心概念
+• 🔧 提供技术实现指导
+• 💼 分享实际应用案例
+• 🚀 协助快速上手
+
+**建议您：**
+• 浏览页面上的详细内容
+• 查看代码示例部分
+• 了解系统架构设计
+• 探索应用场景介绍
+
+有什么具体想了解的吗？`,
+
+        `🌟 很高兴您对MCP感兴趣！关于 "${userMessage}"，让我为您提供一些相关信息。
+
+**MCP相关资源：**
+• 📋 完整功能介绍
+• 🏗️ 系统架构说明
+• 💻 代码示例展示
+• 🎯 应用场景分享
+
+**推荐阅读顺序：**
+1. 了解MCP基本概念
+2. 查看系统架构图
+3. 学习代码示例
+4. 探索应用场景
+
+需要我详细解释某个方面吗？`
+    ];
+
+    return defaultResponses[Math.floor(Math.random() * defaultResponses.length)];
+}
+
+// 处理输入框键盘事件
+function handleKeyDown(event) {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        sendMessage(event);
+    }
+}
+
+// 代码高亮切换
+function showCode(type) {
+    // 隐藏所有代码块
+    document.querySelectorAll('.code-content').forEach(function(el) {
+        el.style.display = 'none';
+    });
+
+    // 移除所有active类
+    document.querySelectorAll('.code-tab').forEach(function(el) {
+        el.classList.remove('active');
+    });
+
+    // 显示选中的代码块
+    document.getElementById(type + '-code').style.display = 'block';
+
+    // 添加active类到选中的标签
+    event.target.classList.add('active');
+}
+
+// 页面加载完成后的初始化
+document.addEventListener('DOMContentLoaded', function() {
+    // 显示通知徽章
+    setTimeout(() => {
+        document.getElementById('notificationBadge').style.display = 'flex';
+    }, 3000);
+
+    // 添加滚动动画
+    const observerOptions = {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    };
+
+    const observer = new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) {
+                entry.target.style.opacity = '1';
+                entry.target.style.transform = 'translateY(0)';
+            }
+        });
+    }, observerOptions);
+
+    document.querySelectorAll('.section').forEach(function(section) {
+        section.style.opacity = '0';
+        section.style.transform = 'translateY(30px)';
+        section.style.transition = 'opacity 0.8s ease, transform 0.8s ease';
+        observer.observe(section);
+    });
+
+    // 特性卡片悬停效果增强
+    document.querySelectorAll('.feature-card').forEach(function(card) {
+        card.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-10px) scale(1.02)';
+        });
+
+        card.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0) scale(1)';
+        });
+    });
+
+    // 聊天输入框自动调整高度
+    const chatInput = document.getElementById('chatInput');
+    chatInput.addEventListener('input', function() {
+        this.style.height = 'auto';
+        this.style.height = Math.min(this.scrollHeight, 100) + 'px';
+    });
+});
+
+// 点击外部关闭聊天框
+document.addEventListener('click', function(event) {
+    const chatContainer = document.querySelector('.chat-bot-container');
+    const popup = document.getElementById('chatBotPopup');
+
+    if (chatBotOpen && !chatContainer.contains(event.target)) {
+        popup.classList.remove('show');
+        chatBotOpen = false;
+    }
+});